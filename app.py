@@ -1,208 +1,240 @@
 import flet as ft
-from datetime import datetime
+import atexit
+from datetime import datetime, timedelta
 import sqlite3
 import threading
+import time
 import locale
-from decimal import Decimal
+import logging
+import os
+import instrumentacao
+import relatorios
+import reposicao
+from backup import BackupPeriodico
+from dinheiro import Dinheiro
+from instrumentacao import medido
+from modelos import ConflitoDeVersao, Database, FilaVendas, Produto, Venda
 
-# Configurar locale para formato brasileiro
-try:
-    locale.setlocale(locale.LC_ALL, 'pt_BR.UTF-8')
-except:
-    locale.setlocale(locale.LC_ALL, 'Portuguese_Brazil.1252')
 
-class Database:
-    _local = threading.local()
-    
-    def __init__(self, db_name='sistema_vendas.db'):
-        self.db_name = db_name
-    
-    def get_conn(self):
-        if not hasattr(Database._local, 'conn'):
-            Database._local.conn = sqlite3.connect(self.db_name)
-            Database._local.cursor = Database._local.conn.cursor()
-            self.create_tables()
-        return Database._local.conn, Database._local.cursor
-    
-    def create_tables(self):
-        conn, cursor = self.get_conn()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS produtos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                nome TEXT NOT NULL UNIQUE,
-                descricao TEXT,
-                quantidade INTEGER NOT NULL CHECK(quantidade >= 0),
-                preco REAL NOT NULL CHECK(preco > 0)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS vendas (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                produto_id INTEGER NOT NULL,
-                quantidade INTEGER NOT NULL CHECK(quantidade > 0),
-                data_venda TEXT NOT NULL,
-                valor_total REAL NOT NULL,
-                FOREIGN KEY (produto_id) REFERENCES produtos (id) ON DELETE RESTRICT
-            )
-        ''')
-        conn.commit()
-    
-    def close(self):
-        if hasattr(Database._local, 'conn'):
-            Database._local.conn.close()
-            del Database._local.conn
-            del Database._local.cursor
-
-class Produto:
-    def __init__(self, id=None, nome='', descricao='', quantidade=0, preco=0.0):
-        self.id = id
-        self.nome = nome
-        self.descricao = descricao
-        self.quantidade = quantidade
-        self.preco = preco
-    
-    def salvar(self, db):
-        conn, cursor = db.get_conn()
+def configurar_locale():
+    # Formato brasileiro para a interface. Feito ao abrir a janela, e não na
+    # importação, para não mexer no processo de quem só usa o modelo
+    for nome in ('pt_BR.UTF-8', 'Portuguese_Brazil.1252'):
         try:
-            if self.id is None:
-                cursor.execute('''
-                    INSERT INTO produtos (nome, descricao, quantidade, preco)
-                    VALUES (?, ?, ?, ?)
-                ''', (self.nome, self.descricao, self.quantidade, float(self.preco)))
-                self.id = cursor.lastrowid
-            else:
-                cursor.execute('''
-                    UPDATE produtos 
-                    SET nome=?, descricao=?, quantidade=?, preco=?
-                    WHERE id=?
-                ''', (self.nome, self.descricao, self.quantidade, float(self.preco), self.id))
-            conn.commit()
-        except sqlite3.Error as e:
-            conn.rollback()
-    
-    def remover(self, db):
-        if self.id is not None:
-            conn, cursor = db.get_conn()
-            try:
-                cursor.execute('DELETE FROM produtos WHERE id=?', (self.id,))
-                conn.commit()
-            except sqlite3.Error as e:
-                conn.rollback()
-                raise ValueError(f"Erro ao remover produto: {str(e)}")
-    
-    @staticmethod
-    def buscar_todos(db):
-        _, cursor = db.get_conn()
-        cursor.execute('SELECT * FROM produtos ORDER BY nome')
-        return [Produto(id=row[0], nome=row[1], descricao=row[2], quantidade=row[3], preco=row[4]) 
-                for row in cursor.fetchall()]
-    
-    @staticmethod
-    def buscar_por_id(db, id):
-        _, cursor = db.get_conn()
-        cursor.execute('SELECT * FROM produtos WHERE id=?', (id,))
-        row = cursor.fetchone()
-        if row:
-            return Produto(id=row[0], nome=row[1], descricao=row[2], quantidade=row[3], preco=row[4])
-        return None
-    
-    @staticmethod
-    def buscar_por_nome(db, nome):
-        _, cursor = db.get_conn()
-        cursor.execute('SELECT * FROM produtos WHERE nome LIKE ?', (f"%{nome}%",))
-        row = cursor.fetchone()
-        if row:
-            return Produto(id=row[0], nome=row[1], descricao=row[2], quantidade=row[3], preco=row[4])
-        return None
+            locale.setlocale(locale.LC_ALL, nome)
+            return
+        except locale.Error:
+            pass
 
-class Venda:
-    def __init__(self, id=None, produto_id=None, quantidade=0, data_venda=None, valor_total=0.0):
-        self.id = id
-        self.produto_id = produto_id
-        self.quantidade = quantidade
-        self.data_venda = data_venda or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        self.valor_total = valor_total
-    
-    def registrar(self, db):
-        produto = Produto.buscar_por_id(db, self.produto_id)
-        if not produto:
-            raise ValueError("Produto não encontrado")
-        if produto.quantidade < self.quantidade:
-            raise ValueError(f"Estoque insuficiente. Disponível: {produto.quantidade}")
-        
-        # Corrigido o cálculo do valor total
-        self.valor_total = float(Decimal(str(produto.preco)) * self.quantidade)
-        
-        conn, cursor = db.get_conn()
-        try:
-            cursor.execute('''
-                INSERT INTO vendas (produto_id, quantidade, data_venda, valor_total)
-                VALUES (?, ?, ?, ?)
-            ''', (self.produto_id, self.quantidade, self.data_venda, self.valor_total))
-            self.id = cursor.lastrowid
-            
-            produto.quantidade -= self.quantidade
-            produto.salvar(db)
-            
-            conn.commit()
-        except sqlite3.Error as e:
-            conn.rollback()
-            raise ValueError(f"Erro ao registrar venda: {str(e)}")
-    
-    @staticmethod
-    def buscar_todas(db):
-        _, cursor = db.get_conn()
-        cursor.execute('''
-            SELECT v.id, v.produto_id, v.quantidade, v.data_venda, v.valor_total, 
-                   p.nome, p.descricao
-            FROM vendas v
-            JOIN produtos p ON v.produto_id = p.id
-            ORDER BY v.data_venda DESC
-        ''')
-        vendas = []
-        for row in cursor.fetchall():
-            venda = Venda(
-                id=row[0], 
-                produto_id=row[1], 
-                quantidade=row[2], 
-                data_venda=row[3],
-                valor_total=row[4]
-            )
-            venda.nome_produto = row[5]
-            venda.descricao_produto = row[6]
-            vendas.append(venda)
-        return vendas
-    
-    @staticmethod
-    def calcular_total_vendas(db):
-        _, cursor = db.get_conn()
-        cursor.execute('SELECT SUM(valor_total) FROM vendas')
-        total = cursor.fetchone()[0]
-        return total or 0.0
 
 class CurrencyTextField(ft.TextField):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.prefix_text = "R$ "  # Exibe "R$ " antes do número
-        self.on_change = self.format_currency  # Chama a formatação ao alterar o valor
+        self.on_change = self.validar_valor  # Confere o valor a cada alteração
+        self.on_blur = self.formatar_valor  # Reescreve no formato brasileiro ao sair do campo
+
+    def validar_valor(self, e):
+        # Mesma interpretação usada ao salvar (Dinheiro.de_texto)
+        try:
+            Dinheiro.de_texto(self.value)
+            self.error_text = None
+        except ValueError:
+            self.error_text = "Valor inválido"
+        self.update()
 
-    def format_currency(self, e):
-        value = e.control.value.replace("R$ ", "").strip()  # Remove "R$ " e espaços extras
+    def formatar_valor(self, e):
+        if not self.value or self.error_text:
+            return  # vazio (permite limpar) ou inválido: deixa como o usuário digitou
+        self.value = Dinheiro.de_texto(self.value).formatar(simbolo=False)
+        self.update()
 
-        if not value:  
-            return  # Se o campo estiver vazio, não faz nada (permite limpar)
 
-        value = value.replace(".", "").replace(",", ".")  # Converte para o formato numérico
+class BuscaAssincrona:
+    # Executa buscas numa thread própria, fora do tratador de eventos do Flet.
+    # Só consulta quando o usuário para de digitar por "espera" segundos, e
+    # descarta o resultado se um termo mais novo chegou durante a consulta.
+    def __init__(self, executar, ao_concluir, espera=0.3):
+        self._executar = executar  # executar(termo) -> resultado, na thread de busca
+        self._ao_concluir = ao_concluir  # ao_concluir(termo, resultado)
+        self._espera = espera
+        self._cond = threading.Condition()
+        self._termo = None
+        self._geracao = 0
+        self._prazo = 0.0
+        self._encerrada = False
+        self._thread = threading.Thread(target=self._loop, name="busca", daemon=True)
+        self._thread.start()
+    
+    def solicitar(self, termo, imediata=False):
+        # imediata: sem esperar a digitação parar (ex.: um clique)
+        with self._cond:
+            self._termo = termo
+            self._geracao += 1
+            self._prazo = time.monotonic() + (0 if imediata else self._espera)
+            self._cond.notify()
+    
+    def encerrar(self):
+        with self._cond:
+            self._encerrada = True
+            self._cond.notify()
+    
+    def _loop(self):
+        atendida = 0
+        while True:
+            with self._cond:
+                while not self._encerrada and self._geracao == atendida:
+                    self._cond.wait()
+                # Cada nova tecla adia o prazo; só segue quando ele vence
+                while not self._encerrada:
+                    restante = self._prazo - time.monotonic()
+                    if restante <= 0:
+                        break
+                    self._cond.wait(restante)
+                if self._encerrada:
+                    return
+                geracao, termo = self._geracao, self._termo
+            
+            try:
+                resultado = self._executar(termo)
+            except (sqlite3.Error, ValueError):
+                resultado = None
+            
+            atendida = geracao
+            with self._cond:
+                if geracao != self._geracao:
+                    continue  # resultado obsoleto: um termo mais novo já está na fila
+            if resultado is not None:
+                self._ao_concluir(termo, resultado)
+
+class SeletorProduto(ft.Column):
+    # Campo com sugestões no lugar de um Dropdown com o catálogo inteiro: o
+    # caixa digita o começo do nome (ou lê o código de barras) e escolhe entre
+    # as primeiras ocorrências. As sugestões são pedidas a "solicitar" e
+    # chegam por exibir(). "value" é o id do produto escolhido, como no Dropdown.
+    def __init__(self, db, solicitar, ao_selecionar, width=400):
+        super().__init__(spacing=0, width=width)
+        self.db = db
+        self._solicitar = solicitar  # solicitar(texto)
+        self._ao_selecionar = ao_selecionar  # ao_selecionar(produto)
+        self.value = None
+        self.sugestoes = []
+        self.campo = ft.TextField(
+            label="Produto",
+            hint_text="Nome ou código de barras",
+            prefix_icon=ft.Icons.SEARCH,
+            width=width,
+            on_change=self._digitou,
+            on_submit=self._confirmou,
+        )
+        self.lista = ft.Column(spacing=0, visible=False)
+        self.controls = [self.campo, self.lista]
+    
+    def _digitou(self, e):
+        self.value = None  # o texto mudou: a escolha anterior não vale mais
+        self._solicitar(self.campo.value.strip())
+    
+    def _confirmou(self, e):
+        # O leitor de código de barras digita o código e tecla Enter: um
+        # código exato é escolhido na hora, sem esperar as sugestões. Fora
+        # isso, Enter escolhe a primeira sugestão.
+        produto = Produto.buscar_por_codigo(self.db, self.campo.value)
+        if produto is None and self.sugestoes:
+            produto = self.sugestoes[0]
+        if produto is not None:
+            self.selecionar(produto)
+    
+    def exibir(self, texto, produtos):
+        if self.value is not None or texto != self.campo.value.strip():
+            return  # já escolheu, ou o texto mudou desde o pedido
+        self.sugestoes = produtos
+        self.lista.controls = [
+            ft.ListTile(
+                title=ft.Text(produto.nome),
+                subtitle=ft.Text(f"{produto.codigo or 'Sem código'} · {produto.preco.formatar()} · "
+                                 f"estoque {produto.quantidade}"),
+                dense=True,
+                on_click=lambda e, produto=produto: self.selecionar(produto),
+            )
+            for produto in produtos
+        ]
+        self.lista.visible = bool(produtos)
+        self.update()
+    
+    def selecionar(self, produto):
+        self.value = produto.id
+        self.campo.value = produto.nome
+        self._fechar_lista()
+        self.update()
+        self._ao_selecionar(produto)
+    
+    def limpar(self):
+        self.value = None
+        self.campo.value = ""
+        self._fechar_lista()
+    
+    def _fechar_lista(self):
+        self.sugestoes = []
+        self.lista.controls = []
+        self.lista.visible = False
+
+VENDAS_POR_PAGINA = 10
+# Vendas novas entram no topo da tabela; acima deste limite as mais antigas
+# saem, para a atualização após cada venda não crescer com o expediente
+MAXIMO_VENDAS_EXIBIDAS = 100
+PRODUTOS_POR_PAGINA = 50
+# Páginas mantidas na grade de produtos; as que se afastam da área visível
+# saem e são buscadas de novo pelo cursor se a rolagem voltar até elas
+MAXIMO_PAGINAS_PRODUTOS = 4
+# Pausa na digitação antes de consultar as sugestões do seletor de produtos
+ESPERA_SUGESTOES = 0.15
+# Altura fixa das linhas da grade de produtos: as páginas descartadas no topo
+# viram um espaço em branco da mesma altura, e a rolagem não salta
+ALTURA_LINHA_PRODUTO = 40
+COLUNAS_PRODUTOS = [
+    ('nome', "Nome", 250),
+    (None, "Descrição", 330),
+    ('quantidade', "Quantidade", 130),
+    ('preco', "Preço", 130),
+]
 
 class App:
     def __init__(self, page: ft.Page):
         self.page = page
+        if instrumentacao.ativa():
+            logging.basicConfig(level=logging.INFO)
+            instrumentacao.ativar(intervalo_log=instrumentacao.INTERVALO_LOG_PADRAO)
         self.db = Database()
+        # Gravação em grupo para caixas com muito movimento (leitor de código
+        # de barras): a venda é confirmada na tela quando o lote é gravado
+        self.fila_vendas = None
+        if os.environ.get('SISTEMA_VENDAS_GRAVACAO_EM_GRUPO', '') not in ('', '0'):
+            self.fila_vendas = FilaVendas(self.db)
+            atexit.register(self.fila_vendas.encerrar)
+        # Cópia de segurança periódica com o sistema em uso (veja backup.py)
+        self.backup = None
+        horas = os.environ.get('SISTEMA_VENDAS_BACKUP_HORAS', '')
+        if horas not in ('', '0'):
+            self.backup = BackupPeriodico(self.db, float(horas) * 3600)
+            self.backup.start()
         self.setup_page()
         self.setup_routes()
+        self.busca = BuscaAssincrona(self.executar_busca, self.exibir_busca)
+        # Sugestões do seletor de produtos da tela aberta (vendas ou configurar)
+        self.seletor_produto = None
+        self.busca_sugestoes = BuscaAssincrona(self.sugerir_produtos, self.exibir_sugestoes,
+                                               espera=ESPERA_SUGESTOES)
+        self.page.on_close = self.encerrar
         self.page.go("/")
     
+    def encerrar(self, e=None):
+        self.busca.encerrar()
+        self.busca_sugestoes.encerrar()
+        if self.fila_vendas is not None:
+            self.fila_vendas.encerrar()
+        if self.backup is not None:
+            self.backup.parar()
+    
     def setup_page(self):
         self.page.title = "Sistema de Vendas"
         self.page.theme_mode = ft.ThemeMode.LIGHT
@@ -218,14 +250,20 @@ class App:
             "/adicionar": self.adicionar_page,
             "/crud": self.crud_page,
             "/vendas": self.vendas_page,
-            "/configurar": self.configurar_produtos_page
+            "/configurar": self.configurar_produtos_page,
+            "/relatorios": self.relatorios_page,
+            "/reposicao": self.reposicao_page,
+            # Fora do menu: métricas da instrumentação
+            "/diagnostico": self.diagnostico_page,
         }
         self.page.on_route_change = self.route_change
     
     def route_change(self, e):
         self.page.views.clear()
-        self.routes[self.page.route]()
-        self.page.update()
+        rota = self.page.route
+        # Montagem da tela e envio ao cliente (page.update) medidos em separado
+        instrumentacao.medir('rota', rota, self.routes[rota])
+        instrumentacao.medir('render', rota, self.page.update)
     
     def create_nav_bar(self):
         return ft.AppBar(
@@ -240,6 +278,8 @@ class App:
                         ft.PopupMenuItem(text="Gerenciar Produtos", on_click=lambda _: self.page.go("/crud")),
                         ft.PopupMenuItem(text="Registrar Vendas", on_click=lambda _: self.page.go("/vendas")),
                         ft.PopupMenuItem(text="Configurar Produtos", on_click=lambda _: self.page.go("/configurar")),
+                        ft.PopupMenuItem(text="Relatórios", on_click=lambda _: self.page.go("/relatorios")),
+                        ft.PopupMenuItem(text="Reposição", on_click=lambda _: self.page.go("/reposicao")),
                     ]
                 ),
             ],
@@ -287,6 +327,7 @@ class App:
             width=400
         )
         self.preco_field = CurrencyTextField(label="Preço", width=400)
+        self.codigo_field = ft.TextField(label="Código de barras (opcional)", width=400)
         self.status_message = ft.Text("", color=ft.Colors.RED_500)
         
         form = ft.Column(
@@ -297,6 +338,7 @@ class App:
                 self.descricao_field,
                 self.quantidade_field,
                 self.preco_field,
+                self.codigo_field,
                 ft.Row(
                     controls=[
                         ft.ElevatedButton(
@@ -329,25 +371,17 @@ class App:
         )
         self.page.update()
     
+    @medido('evento')
     def salvar_produto(self, e):
         try:
-            # Converter o preço para float
-            preco_str = self.preco_field.value.replace("R$ ", "").replace(".", "").replace(",", ".")
-            preco = float(preco_str) if preco_str else 0.0
-            
             produto = Produto(
                 nome=self.nome_field.value.strip(),
                 descricao=self.descricao_field.value.strip(),
                 quantidade=int(self.quantidade_field.value) if self.quantidade_field.value else 0,
-                preco=preco
+                preco=Dinheiro.de_texto(self.preco_field.value),
+                codigo=self.codigo_field.value.strip(),
             )
-            
-            if not produto.nome:
-                raise ValueError("O nome do produto é obrigatório")
-            if produto.quantidade < 0:
-                raise ValueError("A quantidade não pode ser negativa")
-            if produto.preco <= 0:
-                raise ValueError("O preço deve ser maior que zero")
+            produto.validar()
             
             produto.salvar(self.db)
             self.status_message.value = "✅ Produto salvo com sucesso!"
@@ -367,11 +401,10 @@ class App:
         self.descricao_field.value = ""
         self.quantidade_field.value = ""
         self.preco_field.value = ""
+        self.codigo_field.value = ""
         self.page.update()
     
     def crud_page(self):
-        produtos = Produto.buscar_todos(self.db)
-        
         self.search_field = ft.TextField(
             label="Buscar produto",
             on_change=self.buscar_produtos,
@@ -379,16 +412,27 @@ class App:
             suffix_icon=ft.Icons.SEARCH,
         )
         
-        self.produtos_table = ft.DataTable(
-            columns=[
-                ft.DataColumn(ft.Text("Nome")),
-                ft.DataColumn(ft.Text("Descrição")),
-                ft.DataColumn(ft.Text("Quantidade")),
-                ft.DataColumn(ft.Text("Preço")),
-            ],
-            rows=self.get_produto_rows(produtos),
+        # A grade busca páginas no banco conforme a rolagem chega ao fim e
+        # guarda no máximo MAXIMO_PAGINAS_PRODUTOS delas. Cada página guarda o
+        # cursor de onde começou, o cursor onde terminou e quantas linhas tem;
+        # das que saíram pelo topo fica só o cursor de início.
+        self.produtos_ordem = 'nome'
+        self.produtos_decrescente = False
+        self.produtos_cursor = None
+        self.produtos_fim = False
+        self.produtos_paginas = []
+        self.produtos_anteriores = []
+        self.produtos_lock = threading.Lock()
+        self.produtos_cabecalho = ft.Row(controls=self.get_produto_cabecalho(), width=900)
+        self.produtos_espaco = ft.Container(height=0)
+        self.produtos_lista = ft.ListView(
+            height=400,
             width=900,
+            on_scroll=self.rolar_produtos,
+            on_scroll_interval=100,
         )
+        self.reiniciar_produtos([], None, False)
+        self.carregar_pagina_produtos()
         
         content = ft.Column(
             controls=[
@@ -406,9 +450,9 @@ class App:
                     alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
                 ),
                 ft.Container(
-                    content=ft.ListView(
-                        controls=[self.produtos_table],
-                        height=400,
+                    content=ft.Column(
+                        controls=[self.produtos_cabecalho, ft.Divider(height=1), self.produtos_lista],
+                        spacing=0,
                     ),
                     padding=10,
                 ),
@@ -427,38 +471,162 @@ class App:
         )
         self.page.update()
     
+    def get_produto_cabecalho(self):
+        cabecalho = []
+        for coluna, titulo, largura in COLUNAS_PRODUTOS:
+            if coluna is None:
+                controle = ft.Text(titulo, weight=ft.FontWeight.BOLD)
+            else:
+                if coluna == self.produtos_ordem:
+                    titulo += " ▼" if self.produtos_decrescente else " ▲"
+                controle = ft.TextButton(titulo, on_click=lambda _, c=coluna: self.ordenar_produtos(c))
+            cabecalho.append(ft.Container(content=controle, width=largura))
+        return cabecalho
+    
     def get_produto_rows(self, produtos):
         rows = []
         for produto in produtos:
+            valores = (
+                produto.nome,
+                produto.descricao[:50] + ("..." if len(produto.descricao) > 50 else ""),
+                str(produto.quantidade),
+                produto.preco.formatar(simbolo=False),
+            )
             rows.append(
-                ft.DataRow(
-                    cells=[
-                        ft.DataCell(ft.Text(produto.nome)),
-                        ft.DataCell(ft.Text(produto.descricao[:50] + ("..." if len(produto.descricao) > 50 else ""))),
-                        ft.DataCell(ft.Text(str(produto.quantidade))),
-                        ft.DataCell(ft.Text(locale.currency(produto.preco, grouping=True, symbol=False))),
-                    ]
+                ft.Container(
+                    content=ft.Row(
+                        controls=[
+                            ft.Container(content=ft.Text(valor, no_wrap=True), width=largura)
+                            for valor, (_, _, largura) in zip(valores, COLUNAS_PRODUTOS)
+                        ],
+                    ),
+                    height=ALTURA_LINHA_PRODUTO,
                 )
             )
         return rows
     
+    def pagina_produtos(self, apos):
+        produtos = Produto.buscar_pagina(self.db, PRODUTOS_POR_PAGINA, apos,
+                                         self.produtos_ordem, self.produtos_decrescente)
+        cursor = apos
+        if produtos:
+            ultimo = produtos[-1]
+            cursor = (getattr(ultimo, self.produtos_ordem), ultimo.id)
+        return self.get_produto_rows(produtos), cursor, len(produtos) < PRODUTOS_POR_PAGINA
+    
+    def reiniciar_produtos(self, rows, cursor, fim):
+        # Chamado com produtos_lock (ou antes de a tela existir)
+        self.produtos_espaco.height = 0
+        self.produtos_lista.controls = [self.produtos_espaco, *rows]
+        self.produtos_paginas = [(None, cursor, len(rows))] if rows else []
+        self.produtos_anteriores = []
+        self.produtos_cursor, self.produtos_fim = cursor, fim
+    
+    def carregar_pagina_produtos(self):
+        # Eventos de rolagem chegam em rajada; só uma carga por vez
+        if self.produtos_fim or not self.produtos_lock.acquire(blocking=False):
+            return False
+        try:
+            apos = self.produtos_cursor
+            rows, self.produtos_cursor, self.produtos_fim = self.pagina_produtos(apos)
+            if rows:
+                self.produtos_lista.controls.extend(rows)
+                self.produtos_paginas.append((apos, self.produtos_cursor, len(rows)))
+            # A página mais antiga sai pelo topo e dá lugar a um espaço da
+            # mesma altura
+            while len(self.produtos_paginas) > MAXIMO_PAGINAS_PRODUTOS:
+                inicio, _, linhas = self.produtos_paginas.pop(0)
+                del self.produtos_lista.controls[1:1 + linhas]
+                self.produtos_anteriores.append(inicio)
+                self.produtos_espaco.height += linhas * ALTURA_LINHA_PRODUTO
+        finally:
+            self.produtos_lock.release()
+        return True
+    
+    def carregar_pagina_anterior_produtos(self):
+        if not self.produtos_anteriores or not self.produtos_lock.acquire(blocking=False):
+            return False
+        try:
+            inicio = self.produtos_anteriores.pop()
+            rows, cursor, _ = self.pagina_produtos(inicio)
+            if rows:
+                self.produtos_lista.controls[1:1] = rows
+                self.produtos_paginas.insert(0, (inicio, cursor, len(rows)))
+            # Se o catálogo mudou desde a primeira carga a página pode ter
+            # outro tamanho; sem páginas acima, o espaço some de vez
+            self.produtos_espaco.height = (max(0, self.produtos_espaco.height - len(rows) * ALTURA_LINHA_PRODUTO)
+                                           if self.produtos_anteriores else 0)
+            # E a página mais distante sai pelo fim; a rolagem para baixo
+            # volta a buscá-la a partir do cursor da que ficou por último
+            while len(self.produtos_paginas) > MAXIMO_PAGINAS_PRODUTOS:
+                _, _, linhas = self.produtos_paginas.pop()
+                del self.produtos_lista.controls[-linhas:]
+                self.produtos_cursor, self.produtos_fim = self.produtos_paginas[-1][1], False
+        finally:
+            self.produtos_lock.release()
+        return True
+    
+    def rolar_produtos(self, e):
+        margem = ALTURA_LINHA_PRODUTO * PRODUTOS_POR_PAGINA / 2
+        if e.pixels >= e.max_scroll_extent - margem:
+            carregou = self.carregar_pagina_produtos()
+        elif e.pixels <= self.produtos_espaco.height + margem:
+            carregou = self.carregar_pagina_anterior_produtos()
+        else:
+            return
+        if carregou:
+            self.produtos_lista.update()
+    
+    @medido('evento')
+    def ordenar_produtos(self, coluna):
+        if coluna == self.produtos_ordem:
+            self.produtos_decrescente = not self.produtos_decrescente
+        else:
+            self.produtos_ordem = coluna
+            self.produtos_decrescente = False
+        self.produtos_cabecalho.controls = self.get_produto_cabecalho()
+        # A ordenação vale para o catálogo inteiro; a busca por texto é
+        # ordenada por relevância, então é descartada. A primeira página vem
+        # pela própria thread de busca: uma busca ainda pendente fica obsoleta
+        # e não sobrescreve a grade depois.
+        self.search_field.value = ""
+        self.busca.solicitar("", imediata=True)
+        self.page.update()
+    
+    @medido('evento')
     def buscar_produtos(self, e):
-        termo = self.search_field.value.strip()
+        self.busca.solicitar(self.search_field.value.strip())
+    
+    @medido('evento')
+    def sugerir_produtos(self, texto):
+        # Roda na thread de sugestões
+        return Produto.sugerir(self.db, texto)
+    
+    def exibir_sugestoes(self, texto, produtos):
+        if self.seletor_produto is None or self.page.route not in ("/vendas", "/configurar"):
+            return
+        self.seletor_produto.exibir(texto, produtos)
+    
+    @medido('evento')
+    def executar_busca(self, termo):
+        # Roda na thread de busca: consulta e monta as linhas da tabela. A
+        # busca por texto traz só os modelos.LIMITE_BUSCA mais relevantes, sem paginar;
+        # termo vazio volta para a primeira página do catálogo.
         if termo:
-            produtos = [p for p in Produto.buscar_todos(self.db) if termo.lower() in p.nome.lower()]
-        else:
-            produtos = Produto.buscar_todos(self.db)
-        
-        self.produtos_table.rows = self.get_produto_rows(produtos)
-        self.produtos_table.update()
+            return self.get_produto_rows(Produto.pesquisar(self.db, termo)), None, True
+        return self.pagina_produtos(None)
+    
+    def exibir_busca(self, termo, resultado):
+        if self.page.route != "/crud":
+            return  # o usuário já saiu da tela de produtos
+        with self.produtos_lock:
+            self.reiniciar_produtos(*resultado)
+        self.produtos_lista.update()
     
     def vendas_page(self):
-        produtos = Produto.buscar_todos(self.db)
-        self.produto_dropdown = ft.Dropdown(
-            options=[ft.dropdown.Option(key=p.id, text=p.nome) for p in produtos],
-            label="Selecione o Produto",
-            width=400,
-        )
+        self.seletor_produto = SeletorProduto(self.db, self.busca_sugestoes.solicitar,
+                                              self.on_produto_venda_selecionado)
+        self.estoque_venda = ft.Text("")
         self.quantidade_venda = ft.TextField(
             label="Quantidade",
             input_filter=ft.NumbersOnlyInputFilter(),
@@ -466,37 +634,42 @@ class App:
         )
         self.venda_status = ft.Text("", color=ft.Colors.RED_500)
         
-        # Tabela de vendas recentes
-        vendas = Venda.buscar_todas(self.db)[:10]
-        vendas_table = ft.DataTable(
+        # Tabela de vendas recentes, carregada página a página
+        self.vendas_table = ft.DataTable(
             columns=[
                 ft.DataColumn(ft.Text("Produto")),
                 ft.DataColumn(ft.Text("Quantidade")),
                 ft.DataColumn(ft.Text("Total")),
                 ft.DataColumn(ft.Text("Data")),
             ],
-            rows=[
-                ft.DataRow(
-                    cells=[
-                        ft.DataCell(ft.Text(v.nome_produto)),
-                        ft.DataCell(ft.Text(str(v.quantidade))),
-                        ft.DataCell(ft.Text(locale.currency(v.valor_total, grouping=True))),
-                        ft.DataCell(ft.Text(v.data_venda)),
-                    ]
-                ) for v in vendas
-            ],
+            rows=[],
             width=900,
         )
+        self.carregar_mais_button = ft.TextButton(
+            "Carregar mais",
+            on_click=self.carregar_mais_vendas,
+            icon=ft.Icons.EXPAND_MORE,
+        )
+        self.vendas_exibidas = []
+        self.vendas_cursor = None
+        self.carregar_pagina_vendas()
         
-        # Relatório de vendas
-        total_vendas = Venda.calcular_total_vendas(self.db)
+        # Relatório de vendas; depois de cada venda é ajustado pela diferença
+        self.resumo_vendas = Venda.resumo_vendas(self.db)
+        self.resumo_dia = datetime.now().strftime('%Y-%m-%d')
+        self.total_vendas_text = ft.Text("", size=16)
+        self.contagem_vendas_text = ft.Text("", size=16)
+        self.vendas_hoje_text = ft.Text("", size=16)
+        self.exibir_resumo_vendas()
         relatorio = ft.Card(
             content=ft.Container(
                 content=ft.Column(
                     controls=[
                         ft.Text("Relatório de Vendas", size=20, weight=ft.FontWeight.BOLD),
                         ft.Divider(),
-                        ft.Text(f"Total de Vendas: {locale.currency(total_vendas, grouping=True)}", size=16),
+                        self.total_vendas_text,
+                        self.contagem_vendas_text,
+                        self.vendas_hoje_text,
                     ],
                     spacing=10,
                 ),
@@ -511,11 +684,12 @@ class App:
                 ft.Divider(),
                 ft.Row(
                     controls=[
-                        self.produto_dropdown,
+                        self.seletor_produto,
                         self.quantidade_venda,
                     ],
                     spacing=20,
                 ),
+                self.estoque_venda,
                 ft.ElevatedButton(
                     "Registrar Venda",
                     on_click=self.registrar_venda,
@@ -527,11 +701,12 @@ class App:
                 ft.Text("Últimas Vendas", size=20),
                 ft.Container(
                     content=ft.ListView(
-                        controls=[vendas_table],
+                        controls=[self.vendas_table],
                         height=300,
                     ),
                     padding=10,
                 ),
+                self.carregar_mais_button,
             ],
             spacing=20,
             horizontal_alignment=ft.CrossAxisAlignment.CENTER,
@@ -548,8 +723,73 @@ class App:
         )
         self.page.update()
     
+    def get_venda_row(self, venda):
+        return ft.DataRow(
+            cells=[
+                ft.DataCell(ft.Text(venda.nome_produto)),
+                ft.DataCell(ft.Text(str(venda.quantidade))),
+                ft.DataCell(ft.Text(venda.valor_total.formatar())),
+                ft.DataCell(ft.Text(venda.data_venda)),
+            ]
+        )
+    
+    def carregar_pagina_vendas(self):
+        vendas = Venda.buscar_linhas(self.db, VENDAS_POR_PAGINA, self.vendas_cursor)
+        self.vendas_table.rows.extend(self.get_venda_row(v) for v in vendas)
+        self.vendas_exibidas.extend(vendas)
+        if vendas:
+            self.vendas_cursor = (vendas[-1].data_venda, vendas[-1].id)
+        # Página incompleta significa que o histórico acabou
+        self.carregar_mais_button.visible = len(vendas) == VENDAS_POR_PAGINA
+    
+    def exibir_resumo_vendas(self):
+        resumo = self.resumo_vendas
+        self.total_vendas_text.value = f"Total de Vendas: {resumo['receita'].formatar()}"
+        self.contagem_vendas_text.value = f"Vendas registradas: {resumo['num_vendas']} ({resumo['unidades']} itens)"
+        self.vendas_hoje_text.value = (f"Vendas hoje: {resumo['receita_hoje'].formatar()} "
+                                       f"em {resumo['num_vendas_hoje']} vendas")
+    
+    def exibir_venda_registrada(self, venda):
+        # Atualiza a tela no lugar, sem refazer a rota: a venda entra no topo
+        # da tabela, o resumo soma a diferença e só o estoque do produto muda
+        self.vendas_table.rows.insert(0, self.get_venda_row(venda))
+        self.vendas_exibidas.insert(0, venda)
+        if len(self.vendas_exibidas) > MAXIMO_VENDAS_EXIBIDAS:
+            del self.vendas_table.rows[MAXIMO_VENDAS_EXIBIDAS:]
+            del self.vendas_exibidas[MAXIMO_VENDAS_EXIBIDAS:]
+            ultima = self.vendas_exibidas[-1]
+            self.vendas_cursor = (ultima.data_venda, ultima.id)
+            self.carregar_mais_button.visible = True
+        
+        resumo = self.resumo_vendas
+        if venda.data_venda[:10] != self.resumo_dia:
+            # Virou o dia com a tela aberta
+            self.resumo_dia = venda.data_venda[:10]
+            resumo['receita_hoje'] = Dinheiro(0)
+            resumo['num_vendas_hoje'] = 0
+        resumo['receita'] += venda.valor_total
+        resumo['unidades'] += venda.quantidade
+        resumo['num_vendas'] += 1
+        resumo['receita_hoje'] += venda.valor_total
+        resumo['num_vendas_hoje'] += 1
+        self.exibir_resumo_vendas()
+    
+    def exibir_estoque_venda(self, quantidade):
+        self.estoque_venda.value = "" if quantidade is None else f"Em estoque: {quantidade}"
+    
+    def on_produto_venda_selecionado(self, produto):
+        self.exibir_estoque_venda(produto.quantidade)
+        self.estoque_venda.update()
+        self.quantidade_venda.focus()
+    
+    @medido('evento')
+    def carregar_mais_vendas(self, e):
+        self.carregar_pagina_vendas()
+        self.page.update()
+    
+    @medido('evento')
     def registrar_venda(self, e):
-        if not self.produto_dropdown.value:
+        if not self.seletor_produto.value:
             self.venda_status.value = "❌ Selecione um produto"
             self.venda_status.update()
             return
@@ -559,37 +799,337 @@ class App:
             self.venda_status.update()
             return
         
+        venda = Venda(
+            produto_id=self.seletor_produto.value,
+            quantidade=int(self.quantidade_venda.value),
+        )
+        if self.fila_vendas is not None:
+            # Libera o caixa na hora; o resultado chega pela thread de gravação
+            self.quantidade_venda.value = ""
+            self.quantidade_venda.update()
+            self.quantidade_venda.focus()
+            try:
+                futuro = self.fila_vendas.enviar(venda)
+            except ValueError as e:
+                self.concluir_venda(venda, e)
+                return
+            futuro.add_done_callback(lambda f: self.concluir_venda(venda, f.exception()))
+            return
+        
         try:
-            venda = Venda(
-                produto_id=int(self.produto_dropdown.value),
-                quantidade=int(self.quantidade_venda.value),
-            )
-            
             venda.registrar(self.db)
-            self.venda_status.value = "✅ Venda registrada com sucesso!"
-            self.venda_status.color = ft.Colors.GREEN
-            self.quantidade_venda.value = ""
-            self.page.go("/vendas") 
-            self.venda_status.update() # Recarrega a página para atualizar os dados  
         except ValueError as e:
-            self.venda_status.value = f"❌ {str(e)}"
+            self.concluir_venda(venda, e)
+            return
+        self.quantidade_venda.value = ""
+        self.concluir_venda(venda)
+        self.quantidade_venda.focus()
+    
+    def concluir_venda(self, venda, erro=None):
+        if self.page.route != "/vendas":
+            return  # o usuário já saiu da tela de vendas
+        if erro is not None:
+            self.venda_status.value = f"❌ {str(erro)}"
             self.venda_status.color = ft.Colors.RED
             self.venda_status.update()
+            return
+        # Nome e estoque restante vieram do próprio UPDATE ... RETURNING da
+        # venda: nada é lido do banco nem do catálogo
+        self.exibir_venda_registrada(venda)
+        if venda.produto_id == self.seletor_produto.value:
+            self.exibir_estoque_venda(venda.estoque_restante)
+        self.venda_status.value = "✅ Venda registrada com sucesso!"
+        self.venda_status.color = ft.Colors.GREEN
+        # Leitura de uma linha da tabela de reposição, pré-calculada pelo trigger
+        alerta = reposicao.verificar_produto(self.db, venda.produto_id)
+        if alerta:
+            self.venda_status.value += (f" ⚠️ {alerta['nome']}: estoque para {alerta['dias_cobertura']:.1f} dias"
+                                        f" (sugestão de compra: {alerta['sugerido']})")
+            self.venda_status.color = ft.Colors.ORANGE
+        self.page.update(self.vendas_table, self.total_vendas_text, self.contagem_vendas_text,
+                         self.vendas_hoje_text, self.estoque_venda, self.carregar_mais_button,
+                         self.quantidade_venda, self.venda_status)
 
-    def configurar_produtos_page(self):
-        produtos = Produto.buscar_todos(self.db)
+    def reposicao_page(self):
+        config = reposicao.parametros(self.db)
+        self.reposicao_minima = ft.TextField(
+            label="Alertar abaixo de (dias)",
+            value=f"{config['cobertura_minima_dias']:g}",
+            width=200,
+        )
+        self.reposicao_alvo = ft.TextField(
+            label="Comprar para cobrir (dias)",
+            value=f"{config['cobertura_alvo_dias']:g}",
+            width=200,
+        )
+        self.reposicao_meia_vida = ft.TextField(
+            label="Meia-vida da média (dias)",
+            value=f"{config['meia_vida_dias']:g}",
+            width=200,
+        )
+        self.reposicao_status = ft.Text("", color=ft.Colors.RED_500)
+        self.reposicao_table = ft.DataTable(
+            columns=[
+                ft.DataColumn(ft.Text("Produto")),
+                ft.DataColumn(ft.Text("Estoque")),
+                ft.DataColumn(ft.Text("Vendas/dia")),
+                ft.DataColumn(ft.Text("Dias de estoque")),
+                ft.DataColumn(ft.Text("Comprar")),
+            ],
+            rows=[],
+            width=900,
+        )
         
-        self.produto_dropdown = ft.Dropdown(
-            options=[ft.dropdown.Option(key=p.id, text=p.nome) for p in produtos],
-            label="Selecione o Produto",
-            width=400,
-            on_change=self.on_produto_selecionado
+        content = ft.Column(
+            controls=[
+                ft.Text("Reposição de Estoque", size=25, weight=ft.FontWeight.BOLD),
+                ft.Divider(),
+                ft.Row(
+                    controls=[
+                        self.reposicao_minima,
+                        self.reposicao_alvo,
+                        self.reposicao_meia_vida,
+                        ft.ElevatedButton(
+                            "Salvar",
+                            on_click=self.salvar_parametros_reposicao,
+                            icon=ft.Icons.SAVE,
+                        ),
+                    ],
+                    spacing=20,
+                ),
+                self.reposicao_status,
+                ft.Container(
+                    content=ft.ListView(
+                        controls=[self.reposicao_table],
+                        height=400,
+                    ),
+                    padding=10,
+                ),
+            ],
+            spacing=20,
+            horizontal_alignment=ft.CrossAxisAlignment.CENTER,
+            scroll=ft.ScrollMode.AUTO,
+        )
+        
+        self.page.views.append(
+            ft.View(
+                "/reposicao",
+                [self.create_nav_bar(), content],
+                padding=20,
+                scroll=ft.ScrollMode.AUTO,
+            )
+        )
+        self.carregar_reposicao()
+    
+    def carregar_reposicao(self):
+        self.reposicao_table.rows = [
+            ft.DataRow(
+                cells=[
+                    ft.DataCell(ft.Text(item['nome'])),
+                    ft.DataCell(ft.Text(str(item['quantidade']))),
+                    ft.DataCell(ft.Text(f"{item['velocidade']:.2f}")),
+                    ft.DataCell(ft.Text(f"{item['dias_cobertura']:.1f}")),
+                    ft.DataCell(ft.Text(str(item['sugerido']))),
+                ]
+            ) for item in reposicao.lista_reposicao(self.db)
+        ]
+    
+    @medido('evento')
+    def salvar_parametros_reposicao(self, e):
+        try:
+            try:
+                dias = [float(campo.value.strip().replace(',', '.'))
+                        for campo in (self.reposicao_meia_vida, self.reposicao_minima, self.reposicao_alvo)]
+            except ValueError:
+                raise ValueError("Informe os dias em números")
+            reposicao.definir_parametros(self.db, *dias)
+        except ValueError as ex:
+            self.reposicao_status.value = f"❌ {str(ex)}"
+            self.reposicao_status.color = ft.Colors.RED
+            self.page.update()
+            return
+        self.reposicao_status.value = "✅ Parâmetros salvos"
+        self.reposicao_status.color = ft.Colors.GREEN
+        self.carregar_reposicao()
+        self.page.update()
+    
+    def relatorios_page(self):
+        hoje = datetime.now().date()
+        self.relatorio_inicio = ft.TextField(
+            label="Data inicial (AAAA-MM-DD)",
+            value=(hoje - timedelta(days=30)).isoformat(),
+            width=250,
+        )
+        self.relatorio_fim = ft.TextField(label="Data final (AAAA-MM-DD)", value=hoje.isoformat(), width=250)
+        self.relatorio_status = ft.Text("", color=ft.Colors.RED_500)
+        self.relatorio_resultado = ft.Column(spacing=20)
+        
+        content = ft.Column(
+            controls=[
+                ft.Text("Relatórios de Vendas", size=25, weight=ft.FontWeight.BOLD),
+                ft.Divider(),
+                ft.Row(
+                    controls=[
+                        self.relatorio_inicio,
+                        self.relatorio_fim,
+                        ft.ElevatedButton(
+                            "Gerar",
+                            on_click=self.gerar_relatorios,
+                            icon=ft.Icons.BAR_CHART,
+                        ),
+                    ],
+                    spacing=20,
+                ),
+                self.relatorio_status,
+                self.relatorio_resultado,
+            ],
+            spacing=20,
+            horizontal_alignment=ft.CrossAxisAlignment.CENTER,
+            scroll=ft.ScrollMode.AUTO,
+        )
+        
+        self.page.views.append(
+            ft.View(
+                "/relatorios",
+                [self.create_nav_bar(), content],
+                padding=20,
+                scroll=ft.ScrollMode.AUTO,
+            )
+        )
+        self.gerar_relatorios(None)
+    
+    @medido('evento')
+    def gerar_relatorios(self, e):
+        try:
+            inicio = datetime.strptime(self.relatorio_inicio.value.strip(), '%Y-%m-%d').date()
+            fim = datetime.strptime(self.relatorio_fim.value.strip(), '%Y-%m-%d').date()
+            if inicio > fim:
+                raise ValueError("A data inicial deve ser anterior à final")
+        except ValueError as ex:
+            self.relatorio_status.value = f"❌ Período inválido: {str(ex)}"
+            self.page.update()
+            return
+        self.relatorio_status.value = ""
+        
+        totais = relatorios.totais_periodo(self.db, inicio, fim)
+        por_dia = relatorios.vendas_por_dia(self.db, inicio, fim)
+        top = relatorios.top_produtos(self.db, 10, inicio, fim)
+        por_hora = [h for h in relatorios.vendas_por_hora(self.db, inicio, fim) if h['num_vendas']]
+        
+        def tabela(titulos, linhas):
+            return ft.DataTable(
+                columns=[ft.DataColumn(ft.Text(t)) for t in titulos],
+                rows=[ft.DataRow(cells=[ft.DataCell(ft.Text(str(v))) for v in linha]) for linha in linhas],
+                width=900,
+            )
+        
+        self.relatorio_resultado.controls = [
+            ft.Card(
+                content=ft.Container(
+                    content=ft.Column(
+                        controls=[
+                            ft.Text(f"Receita no período: {totais['receita'].formatar()}", size=16),
+                            ft.Text(f"Vendas: {totais['num_vendas']} ({totais['unidades']} itens)", size=16),
+                        ],
+                        spacing=10,
+                    ),
+                    padding=15,
+                ),
+                width=900,
+            ),
+            ft.Text("Mais vendidos", size=20),
+            tabela(["Produto", "Quantidade", "Vendas", "Receita"],
+                   [(p['nome'], p['unidades'], p['num_vendas'], p['receita'].formatar()) for p in top]),
+            ft.Text("Vendas por dia", size=20),
+            tabela(["Dia", "Quantidade", "Vendas", "Receita"],
+                   [(d['dia'], d['unidades'], d['num_vendas'], d['receita'].formatar()) for d in por_dia]),
+            ft.Text("Vendas por hora do dia", size=20),
+            tabela(["Hora", "Quantidade", "Vendas", "Receita"],
+                   [(f"{h['hora']:02d}h", h['unidades'], h['num_vendas'], h['receita'].formatar()) for h in por_hora]),
+        ]
+        self.page.update()
+    
+    def diagnostico_page(self):
+        self.diagnostico_status = ft.Text("")
+        self.diagnostico_resultado = ft.Column(spacing=20)
+        
+        content = ft.Column(
+            controls=[
+                ft.Text("Diagnóstico de desempenho", size=25, weight=ft.FontWeight.BOLD),
+                ft.Divider(),
+                ft.Row(
+                    controls=[
+                        ft.ElevatedButton("Atualizar", on_click=self.atualizar_diagnostico, icon=ft.Icons.REFRESH),
+                        ft.ElevatedButton("Zerar", on_click=self.zerar_diagnostico, icon=ft.Icons.DELETE_SWEEP),
+                    ],
+                    spacing=20,
+                ),
+                self.diagnostico_status,
+                self.diagnostico_resultado,
+            ],
+            spacing=20,
+            horizontal_alignment=ft.CrossAxisAlignment.CENTER,
+            scroll=ft.ScrollMode.AUTO,
         )
         
+        self.page.views.append(
+            ft.View(
+                "/diagnostico",
+                [self.create_nav_bar(), content],
+                padding=20,
+                scroll=ft.ScrollMode.AUTO,
+            )
+        )
+        self.montar_diagnostico()
+    
+    def montar_diagnostico(self):
+        if not instrumentacao.ativa():
+            self.diagnostico_status.value = "Instrumentação desligada (SISTEMA_VENDAS_INSTRUMENTACAO=1 para ligar)"
+        else:
+            self.diagnostico_status.value = ""
+        
+        def tabela(titulo, tipos):
+            linhas = [m for m in instrumentacao.METRICAS.resumo() if m['tipo'] in tipos]
+            return [
+                ft.Text(titulo, size=20),
+                ft.DataTable(
+                    columns=[ft.DataColumn(ft.Text(t)) for t in
+                             ["Tipo", "Nome", "Chamadas", "Linhas", "p50 (ms)", "p95 (ms)", "p99 (ms)", "Total (ms)"]],
+                    rows=[
+                        ft.DataRow(cells=[ft.DataCell(ft.Text(str(v))) for v in (
+                            m['tipo'], m['nome'][:80], m['chamadas'], m['linhas'],
+                            m['p50_ms'], m['p95_ms'], m['p99_ms'], m['total_ms'])])
+                        for m in linhas
+                    ],
+                    width=1000,
+                ),
+            ]
+        
+        self.diagnostico_resultado.controls = (
+            tabela("Rotas e eventos", ('rota', 'render', 'evento'))
+            + tabela("Consultas", ('sql',))
+        )
+    
+    def atualizar_diagnostico(self, e):
+        self.montar_diagnostico()
+        self.page.update()
+    
+    def zerar_diagnostico(self, e):
+        instrumentacao.METRICAS.limpar()
+        self.atualizar_diagnostico(e)
+    
+    def configurar_produtos_page(self):
+        self.seletor_produto = SeletorProduto(self.db, self.busca_sugestoes.solicitar,
+                                              self.on_produto_selecionado)
+        # Produto como estava quando foi selecionado: a versão e o estoque
+        # lidos decidem o que salvar_alteracoes grava
+        self.produto_editado = None
+        
         self.edit_nome = ft.TextField(label="Nome", width=400)
         self.edit_descricao = ft.TextField(label="Descrição", multiline=True, width=400)
         self.edit_quantidade = ft.TextField(label="Quantidade", width=400, input_filter=ft.NumbersOnlyInputFilter())
         self.edit_preco = CurrencyTextField(label="Preço", width=400)
+        self.edit_codigo = ft.TextField(label="Código de barras (opcional)", width=400)
         
         self.status_message = ft.Text("", color=ft.Colors.RED_500)
         
@@ -597,11 +1137,12 @@ class App:
             controls=[
                 ft.Text("Configurar Produto", size=25, weight=ft.FontWeight.BOLD),
                 ft.Divider(),
-                self.produto_dropdown,
+                self.seletor_produto,
                 self.edit_nome,
                 self.edit_descricao,
                 self.edit_quantidade,
                 self.edit_preco,
+                self.edit_codigo,
                 ft.Row(
                     controls=[
                         ft.ElevatedButton(
@@ -635,51 +1176,74 @@ class App:
         )
         self.page.update()
     
-    def on_produto_selecionado(self, e):
-        produto_id = self.produto_dropdown.value
-        if produto_id:
-            produto = Produto.buscar_por_id(self.db, produto_id)
-            if produto:
-                self.edit_nome.value = produto.nome
-                self.edit_descricao.value = produto.descricao
-                self.edit_quantidade.value = str(produto.quantidade)
-                self.edit_preco.value = locale.currency(produto.preco, grouping=True, symbol=False)
-                self.page.update()
+    @medido('evento')
+    def on_produto_selecionado(self, produto):
+        self.produto_editado = produto
+        self.edit_nome.value = produto.nome
+        self.edit_descricao.value = produto.descricao
+        self.edit_quantidade.value = str(produto.quantidade)
+        self.edit_preco.value = produto.preco.formatar(simbolo=False)
+        self.edit_codigo.value = produto.codigo or ""
+        self.page.update()
     
+    @medido('evento')
     def salvar_alteracoes(self, e):
+        produto = None
         try:
-            produto_id = self.produto_dropdown.value
-            if not produto_id:
+            if not self.seletor_produto.value or self.produto_editado is None:
                 raise ValueError("Selecione um produto para editar.")
             
-            produto = Produto.buscar_por_id(self.db, produto_id)
-            if not produto:
-                raise ValueError("Produto não encontrado.")
-            
+            # Não relê o produto: gravar sobre a versão de agora apagaria o
+            # que outra pessoa alterou desde que ele foi aberto aqui
+            produto = self.produto_editado.copiar()
             produto.nome = self.edit_nome.value.strip()
             produto.descricao = self.edit_descricao.value.strip()
             produto.quantidade = int(self.edit_quantidade.value)
-            preco_str = self.edit_preco.value.replace("R$ ", "").replace(".", "").replace(",", ".")
-            produto.preco = float(preco_str) if preco_str else 0.0
-            
-            if not produto.nome:
-                raise ValueError("O nome do produto é obrigatório.")
-            if produto.quantidade < 0:
-                raise ValueError("A quantidade não pode ser negativa.")
-            if produto.preco <= 0:
-                raise ValueError("O preço deve ser maior que zero.")
+            produto.preco = Dinheiro.de_texto(self.edit_preco.value)
+            produto.codigo = self.edit_codigo.value.strip() or None
+            produto.validar()
             
             produto.salvar(self.db)
+            self.produto_editado = produto
+            self.seletor_produto.campo.value = produto.nome
+            # Inclui as vendas feitas enquanto o produto estava aberto
+            self.edit_quantidade.value = str(produto.quantidade)
             self.status_message.value = "✅ Produto atualizado com sucesso!"
             self.status_message.color = ft.Colors.GREEN
             self.page.update()
+        except ConflitoDeVersao as e:
+            self.exibir_conflito(produto, e)
         except ValueError as e:
             self.status_message.value = f"❌ Erro: {str(e)}"
             self.status_message.color = ft.Colors.RED
             self.page.update()
     
+    def exibir_conflito(self, produto, erro):
+        # Outra pessoa salvou o produto depois que ele foi aberto aqui. Os
+        # campos ficam com o que o usuário digitou, agora sobre a versão
+        # atual, e salvar de novo reaplica a edição; o ajuste de estoque
+        # continua sendo a mesma diferença, somada ao estoque de agora.
+        anterior, atual = self.produto_editado, erro.atual
+        mudancas = []
+        if atual.nome != anterior.nome:
+            mudancas.append(f"nome: {atual.nome}")
+        if atual.descricao != anterior.descricao:
+            mudancas.append(f"descrição: {atual.descricao}")
+        if atual.preco != anterior.preco:
+            mudancas.append(f"preço: {atual.preco.formatar()}")
+        if atual.codigo != anterior.codigo:
+            mudancas.append(f"código: {atual.codigo or 'nenhum'}")
+        self.produto_editado = atual
+        self.edit_quantidade.value = str(atual.quantidade + produto.quantidade - produto.quantidade_lida)
+        detalhes = f" ({'; '.join(mudancas)})" if mudancas else ""
+        self.status_message.value = (f"⚠️ {erro}{detalhes}. Seus valores foram mantidos; "
+                                     f"salve de novo para aplicá-los.")
+        self.status_message.color = ft.Colors.ORANGE
+        self.page.update()
+    
+    @medido('evento')
     def excluir_produto(self, e):
-        produto_id = self.produto_dropdown.value
+        produto_id = self.seletor_produto.value
         if not produto_id:
             self.status_message.value = "❌ Selecione um produto para excluir."
             self.status_message.color = ft.Colors.RED
@@ -699,15 +1263,14 @@ class App:
                 self.status_message.value = "✅ Produto removido com sucesso!"
                 self.status_message.color = ft.Colors.GREEN
                 
-                # Atualiza o dropdown de produtos
-                self.produto_dropdown.options = [ft.dropdown.Option(key=p.id, text=p.nome) for p in Produto.buscar_todos(self.db)]
-                self.produto_dropdown.value = None  # Limpa a seleção do dropdown
-                
-                # Limpa os campos de edição
+                # Limpa o seletor e os campos de edição
+                self.seletor_produto.limpar()
+                self.produto_editado = None
                 self.edit_nome.value = ""
                 self.edit_descricao.value = ""
                 self.edit_quantidade.value = ""
                 self.edit_preco.value = ""
+                self.edit_codigo.value = ""
                 self.page.update()
             except ValueError as e:
                 self.status_message.value = f"❌ Não foi possível remover: {str(e)}"
@@ -730,6 +1293,7 @@ class App:
         self.page.update()
 
 def main(page: ft.Page):
+    configurar_locale()
     app = App(page)
 
 if __name__ == "__main__":
@@ -0,0 +1,372 @@
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+from datetime import date
+
+import migracoes
+from modelos import Database
+
+# Arquivamento das vendas de meses fechados em bancos separados, um por ano
+# (sistema_vendas-2024.db, na mesma pasta do banco principal), para que a
+# tabela vendas guarde só os meses recentes.
+#
+# Cada mês é movido em lotes por faixa de id, em duas transações por lote:
+# a cópia para o arquivo (INSERT OR IGNORE, só lê o banco principal) e a
+# remoção do banco principal junto com o avanço da marca ultimo_id do mês em
+# arquivos_vendas. O caixa só espera pela remoção de um lote. Se o processo
+# cair entre as duas, a próxima execução copia de novo (ignorado) e remove.
+#
+# As tabelas de totais não mudam: vendas só tem trigger de inserção, então
+# vendas_totais, vendas_diarias e vendas_por_produto continuam contando as
+# vendas arquivadas, e os relatórios que leem só delas não anexam nada.
+#
+# Consultas que leem vendas linha a linha usam vendas_do_periodo(). Se o
+# período não chega a nenhum mês arquivado, é a consulta de sempre. Senão,
+# os arquivos do período são anexados (ATTACH) a uma conexão de leitura e
+# unidos à tabela vendas; do arquivo só entram as linhas com id até a marca
+# do mês, lida na mesma transação da consulta, para que um lote já copiado
+# e ainda não removido não conte duas vezes.
+#
+#   python arquivamento.py --manter-meses 3
+
+MESES_MANTIDOS_PADRAO = 3
+TAMANHO_LOTE_PADRAO = 2000
+PAUSA_PADRAO = 0.01
+COLUNAS = 'id, produto_id, quantidade, data_venda, valor_total'
+
+
+class ResultadoArquivamento:
+    def __init__(self):
+        self.meses = {}
+        self.arquivadas = 0
+        self.lotes = 0
+        self.maior_bloqueio_ms = 0.0
+
+
+def _inicio_mes(mes):
+    return f"{mes}-01 00:00:00"
+
+
+def _proximo_mes(mes):
+    ano, numero = int(mes[:4]), int(mes[5:7])
+    return f"{ano + numero // 12:04d}-{numero % 12 + 1:02d}"
+
+
+def limite_arquivamento(manter_meses, hoje=None):
+    # Primeiro mês que fica no banco principal: o atual menos manter_meses
+    if manter_meses < 0:
+        raise ValueError("O número de meses mantidos não pode ser negativo")
+    hoje = hoje or date.today()
+    indice = hoje.year * 12 + hoje.month - 1 - manter_meses
+    return f"{indice // 12:04d}-{indice % 12 + 1:02d}"
+
+
+def nome_arquivo(db, ano):
+    # Relativo à pasta do banco, como fica gravado em arquivos_vendas
+    base = os.path.splitext(os.path.basename(db.db_name))[0]
+    return f"{base}-{ano}.db"
+
+
+def caminho_arquivo(db, arquivo):
+    return os.path.join(os.path.dirname(os.path.abspath(db.db_name)), arquivo)
+
+
+def meses_a_arquivar(cursor, limite):
+    # Meses com vendas antes de "limite", um salto pelo índice de data por mês
+    meses = []
+    inicio = ''
+    while True:
+        cursor.execute('SELECT MIN(data_venda) FROM vendas WHERE data_venda >= ? AND data_venda < ?',
+                       (inicio, _inicio_mes(limite)))
+        primeira = cursor.fetchone()[0]
+        if primeira is None:
+            return meses
+        meses.append(primeira[:7])
+        inicio = _inicio_mes(_proximo_mes(primeira[:7]))
+
+
+def _criar_arquivo(cursor, esquema):
+    # Mesmas colunas e índices de cobertura da tabela vendas, sem chaves
+    # estrangeiras: os produtos ficam no banco principal
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {esquema}.vendas (
+            id INTEGER PRIMARY KEY,
+            produto_id INTEGER NOT NULL,
+            quantidade INTEGER NOT NULL,
+            data_venda TEXT NOT NULL,
+            valor_total INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute(f'''
+        CREATE INDEX IF NOT EXISTS {esquema}.idx_vendas_data_cobertura
+        ON vendas (data_venda, produto_id, quantidade, valor_total)
+    ''')
+    cursor.execute(f'''
+        CREATE INDEX IF NOT EXISTS {esquema}.idx_vendas_produto_data
+        ON vendas (produto_id, data_venda, quantidade, valor_total)
+    ''')
+
+
+def _arquivar_mes(cursor, mes, arquivo, tamanho_lote, pausa, resultado):
+    conn = cursor.connection
+    inicio, fim = _inicio_mes(mes), _inicio_mes(_proximo_mes(mes))
+    cursor.execute('SELECT MIN(id), MAX(id) FROM vendas WHERE data_venda >= ? AND data_venda < ?', (inicio, fim))
+    menor, maior = cursor.fetchone()
+    if menor is None:
+        return
+    # Vendas do mês que chegam depois do arquivamento têm id maior que a
+    # marca; a próxima execução continua dela
+    cursor.execute('''
+        INSERT INTO arquivos_vendas (mes, arquivo, ultimo_id) VALUES (?, ?, ?)
+        ON CONFLICT(mes) DO UPDATE SET ultimo_id = max(ultimo_id, excluded.ultimo_id)
+        RETURNING ultimo_id
+    ''', (mes, arquivo, menor - 1))
+    atual = cursor.fetchone()[0]
+    conn.commit()
+
+    while atual < maior:
+        proximo = min(atual + tamanho_lote, maior)
+        cursor.execute(f'''
+            INSERT OR IGNORE INTO arquivo.vendas ({COLUNAS})
+            SELECT {COLUNAS} FROM main.vendas
+            WHERE id > ? AND id <= ? AND +data_venda >= ? AND +data_venda < ?
+        ''', (atual, proximo, inicio, fim))
+        conn.commit()
+
+        comeco = time.perf_counter()
+        cursor.execute('''
+            DELETE FROM main.vendas WHERE id IN (
+                SELECT id FROM arquivo.vendas
+                WHERE id > ? AND id <= ? AND data_venda >= ? AND data_venda < ?
+            )
+        ''', (atual, proximo, inicio, fim))
+        removidas = cursor.rowcount
+        cursor.execute('UPDATE arquivos_vendas SET ultimo_id = ? WHERE mes = ?', (proximo, mes))
+        conn.commit()
+        resultado.maior_bloqueio_ms = max(resultado.maior_bloqueio_ms, (time.perf_counter() - comeco) * 1000)
+        resultado.meses[mes] = resultado.meses.get(mes, 0) + removidas
+        resultado.arquivadas += removidas
+        resultado.lotes += 1
+        atual = proximo
+        if pausa:
+            time.sleep(pausa)
+
+
+def arquivar(db, manter_meses=MESES_MANTIDOS_PADRAO, hoje=None, tamanho_lote=TAMANHO_LOTE_PADRAO,
+             pausa=PAUSA_PADRAO):
+    # Move para os arquivos anuais as vendas dos meses anteriores aos
+    # "manter_meses" mais recentes (0 = todos os meses já fechados)
+    if tamanho_lote <= 0:
+        raise ValueError("O tamanho do lote deve ser maior que zero")
+    limite = limite_arquivamento(manter_meses, hoje)
+    resultado = ResultadoArquivamento()
+    with db.conexao() as conn:
+        cursor = conn.cursor()
+        por_ano = {}
+        for mes in meses_a_arquivar(cursor, limite):
+            por_ano.setdefault(mes[:4], []).append(mes)
+        for ano, meses in por_ano.items():
+            arquivo = nome_arquivo(db, ano)
+            cursor.execute('ATTACH DATABASE ? AS arquivo', (caminho_arquivo(db, arquivo),))
+            try:
+                _criar_arquivo(cursor, 'arquivo')
+                conn.commit()
+                for mes in meses:
+                    _arquivar_mes(cursor, mes, arquivo, tamanho_lote, pausa, resultado)
+            finally:
+                conn.rollback()
+                _desanexar(conn, ['arquivo'])
+        cursor.close()
+    return resultado
+
+
+def _anexar(db, cursor, arquivos):
+    limite = cursor.connection.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+    if len(arquivos) > limite:
+        raise ValueError(f"O período abrange {len(arquivos)} arquivos de vendas; o limite é {limite}")
+    esquemas = {}
+    try:
+        for arquivo in arquivos:
+            caminho = caminho_arquivo(db, arquivo)
+            # ATTACH criaria um banco vazio no lugar de um arquivo perdido
+            if not os.path.exists(caminho):
+                raise ValueError(f"Arquivo de vendas não encontrado: {caminho}")
+            esquema = f"arquivo_{len(esquemas)}"
+            cursor.execute('ATTACH DATABASE ? AS ?', (caminho, esquema))
+            esquemas[arquivo] = esquema
+    except BaseException:
+        _desanexar(cursor.connection, esquemas.values())
+        raise
+    return esquemas
+
+
+def _desanexar(conn, esquemas):
+    for esquema in esquemas:
+        conn.execute(f'DETACH DATABASE {esquema}')
+
+
+def _marcas(cursor, esquemas, prefixo=''):
+    # Condição que deixa, em cada arquivo, só as linhas cujo arquivamento já
+    # terminou. Lida dentro da transação da consulta: as marcas e as linhas do
+    # banco principal vêm do mesmo instantâneo, tirado antes do dos arquivos.
+    cursor.execute('SELECT mes, arquivo, ultimo_id FROM arquivos_vendas')
+    marcas = {}
+    for mes, arquivo, ultimo_id in cursor.fetchall():
+        if arquivo in esquemas:
+            marcas.setdefault(arquivo, []).append(f"WHEN '{mes}' THEN {int(ultimo_id)}")
+    return {arquivo: (f"{prefixo}id <= CASE substr({prefixo}data_venda, 1, 7) "
+                      f"{' '.join(marcas.get(arquivo, ()))} ELSE 0 END")
+            for arquivo in esquemas}
+
+
+def _uniao(cursor, esquemas):
+    marcas = _marcas(cursor, esquemas)
+    partes = [f'SELECT {COLUNAS} FROM main.vendas']
+    for arquivo, esquema in esquemas.items():
+        partes.append(f'SELECT {COLUNAS} FROM {esquema}.vendas WHERE {marcas[arquivo]}')
+    return f"({' UNION ALL '.join(partes)})"
+
+
+def limite_arquivado(cursor):
+    # Limite de texto de data_venda abaixo do qual estão todas as vendas
+    # arquivadas (o início do mês seguinte ao último arquivado); None se nenhum
+    # mês foi arquivado
+    cursor.execute('SELECT MAX(mes) FROM arquivos_vendas')
+    mes = cursor.fetchone()[0]
+    return _inicio_mes(_proximo_mes(mes)) if mes else None
+
+
+@contextmanager
+def arquivos_ate(db, limite_superior):
+    # Para paginar o histórico de trás para a frente: cursor numa transação de
+    # leitura e os arquivos com meses que começam até limite_superior, do mais
+    # novo para o mais antigo, como (tabela de vendas, condição das linhas já
+    # arquivadas, limite de data_venda abaixo do qual estão todas as linhas
+    # do arquivo). Só esses arquivos são anexados; a condição usa o apelido v.
+    with db.conexao(somente_leitura=True) as conn:
+        cursor = conn.cursor()
+        esquemas = {}
+        try:
+            cursor.execute('BEGIN')
+            cursor.execute('''
+                SELECT arquivo, MAX(mes) FROM arquivos_vendas
+                WHERE mes || '-01 00:00:00' <= ?
+                GROUP BY arquivo
+                ORDER BY MAX(mes) DESC
+            ''', (limite_superior,))
+            arquivos = cursor.fetchall()
+            esquemas = _anexar(db, cursor, [arquivo for arquivo, _ in arquivos])
+            marcas = _marcas(cursor, esquemas, 'v.')
+            yield cursor, [(f'{esquemas[arquivo]}.vendas', marcas[arquivo], _inicio_mes(_proximo_mes(mes)))
+                           for arquivo, mes in arquivos]
+        finally:
+            cursor.close()
+            conn.rollback()
+            _desanexar(conn, esquemas.values())
+
+
+def _arquivos_do_periodo(cursor, limite_inferior, limite_superior):
+    cursor.execute('''
+        SELECT DISTINCT arquivo FROM arquivos_vendas
+        WHERE mes >= substr(?, 1, 7) AND mes || '-01 00:00:00' < ?
+    ''', (limite_inferior, limite_superior))
+    return [row[0] for row in cursor.fetchall()]
+
+
+@contextmanager
+def vendas_do_periodo(db, limite_inferior, limite_superior):
+    # Cursor e expressão de tabela com as vendas (id, produto_id, quantidade,
+    # data_venda, valor_total) entre os limites de texto de data_venda
+    # [limite_inferior, limite_superior), inclusive as arquivadas. O cursor
+    # fica numa transação de leitura aberta antes da escolha dos arquivos: a
+    # escolha, as marcas e as linhas vêm do mesmo instantâneo, e um
+    # arquivamento que rode no meio não tira linhas da consulta.
+    conn, cursor = db.get_conn_leitura()
+    # Numa transação já aberta nesta thread, lê no instantâneo dela
+    propria = not conn.in_transaction
+    if propria:
+        cursor.execute('BEGIN')
+    try:
+        arquivos = _arquivos_do_periodo(cursor, limite_inferior, limite_superior)
+        if not arquivos:
+            yield cursor, 'vendas'
+            return
+    finally:
+        if propria:
+            conn.rollback()
+
+    # Os arquivos são anexados numa conexão emprestada, e não na da thread;
+    # a escolha é refeita na transação dela
+    with db.conexao(somente_leitura=True) as conn:
+        cursor = conn.cursor()
+        esquemas = {}
+        try:
+            cursor.execute('BEGIN')
+            arquivos = _arquivos_do_periodo(cursor, limite_inferior, limite_superior)
+            esquemas = _anexar(db, cursor, arquivos)
+            yield cursor, _uniao(cursor, esquemas)
+        finally:
+            # Fechar o cursor encerra uma consulta lida só em parte; com
+            # uma consulta ativa o DETACH falharia
+            cursor.close()
+            conn.rollback()
+            _desanexar(conn, esquemas.values())
+
+
+def reconstruir_agregados(db):
+    # migracoes.recalcular_agregados sobre vendas e todos os arquivos
+    _, cursor = db.get_conn_leitura()
+    cursor.execute('SELECT DISTINCT arquivo FROM arquivos_vendas')
+    arquivos = [row[0] for row in cursor.fetchall()]
+    if not arquivos:
+        db.transacao(migracoes.recalcular_agregados)
+        return
+
+    with db.conexao() as conn:
+        cursor = conn.cursor()
+        esquemas = _anexar(db, cursor, arquivos)
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            migracoes.recalcular_agregados(cursor, _uniao(cursor, esquemas))
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.rollback()
+            _desanexar(conn, esquemas.values())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Move as vendas de meses fechados para arquivos anuais")
+    parser.add_argument('--banco', default='sistema_vendas.db')
+    parser.add_argument('--manter-meses', type=int, default=MESES_MANTIDOS_PADRAO,
+                        help="Meses fechados que ficam no banco principal, além do atual")
+    parser.add_argument('--lote', type=int, default=TAMANHO_LOTE_PADRAO,
+                        help="Faixa de ids movida por transação")
+    parser.add_argument('--pausa', type=float, default=PAUSA_PADRAO,
+                        help="Segundos de espera entre lotes, para dar vez aos caixas")
+    args = parser.parse_args(argv)
+
+    db = Database(args.banco)
+    try:
+        resultado = arquivar(db, args.manter_meses, tamanho_lote=args.lote, pausa=args.pausa)
+    except (ValueError, sqlite3.Error) as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 1
+    finally:
+        db.fechar_tudo()
+
+    if not resultado.meses:
+        print("Nenhum mês a arquivar.")
+        return 0
+    for mes, quantidade in sorted(resultado.meses.items()):
+        print(f"{mes}: {quantidade} vendas arquivadas")
+    print(f"Total: {resultado.arquivadas} vendas em {resultado.lotes} lotes "
+          f"(maior bloqueio do banco: {resultado.maior_bloqueio_ms:.1f} ms)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+import argparse
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+from modelos import Database
+
+# Cópia de segurança com o banco em uso, pela API de backup do SQLite.
+# Copiar o arquivo com o sistema aberto pode pegar uma transação pela metade
+# (e ignora o que ainda está no -wal); a API copia página a página a partir
+# de uma conexão, e o resultado é sempre um banco consistente.
+#
+# A cópia anda em passos de "paginas" páginas com uma pausa entre eles.
+# Antes do primeiro passo a conexão de origem abre uma transação de leitura
+# e a mantém até o fim: a cópia inteira sai desse instantâneo. Sem isso,
+# cada venda gravada por outra conexão faria o SQLite recomeçar a cópia do
+# início, e com movimento constante ela não terminaria. Com WAL, a leitura
+# não bloqueia os caixas; só impede que o checkpoint passe desse ponto
+# enquanto a cópia dura.
+#
+# A cópia é gravada num arquivo .parcial, conferida com integrity_check e só
+# então renomeada; ficam as "manter" mais recentes.
+#
+#   python backup.py --pasta backups --manter 7
+
+PAGINAS_POR_PASSO_PADRAO = 128
+PAUSA_PADRAO = 0.005
+COPIAS_MANTIDAS_PADRAO = 7
+PASTA_PADRAO = 'backups'
+
+
+class ResultadoBackup:
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.paginas = 0
+        self.passos = 0
+        self.duracao_s = 0.0
+        self.passos_ms = 0.0  # tempo dentro dos passos, lendo o banco
+        self.maior_passo_ms = 0.0
+        self.integridade = None
+        self.removidas = []
+
+    @property
+    def paginas_por_segundo(self):
+        return self.paginas / self.duracao_s if self.duracao_s > 0 else 0.0
+
+
+def _padrao_copias(db):
+    base = os.path.splitext(os.path.basename(db.db_name))[0]
+    return base, re.compile(rf'{re.escape(base)}-\d{{8}}-\d{{6}}\.db')
+
+
+def copias(db, pasta):
+    # Cópias existentes, da mais antiga para a mais nova (o nome tem a data)
+    _, padrao = _padrao_copias(db)
+    if not os.path.isdir(pasta):
+        return []
+    return sorted(os.path.join(pasta, nome) for nome in os.listdir(pasta) if padrao.fullmatch(nome))
+
+
+def rotacionar(db, pasta, manter=COPIAS_MANTIDAS_PADRAO):
+    existentes = copias(db, pasta)
+    removidas = existentes[:-manter] if manter > 0 else existentes
+    for caminho in removidas:
+        os.remove(caminho)
+    return removidas
+
+
+def copiar(db, destino, paginas=PAGINAS_POR_PASSO_PADRAO, pausa=PAUSA_PADRAO):
+    # Copia o banco para "destino" (que não deve existir) e confere a cópia
+    resultado = ResultadoBackup(destino)
+    ultimo = None
+
+    def progresso(status, restantes, total):
+        nonlocal ultimo
+        agora = time.perf_counter()
+        passo_ms = (agora - ultimo) * 1000
+        resultado.passos += 1
+        resultado.passos_ms += passo_ms
+        resultado.maior_passo_ms = max(resultado.maior_passo_ms, passo_ms)
+        resultado.paginas = total
+        if restantes and pausa:
+            time.sleep(pausa)
+        ultimo = time.perf_counter()
+
+    copia = sqlite3.connect(destino)
+    try:
+        with db.conexao(somente_leitura=True) as conn:
+            inicio = time.perf_counter()
+            try:
+                conn.execute('BEGIN')
+                conn.execute('SELECT 1 FROM sqlite_master LIMIT 1')
+                ultimo = time.perf_counter()
+                conn.backup(copia, pages=paginas, progress=progresso)
+            finally:
+                conn.rollback()
+            resultado.duracao_s = time.perf_counter() - inicio
+        # A cópia herda o modo WAL da origem; volta ao journal comum para
+        # ser um arquivo só
+        copia.execute('PRAGMA journal_mode = DELETE')
+        erros = [row[0] for row in copia.execute('PRAGMA integrity_check')]
+        resultado.integridade = 'ok' if erros == ['ok'] else '; '.join(erros)
+    finally:
+        copia.close()
+    return resultado
+
+
+def fazer_backup(db, pasta=PASTA_PADRAO, manter=COPIAS_MANTIDAS_PADRAO, paginas=PAGINAS_POR_PASSO_PADRAO,
+                 pausa=PAUSA_PADRAO, agora=None):
+    if paginas <= 0:
+        raise ValueError("O número de páginas por passo deve ser maior que zero")
+    if manter <= 0:
+        raise ValueError("É preciso manter pelo menos uma cópia")
+    os.makedirs(pasta, exist_ok=True)
+    base, padrao = _padrao_copias(db)
+    # Sobras de cópias interrompidas (ex.: o programa fechou no meio)
+    for nome in os.listdir(pasta):
+        if nome.endswith('.parcial') and padrao.fullmatch(nome[:-len('.parcial')]):
+            os.remove(os.path.join(pasta, nome))
+    caminho = os.path.join(pasta, f"{base}-{(agora or datetime.now()):%Y%m%d-%H%M%S}.db")
+    parcial = caminho + '.parcial'
+    try:
+        resultado = copiar(db, parcial, paginas, pausa)
+    except BaseException:
+        if os.path.exists(parcial):
+            os.remove(parcial)
+        raise
+    if resultado.integridade != 'ok':
+        os.remove(parcial)
+        raise ValueError(f"A cópia falhou na verificação de integridade: {resultado.integridade}")
+    os.replace(parcial, caminho)
+    resultado.caminho = caminho
+    resultado.removidas = rotacionar(db, pasta, manter)
+    return resultado
+
+
+def descrever(resultado):
+    return (f"{resultado.paginas} páginas em {resultado.duracao_s:.2f} s "
+            f"({resultado.paginas_por_segundo:.0f} páginas/s, {resultado.passos} passos); "
+            f"lendo o banco: {resultado.passos_ms:.1f} ms no total, maior passo {resultado.maior_passo_ms:.1f} ms")
+
+
+class BackupPeriodico(threading.Thread):
+    # Faz uma cópia a cada "intervalo" segundos, até parar(). Erros vão para
+    # o log e não interrompem as próximas cópias.
+    def __init__(self, db, intervalo, pasta=PASTA_PADRAO, manter=COPIAS_MANTIDAS_PADRAO,
+                 paginas=PAGINAS_POR_PASSO_PADRAO, pausa=PAUSA_PADRAO):
+        super().__init__(name="backup", daemon=True)
+        self.db = db
+        self.intervalo = intervalo
+        self.pasta = pasta
+        self.manter = manter
+        self.paginas = paginas
+        self.pausa = pausa
+        self.ultimo = None
+        self._parar = threading.Event()
+
+    def run(self):
+        log = logging.getLogger('backup')
+        while not self._parar.wait(self.intervalo):
+            try:
+                self.ultimo = fazer_backup(self.db, self.pasta, self.manter, self.paginas, self.pausa)
+                log.info("Backup gravado em %s: %s", self.ultimo.caminho, descrever(self.ultimo))
+            except (OSError, ValueError, sqlite3.Error):
+                log.exception("Falha no backup")
+
+    def parar(self):
+        self._parar.set()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cópia de segurança do banco, que pode rodar com o sistema em uso")
+    parser.add_argument('--banco', default='sistema_vendas.db')
+    parser.add_argument('--pasta', default=PASTA_PADRAO, help="Pasta onde as cópias são gravadas")
+    parser.add_argument('--manter', type=int, default=COPIAS_MANTIDAS_PADRAO,
+                        help="Quantas cópias manter; as mais antigas são apagadas")
+    parser.add_argument('--paginas', type=int, default=PAGINAS_POR_PASSO_PADRAO,
+                        help="Páginas copiadas por passo")
+    parser.add_argument('--pausa', type=float, default=PAUSA_PADRAO,
+                        help="Segundos de espera entre passos")
+    args = parser.parse_args(argv)
+
+    db = Database(args.banco)
+    try:
+        resultado = fazer_backup(db, args.pasta, args.manter, args.paginas, args.pausa)
+    except (OSError, ValueError, sqlite3.Error) as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 1
+    finally:
+        db.fechar_tudo()
+
+    print(f"Backup gravado em {resultado.caminho}")
+    print(descrever(resultado))
+    print(f"Integridade: {resultado.integridade}")
+    for caminho in resultado.removidas:
+        print(f"Removida: {caminho}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
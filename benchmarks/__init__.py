@@ -0,0 +1,2 @@
+# Benchmarks da camada de modelo (Database, Produto, Venda).
+# Uso: python -m benchmarks --help
@@ -0,0 +1,83 @@
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import sys
+from datetime import datetime
+
+from benchmarks.cenarios import (CENARIOS, CENARIOS_HISTORICO_COMPLETO, LIMITE_HISTORICO_COMPLETO,
+                                 executar_cenario, medir_memoria)
+from benchmarks.gerador import TAMANHOS, gerar_banco
+from modelos import Database
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description="Mede a camada de modelo contra um banco sintético")
+    parser.add_argument('--tamanho', choices=sorted(TAMANHOS), default='pequeno')
+    parser.add_argument('--produtos', type=int, help="Sobrescreve o número de produtos do tamanho")
+    parser.add_argument('--vendas', type=int, help="Sobrescreve o número de vendas do tamanho")
+    parser.add_argument('--banco', default=None,
+                        help="Arquivo do banco gerado (padrão: bench_<tamanho>.db)")
+    parser.add_argument('--regerar', action='store_true',
+                        help="Gera o banco de novo mesmo que o arquivo já exista")
+    parser.add_argument('--arquivar-meses', type=int,
+                        help="Ao gerar, arquiva os meses fechados exceto os N mais recentes")
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--repeticoes', type=int, default=50)
+    parser.add_argument('--cenario', action='append', choices=sorted(CENARIOS),
+                        help="Roda só os cenários indicados (pode repetir)")
+    parser.add_argument('--memoria', action='store_true',
+                        help="Mede também a memória alocada por cada cenário (tracemalloc)")
+    parser.add_argument('--saida', help="Grava o resultado em JSON neste arquivo (padrão: stdout)")
+    args = parser.parse_args(argv)
+
+    num_produtos, num_vendas = TAMANHOS[args.tamanho]
+    num_produtos = args.produtos or num_produtos
+    num_vendas = args.vendas if args.vendas is not None else num_vendas
+    banco = args.banco or f"bench_{args.tamanho}.db"
+
+    # Os cenários de venda alteram o banco; use --regerar para comparar execuções
+    if args.regerar or not os.path.exists(banco):
+        print(f"Gerando {banco}: {num_produtos} produtos, {num_vendas} vendas...", file=sys.stderr)
+        gerar_banco(banco, num_produtos, num_vendas, semente=args.semente, arquivar_meses=args.arquivar_meses)
+
+    nomes = args.cenario or list(CENARIOS)
+    if num_vendas > LIMITE_HISTORICO_COMPLETO and not args.cenario:
+        nomes = [nome for nome in nomes if nome not in CENARIOS_HISTORICO_COMPLETO]
+
+    db = Database(banco)
+    resultados = {}
+    try:
+        for nome in nomes:
+            print(f"  {nome}...", file=sys.stderr)
+            resultados[nome] = executar_cenario(CENARIOS[nome], db, num_produtos, args.repeticoes)
+            if args.memoria:
+                resultados[nome]['memoria'] = medir_memoria(CENARIOS[nome], db, num_produtos)
+    finally:
+        db.fechar_tudo()
+
+    relatorio = {
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'plataforma': platform.platform(),
+        'tamanho': args.tamanho,
+        'produtos': num_produtos,
+        'vendas': num_vendas,
+        'semente': args.semente,
+        'cenarios': resultados,
+    }
+    texto = json.dumps(relatorio, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(texto + '\n')
+    else:
+        print(texto)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from urllib.parse import urlsplit
+
+from benchmarks.cenarios import resumir
+
+# Teste de carga do servidor HTTP (servidor.py): vários caixas simulados,
+# cada um numa conexão keep-alive, registrando vendas o mais rápido que o
+# servidor responde durante --duracao segundos.
+#
+#   python -m benchmarks.carga --url http://127.0.0.1:8765 --caixas 32 --duracao 10
+
+
+class Conexao:
+    def __init__(self, host, porta):
+        self.host = host
+        self.porta = porta
+        self.reader = None
+        self.writer = None
+
+    async def requisitar(self, metodo, caminho, dados=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.porta)
+        corpo = json.dumps(dados).encode('utf-8') if dados is not None else b''
+        self.writer.write(
+            f"{metodo} {caminho} HTTP/1.1\r\nHost: {self.host}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(corpo)}\r\n\r\n".encode('latin-1') + corpo)
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        tamanho, fechar = 0, False
+        while True:
+            linha = await self.reader.readline()
+            if linha in (b'\r\n', b'\n', b''):
+                break
+            nome, _, valor = linha.decode('latin-1').partition(':')
+            nome = nome.strip().lower()
+            if nome == 'content-length':
+                tamanho = int(valor)
+            elif nome == 'connection' and valor.strip().lower() == 'close':
+                fechar = True
+        resposta = json.loads(await self.reader.readexactly(tamanho)) if tamanho else None
+        if fechar:
+            self.fechar()
+        return status, resposta
+
+    def fechar(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = self.reader = None
+
+
+async def _ids_produtos(host, porta, limite):
+    conexao = Conexao(host, porta)
+    try:
+        status, resposta = await conexao.requisitar('GET', f'/produtos?limite={limite}')
+    finally:
+        conexao.fechar()
+    if status != 200 or not resposta['produtos']:
+        raise SystemExit("O servidor não retornou produtos para vender")
+    return [p['id'] for p in resposta['produtos']]
+
+
+async def _caixa(host, porta, ids, prazo, itens, semente, tempos, contagem):
+    rng = random.Random(semente)
+    conexao = Conexao(host, porta)
+    try:
+        while time.monotonic() < prazo:
+            if itens > 1:
+                caminho = '/carrinhos'
+                dados = {'itens': [{'produto_id': rng.choice(ids), 'quantidade': 1} for _ in range(itens)]}
+            else:
+                caminho = '/vendas'
+                dados = {'produto_id': rng.choice(ids), 'quantidade': 1}
+            inicio = time.perf_counter()
+            status, _ = await conexao.requisitar('POST', caminho, dados)
+            tempos.append((time.perf_counter() - inicio) * 1000)
+            contagem[status] = contagem.get(status, 0) + 1
+    finally:
+        conexao.fechar()
+
+
+async def executar(url, caixas, duracao, itens, produtos, semente):
+    partes = urlsplit(url)
+    host, porta = partes.hostname, partes.port or 80
+    ids = await _ids_produtos(host, porta, produtos)
+    tempos, contagem = [], {}
+    inicio = time.monotonic()
+    prazo = inicio + duracao
+    await asyncio.gather(*(_caixa(host, porta, ids, prazo, itens, semente + n, tempos, contagem)
+                           for n in range(caixas)))
+    decorrido = time.monotonic() - inicio
+    vendas = contagem.get(201, 0) * itens
+    resultado = {
+        'caixas': caixas,
+        'duracao_s': round(decorrido, 3),
+        'itens_por_requisicao': itens,
+        'requisicoes': len(tempos),
+        'respostas': {str(status): total for status, total in sorted(contagem.items())},
+        'vendas_por_segundo': round(vendas / decorrido, 1),
+    }
+    if tempos:
+        ordenados = sorted(tempos)
+        resultado['latencia'] = resumir(tempos)
+        resultado['latencia']['p99_ms'] = round(ordenados[min(len(ordenados) - 1, int(0.99 * len(ordenados)))], 4)
+    return resultado
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.carga',
+                                     description="Teste de carga de vendas contra o servidor HTTP")
+    parser.add_argument('--url', default='http://127.0.0.1:8765')
+    parser.add_argument('--caixas', type=int, default=16, help="Conexões simultâneas")
+    parser.add_argument('--duracao', type=float, default=10.0, help="Segundos de carga")
+    parser.add_argument('--itens', type=int, default=1,
+                        help="Itens por requisição (acima de 1 usa /carrinhos)")
+    parser.add_argument('--produtos', type=int, default=1000,
+                        help="Quantos produtos do catálogo sortear")
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--saida', help="Grava o resultado em JSON neste arquivo (padrão: stdout)")
+    args = parser.parse_args(argv)
+
+    resultado = asyncio.run(executar(args.url, args.caixas, args.duracao, args.itens,
+                                     args.produtos, args.semente))
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(texto + '\n')
+    else:
+        print(texto)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+import random
+import time
+import tracemalloc
+
+import relatorios
+from benchmarks.gerador import codigo_barras
+from dinheiro import Dinheiro
+from modelos import Produto, Venda
+
+# Cenários cronometrados. Cada cenário recebe o banco, o gerador de números
+# aleatórios e o tamanho do catálogo, e executa uma operação; a medição é
+# feita por executar_cenario. Os cenários de leitura retornam o que leram,
+# para medir_memoria contar a memória que o resultado ocupa.
+
+
+def listar_catalogo_frio(db, rng, num_produtos):
+    # Consulta + construção dos objetos, sem ajuda do cache
+    db.catalogo.invalidar()
+    return Produto.buscar_todos(db)
+
+
+def listar_catalogo(db, rng, num_produtos):
+    return Produto.buscar_todos(db)
+
+
+def pagina_catalogo(db, rng, num_produtos):
+    # Uma página da grade de produtos ordenada por preço, a partir de um ponto qualquer
+    return Produto.buscar_pagina(db, 50, apos=(rng.randint(100, 10000), 0), ordem='preco')
+
+
+def buscar_por_id(db, rng, num_produtos):
+    Produto.buscar_por_id(db, rng.randint(1, num_produtos))
+
+
+def sugestoes(db, rng, num_produtos):
+    # Seletor de produtos: o caixa digitou as primeiras letras
+    return Produto.sugerir(db, rng.choice(('c', 'ca', 'caf', 'arr', 'leite s', 'Bis', 'sab')))
+
+
+def leitura_codigo(db, rng, num_produtos):
+    # Leitor de código de barras no caixa
+    return Produto.buscar_por_codigo(db, codigo_barras(rng.randint(1, num_produtos)))
+
+
+def busca_texto(db, rng, num_produtos):
+    # Mesma consulta usada pela caixa de busca da tela de produtos
+    return Produto.pesquisar(db, rng.choice(('caf', 'arroz tio', 'acucar', 'leite 1l', 'biscoito', 'pao')))
+
+
+def venda_unica(db, rng, num_produtos):
+    Venda(produto_id=rng.randint(1, num_produtos), quantidade=1).registrar(db)
+
+
+def carrinho(db, rng, num_produtos):
+    Venda.registrar_carrinho(db, [(rng.randint(1, num_produtos), 1) for _ in range(5)])
+
+
+def historico_primeira_pagina(db, rng, num_produtos):
+    return Venda.buscar_pagina(db, 10)
+
+
+def historico_pagina_profunda(db, rng, num_produtos):
+    # Página a partir de um ponto no meio do histórico: custa o mesmo que a primeira
+    return Venda.buscar_pagina(db, 10, apos=('2025-07-01 00:00:00', 0))
+
+
+def historico_pagina_arquivada(db, rng, num_produtos):
+    # Página a partir da virada do ano: num banco gerado com --arquivar-meses,
+    # passa pelo arquivo de 2025 e continua no de 2024
+    return Venda.buscar_pagina(db, 10, apos=('2025-01-01 00:00:00', 0))
+
+
+def historico_completo(db, rng, num_produtos):
+    return Venda.buscar_todas(db)
+
+
+class _VendaComDict:
+    # Venda como era antes de __slots__: um __dict__ por instância
+    def __init__(self, id, produto_id, quantidade, data_venda, valor_total):
+        self.id = id
+        self.produto_id = produto_id
+        self.quantidade = quantidade
+        self.data_venda = data_venda
+        self.valor_total = valor_total
+
+
+def historico_completo_dict(db, rng, num_produtos):
+    # Linha de base de historico_completo em --memoria: a leitura de antes,
+    # com a lista de tuplas do fetchall, um objeto com __dict__ por venda e
+    # uma cópia do nome e da descrição em cada linha
+    conn, _ = db.get_conn_leitura()
+    cursor = conn.cursor()
+    try:
+        rows = cursor.execute('''
+            SELECT v.id, v.produto_id, v.quantidade, v.data_venda, v.valor_total,
+                   p.nome, p.descricao
+            FROM vendas v
+            JOIN produtos p ON v.produto_id = p.id
+            ORDER BY v.data_venda DESC
+        ''').fetchall()
+    finally:
+        cursor.close()
+    vendas = []
+    for row in rows:
+        venda = _VendaComDict(row[0], row[1], row[2], row[3], Dinheiro(row[4]))
+        venda.nome_produto = row[5]
+        venda.descricao_produto = row[6]
+        vendas.append(venda)
+    return vendas
+
+
+def total_vendas(db, rng, num_produtos):
+    Venda.calcular_total_vendas(db)
+
+
+def relatorio_mensal(db, rng, num_produtos):
+    relatorios.totais_periodo(db, '2025-12-01', '2025-12-31')
+    relatorios.top_produtos(db, 10, '2025-12-01', '2025-12-31')
+    relatorios.vendas_por_hora(db, '2025-12-01', '2025-12-31')
+
+
+CENARIOS = {
+    'listar_catalogo_frio': listar_catalogo_frio,
+    'listar_catalogo': listar_catalogo,
+    'pagina_catalogo': pagina_catalogo,
+    'buscar_por_id': buscar_por_id,
+    'sugestoes': sugestoes,
+    'leitura_codigo': leitura_codigo,
+    'busca_texto': busca_texto,
+    'venda_unica': venda_unica,
+    'carrinho': carrinho,
+    'historico_primeira_pagina': historico_primeira_pagina,
+    'historico_pagina_profunda': historico_pagina_profunda,
+    'historico_pagina_arquivada': historico_pagina_arquivada,
+    'historico_completo': historico_completo,
+    'historico_completo_dict': historico_completo_dict,
+    'total_vendas': total_vendas,
+    'relatorio_mensal': relatorio_mensal,
+}
+
+# Cenários que leem o histórico inteiro; só rodam até este número de vendas
+LIMITE_HISTORICO_COMPLETO = 200_000
+CENARIOS_HISTORICO_COMPLETO = ('historico_completo', 'historico_completo_dict')
+
+
+def executar_cenario(cenario, db, num_produtos, repeticoes, semente=0):
+    rng = random.Random(semente)
+    cenario(db, rng, num_produtos)  # aquecimento
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter_ns()
+        cenario(db, rng, num_produtos)
+        tempos.append((time.perf_counter_ns() - inicio) / 1e6)
+    return resumir(tempos)
+
+
+def medir_memoria(cenario, db, num_produtos, semente=0):
+    # Memória alocada por uma execução do cenário: "retida" com o resultado
+    # ainda vivo, "pico" incluindo o que foi descartado no caminho. Roda à
+    # parte das medições de tempo, pois o tracemalloc deixa tudo mais lento.
+    rng = random.Random(semente)
+    tracemalloc.start()
+    try:
+        resultado = cenario(db, rng, num_produtos)
+        retida, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    memoria = {'retida_kib': round(retida / 1024, 1), 'pico_kib': round(pico / 1024, 1)}
+    if isinstance(resultado, list):
+        memoria['linhas'] = len(resultado)
+        if resultado:
+            memoria['bytes_por_linha'] = round(retida / len(resultado), 1)
+    return memoria
+
+
+def resumir(tempos):
+    ordenados = sorted(tempos)
+
+    def percentil(p):
+        return ordenados[min(len(ordenados) - 1, int(p / 100 * len(ordenados)))]
+
+    return {
+        'repeticoes': len(ordenados),
+        'min_ms': round(ordenados[0], 4),
+        'media_ms': round(sum(ordenados) / len(ordenados), 4),
+        'p50_ms': round(percentil(50), 4),
+        'p95_ms': round(percentil(95), 4),
+        'max_ms': round(ordenados[-1], 4),
+    }
@@ -0,0 +1,105 @@
+import os
+import random
+import re
+from datetime import datetime, timedelta
+
+import arquivamento
+import migracoes
+from modelos import Database
+
+# Gera bancos com o mesmo esquema de sistema_vendas.db, povoados de forma
+# determinística: a mesma semente e os mesmos tamanhos produzem sempre o
+# mesmo conteúdo.
+
+TAMANHOS = {
+    'pequeno': (1_000, 10_000),
+    'medio': (10_000, 1_000_000),
+    'grande': (100_000, 10_000_000),
+}
+
+CATEGORIAS = ['Arroz', 'Feijão', 'Café', 'Açúcar', 'Óleo', 'Leite', 'Biscoito', 'Macarrão',
+              'Sabão', 'Detergente', 'Farinha', 'Chocolate', 'Suco', 'Refrigerante', 'Pão']
+MARCAS = ['Boa Safra', 'Sol Nascente', 'Tio João', 'Vale Verde', 'Primor', 'Santa Clara',
+          'Ouro Fino', 'Dona Benta', 'Estrela', 'Serra Azul']
+VARIANTES = ['500g', '1kg', '2kg', '5kg', '1L', '2L', 'integral', 'light', 'tradicional', 'premium']
+
+# Último dia do histórico gerado; fixo para que os dados não dependam do relógio
+DATA_FINAL = datetime(2025, 12, 31, 22, 0, 0)
+LOTE = 10_000
+
+
+def gerar_banco(caminho, num_produtos, num_vendas, semente=42, dias=365, arquivar_meses=None):
+    # Com arquivar_meses, os meses fechados exceto os arquivar_meses mais
+    # recentes vão para os arquivos anuais, como faria arquivamento.py
+    if os.path.exists(caminho):
+        os.remove(caminho)
+    # Arquivos anuais de uma geração anterior teriam os mesmos ids com outro
+    # conteúdo
+    pasta = os.path.dirname(os.path.abspath(caminho))
+    base = os.path.splitext(os.path.basename(caminho))[0]
+    for nome in os.listdir(pasta):
+        if re.fullmatch(rf'{re.escape(base)}-\d{{4}}\.db', nome):
+            os.remove(os.path.join(pasta, nome))
+    rng = random.Random(semente)
+    db = Database(caminho)
+    conn, cursor = db.get_conn()
+
+    cursor.executemany(
+        'INSERT INTO produtos (id, nome, descricao, quantidade, preco, codigo) VALUES (?, ?, ?, ?, ?, ?)',
+        _produtos(rng, num_produtos),
+    )
+    conn.commit()
+
+    # Os totais e a reposição são recalculados uma vez no fim em vez de por
+    # trigger a cada linha
+    cursor.execute('DROP TRIGGER vendas_agregados_ai')
+    cursor.execute('DROP TRIGGER vendas_reposicao_ai')
+    precos = [preco for (preco,) in cursor.execute('SELECT preco FROM produtos ORDER BY id')]
+    inicio = DATA_FINAL - timedelta(days=dias)
+    passo = (DATA_FINAL - inicio).total_seconds() / max(num_vendas, 1)
+    lote = []
+    for i in range(num_vendas):
+        # Produtos mais populares vendem mais (distribuição aproximadamente Zipf)
+        produto_id = min(int(rng.paretovariate(1.2)), num_produtos)
+        quantidade = rng.choice((1, 1, 1, 2, 2, 3, 5))
+        data_venda = inicio + timedelta(seconds=i * passo + rng.random() * passo)
+        lote.append((produto_id, quantidade, data_venda.strftime('%Y-%m-%d %H:%M:%S'),
+                     precos[produto_id - 1] * quantidade))
+        if len(lote) >= LOTE:
+            _inserir_vendas(cursor, lote)
+            conn.commit()
+            lote = []
+    if lote:
+        _inserir_vendas(cursor, lote)
+    migracoes._v5_agregados(cursor)
+    migracoes.recalcular_agregados(cursor)
+    migracoes._v7_reposicao(cursor)
+    migracoes.recalcular_reposicao(cursor)
+    conn.commit()
+    cursor.execute('ANALYZE')
+    conn.commit()
+    if arquivar_meses is not None:
+        arquivamento.arquivar(db, arquivar_meses, hoje=DATA_FINAL.date(), pausa=0)
+    db.fechar_tudo()
+
+
+def _produtos(rng, num_produtos):
+    for produto_id in range(1, num_produtos + 1):
+        nome = f"{rng.choice(CATEGORIAS)} {rng.choice(MARCAS)} {rng.choice(VARIANTES)} {produto_id}"
+        descricao = f"{rng.choice(CATEGORIAS).lower()} {rng.choice(VARIANTES)} cód. {produto_id:06d}"
+        yield (produto_id, nome, descricao, rng.randint(1_000_000, 10_000_000), rng.randint(99, 49_990),
+               codigo_barras(produto_id))
+
+
+def codigo_barras(produto_id):
+    # EAN-13 fictício com prefixo 789 e dígito verificador
+    base = f"789{produto_id:09d}"
+    soma = sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(base))
+    return base + str((10 - soma % 10) % 10)
+
+
+def _inserir_vendas(cursor, lote):
+    cursor.executemany(
+        'INSERT INTO vendas (produto_id, quantidade, data_venda, valor_total) VALUES (?, ?, ?, ?)',
+        lote,
+    )
@@ -0,0 +1,74 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.cenarios import resumir
+
+# Tempo de partida de um processo novo que importa cada módulo, do exec do
+# interpretador até a saída. É o custo que um script de cron paga antes de
+# fazer qualquer trabalho.
+#
+#   python -m benchmarks.inicializacao --repeticoes 20 --banco sistema_vendas.db
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORTACOES = {
+    'python': 'pass',  # referência: o interpretador sozinho
+    'modelos': 'import modelos',
+    'cli': 'import cli',
+    'app': 'import app',
+}
+
+
+def medir_processo(comando, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter_ns()
+        processo = subprocess.run(comando, cwd=RAIZ, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        tempos.append((time.perf_counter_ns() - inicio) / 1e6)
+        if processo.returncode != 0:
+            erro = processo.stderr.decode('utf-8', 'replace').strip().splitlines()
+            return {'erro': erro[-1] if erro else f"código de saída {processo.returncode}"}
+    return resumir(tempos)
+
+
+def carrega_flet(codigo):
+    processo = subprocess.run([sys.executable, '-c', f"{codigo}; import sys; print('flet' in sys.modules)"],
+                              cwd=RAIZ, capture_output=True, text=True)
+    return processo.stdout.strip() == 'True'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.inicializacao',
+                                     description="Mede o tempo de partida dos módulos e da linha de comando")
+    parser.add_argument('--repeticoes', type=int, default=20)
+    parser.add_argument('--banco', help="Banco existente para medir também \"cli.py totais\" de ponta a ponta")
+    parser.add_argument('--saida', help="Grava o resultado em JSON neste arquivo (padrão: stdout)")
+    args = parser.parse_args(argv)
+
+    resultados = {}
+    for nome, codigo in IMPORTACOES.items():
+        print(f"  {nome}...", file=sys.stderr)
+        resultados[nome] = medir_processo([sys.executable, '-c', codigo], args.repeticoes)
+        if 'erro' not in resultados[nome]:
+            resultados[nome]['carrega_flet'] = carrega_flet(codigo)
+    if args.banco:
+        print("  cli_totais...", file=sys.stderr)
+        resultados['cli_totais'] = medir_processo(
+            [sys.executable, 'cli.py', '--banco', os.path.abspath(args.banco), 'totais'], args.repeticoes)
+
+    texto = json.dumps({'python': sys.version.split()[0], 'inicializacao': resultados},
+                       indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(texto + '\n')
+    else:
+        print(texto)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+import argparse
+import sys
+from datetime import date
+
+import relatorios
+from modelos import LIMITE_BUSCA, ORDENACOES_PRODUTOS, Database, Produto, Venda
+
+# Linha de comando sem interface gráfica: consulta o catálogo, registra
+# vendas e mostra totais. Importa só a camada de modelo (sem Flet), então
+# serve para scripts e cron.
+#
+#   python cli.py listar --ordem quantidade --limite 20
+#   python cli.py buscar "arroz tio"
+#   python cli.py vender 42 3
+#   python cli.py totais --inicio 2025-12-01 --fim 2025-12-31
+
+
+def _imprimir_produtos(produtos):
+    if not produtos:
+        print("Nenhum produto encontrado.")
+        return
+    print(f"{'Id':>6} {'Produto':40} {'Estoque':>9} {'Preço':>14}")
+    for produto in produtos:
+        print(f"{produto.id:>6} {produto.nome[:40]:40} {produto.quantidade:>9} {produto.preco.formatar():>14}")
+
+
+def listar(db, args):
+    _imprimir_produtos(Produto.buscar_pagina(db, args.limite, ordem=args.ordem, decrescente=args.decrescente))
+
+
+def buscar(db, args):
+    _imprimir_produtos(Produto.pesquisar(db, args.termo, args.limite))
+
+
+def vender(db, args):
+    venda = Venda(produto_id=args.produto_id, quantidade=args.quantidade)
+    estoque = venda.registrar(db)
+    print(f"Venda {venda.id} registrada: {venda.quantidade} un., {venda.valor_total.formatar()} "
+          f"(estoque restante: {estoque})")
+
+
+def totais(db, args):
+    if args.inicio is None and args.fim is None:
+        resumo = Venda.resumo_vendas(db)
+        print(f"Receita: {resumo['receita'].formatar()}")
+        print(f"Vendas: {resumo['num_vendas']} ({resumo['unidades']} itens)")
+        print(f"Hoje: {resumo['receita_hoje'].formatar()} em {resumo['num_vendas_hoje']} vendas")
+        return
+    resumo = relatorios.totais_periodo(db, args.inicio, args.fim)
+    print(f"Receita: {resumo['receita'].formatar()}")
+    print(f"Vendas: {resumo['num_vendas']} ({resumo['unidades']} itens)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sistema de Vendas pela linha de comando")
+    parser.add_argument('--banco', default='sistema_vendas.db')
+    comandos = parser.add_subparsers(dest='comando', required=True)
+
+    comando = comandos.add_parser('listar', help="Lista os produtos do catálogo")
+    comando.add_argument('--limite', type=int, default=50)
+    comando.add_argument('--ordem', choices=ORDENACOES_PRODUTOS, default='nome')
+    comando.add_argument('--decrescente', action='store_true')
+    comando.set_defaults(executar=listar)
+
+    comando = comandos.add_parser('buscar', help="Busca produtos por nome ou descrição")
+    comando.add_argument('termo')
+    comando.add_argument('--limite', type=int, default=LIMITE_BUSCA)
+    comando.set_defaults(executar=buscar)
+
+    comando = comandos.add_parser('vender', help="Registra uma venda")
+    comando.add_argument('produto_id', type=int)
+    comando.add_argument('quantidade', type=int)
+    comando.set_defaults(executar=vender)
+
+    comando = comandos.add_parser('totais', help="Mostra os totais de vendas, gerais ou de um período")
+    comando.add_argument('--inicio', type=date.fromisoformat, help="Primeiro dia (AAAA-MM-DD)")
+    comando.add_argument('--fim', type=date.fromisoformat, help="Último dia (AAAA-MM-DD)")
+    comando.set_defaults(executar=totais)
+
+    args = parser.parse_args(argv)
+    db = Database(args.banco)
+    try:
+        args.executar(db, args)
+    except ValueError as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 1
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
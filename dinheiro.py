@@ -0,0 +1,95 @@
+import re
+import sqlite3
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from functools import total_ordering
+
+# Valores monetários em centavos inteiros. No banco ficam em colunas
+# INTEGER, então somas e comparações são exatas e não passam por float.
+
+
+@total_ordering
+class Dinheiro:
+    __slots__ = ('centavos',)
+
+    def __init__(self, centavos=0):
+        self.centavos = int(centavos)
+
+    @classmethod
+    def de_reais(cls, valor):
+        # Aceita int, float, Decimal ou texto numérico em reais
+        try:
+            reais = Decimal(str(valor))
+        except InvalidOperation:
+            raise ValueError(f"Valor em formato inválido: {valor}")
+        return cls(int((reais * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP)))
+
+    @classmethod
+    def de_texto(cls, texto):
+        # Interpreta o que o usuário digita: "R$ 1.234,56", "1234,5", "12.50"
+        # ou "1.234". Com vírgula, o ponto é separador de milhar; sem vírgula,
+        # um ponto seguido de exatamente três dígitos também é.
+        valor = (texto or '').replace('R$', '').replace(' ', '').strip()
+        if not valor:
+            return cls(0)
+        if ',' in valor:
+            valor = valor.replace('.', '').replace(',', '.')
+        elif re.fullmatch(r'-?\d{1,3}(\.\d{3})+', valor):
+            valor = valor.replace('.', '')
+        if not re.fullmatch(r'-?\d+(\.\d*)?', valor):
+            raise ValueError(f"Valor em formato inválido: {texto}")
+        return cls.de_reais(valor)
+
+    @property
+    def reais(self):
+        return Decimal(self.centavos) / 100
+
+    def formatar(self, simbolo=True):
+        # Formato brasileiro, sem depender do locale do sistema
+        inteiro, resto = divmod(abs(self.centavos), 100)
+        texto = f"{inteiro:,}".replace(',', '.') + f",{resto:02d}"
+        if simbolo:
+            texto = "R$ " + texto
+        return ("-" if self.centavos < 0 else "") + texto
+
+    def __add__(self, outro):
+        if not isinstance(outro, Dinheiro):
+            return NotImplemented
+        return Dinheiro(self.centavos + outro.centavos)
+
+    def __sub__(self, outro):
+        if not isinstance(outro, Dinheiro):
+            return NotImplemented
+        return Dinheiro(self.centavos - outro.centavos)
+
+    def __mul__(self, quantidade):
+        if not isinstance(quantidade, int):
+            return NotImplemented
+        return Dinheiro(self.centavos * quantidade)
+
+    __rmul__ = __mul__
+
+    def __eq__(self, outro):
+        if not isinstance(outro, Dinheiro):
+            return NotImplemented
+        return self.centavos == outro.centavos
+
+    def __lt__(self, outro):
+        if not isinstance(outro, Dinheiro):
+            return NotImplemented
+        return self.centavos < outro.centavos
+
+    def __hash__(self):
+        return hash(self.centavos)
+
+    def __bool__(self):
+        return self.centavos != 0
+
+    def __str__(self):
+        return self.formatar()
+
+    def __repr__(self):
+        return f"Dinheiro({self.centavos})"
+
+
+# Permite passar Dinheiro direto como parâmetro de consulta
+sqlite3.register_adapter(Dinheiro, lambda valor: valor.centavos)
@@ -0,0 +1,191 @@
+import argparse
+import csv
+import gzip
+import json
+import os
+import sys
+from datetime import date
+
+from arquivamento import vendas_do_periodo
+from dinheiro import Dinheiro
+from modelos import Database
+from relatorios import intervalo_datas
+
+# Exportação das vendas para CSV ou JSON Lines, opcionalmente com gzip.
+# As linhas saem do banco em lotes de fetchmany e são escritas à medida que
+# chegam, então a memória usada não depende do tamanho do histórico. A
+# ordem é por id; guardando o último id exportado (--estado), a próxima
+# execução continua de onde parou, para cargas incrementais noturnas.
+
+TAMANHO_LOTE_PADRAO = 1000
+FORMATOS = ('csv', 'jsonl')
+COLUNAS = ('id', 'data_venda', 'produto_id', 'nome_produto', 'quantidade', 'valor_total')
+
+
+class ResultadoExportacao:
+    def __init__(self, ultimo_id=None):
+        self.exportadas = 0
+        self.ultimo_id = ultimo_id
+
+
+def ler_vendas(db, inicio=None, fim=None, apos_id=None, tamanho_lote=TAMANHO_LOTE_PADRAO):
+    # Gera as linhas (id, data_venda, produto_id, nome, quantidade, valor_total)
+    # lote a lote, inclusive as de meses arquivados. Usa um cursor próprio na
+    # transação de leitura de vendas_do_periodo: os arquivos, os ids do
+    # período e as linhas vêm do mesmo instantâneo do banco, mesmo com vendas
+    # entrando ou meses sendo arquivados.
+    periodo = inicio is not None or fim is not None
+    limites = intervalo_datas(inicio, fim)
+    with vendas_do_periodo(db, *limites) as (cursor, vendas):
+        cursor = cursor.connection.cursor()
+        try:
+            filtros, parametros = [], []
+            if apos_id is not None:
+                filtros.append('v.id > ?')
+                parametros.append(apos_id)
+            if vendas != 'vendas':
+                # O período inclui meses arquivados: a união com os arquivos
+                # não tem índice por id e as linhas são ordenadas antes de sair
+                if periodo:
+                    filtros.append('v.data_venda >= ? AND v.data_venda < ?')
+                    parametros.extend(limites)
+            elif periodo:
+                # Ordenar pelo índice de data exigiria uma ordenação temporária do
+                # período inteiro antes da primeira linha. Em vez disso, o índice
+                # dá os ids mínimo e máximo do período e a consulta percorre a
+                # tabela por id nesse intervalo; o "+" impede o uso do índice de
+                # data na consulta principal.
+                cursor.execute('SELECT MIN(id), MAX(id) FROM vendas WHERE data_venda >= ? AND data_venda < ?',
+                               limites)
+                menor, maior = cursor.fetchone()
+                if menor is None:
+                    return
+                filtros.append('v.id BETWEEN ? AND ? AND +v.data_venda >= ? AND +v.data_venda < ?')
+                parametros.extend((menor, maior, *limites))
+            onde = f"WHERE {' AND '.join(filtros)}" if filtros else ''
+            cursor.execute(f'''
+                SELECT v.id, v.data_venda, v.produto_id, p.nome, v.quantidade, v.valor_total
+                FROM {vendas} v
+                JOIN produtos p ON p.id = v.produto_id
+                {onde}
+                ORDER BY v.id
+            ''', parametros)
+            while True:
+                lote = cursor.fetchmany(tamanho_lote)
+                if not lote:
+                    break
+                yield from lote
+        finally:
+            cursor.close()
+
+
+def _escrever_csv(saida, linhas, resultado):
+    # Mesmo formato da importação: ";" e valores como 1.234,56
+    escritor = csv.writer(saida, delimiter=';')
+    escritor.writerow(COLUNAS)
+    for id, data_venda, produto_id, nome, quantidade, valor_total in linhas:
+        escritor.writerow((id, data_venda, produto_id, nome, quantidade,
+                           Dinheiro(valor_total).formatar(simbolo=False)))
+        resultado.exportadas += 1
+        resultado.ultimo_id = id
+
+
+def _escrever_jsonl(saida, linhas, resultado):
+    # Um objeto por linha, com valor_total em centavos
+    for linha in linhas:
+        saida.write(json.dumps(dict(zip(COLUNAS, linha)), ensure_ascii=False))
+        saida.write('\n')
+        resultado.exportadas += 1
+        resultado.ultimo_id = linha[0]
+
+
+def exportar_vendas(db, saida, formato='csv', inicio=None, fim=None, apos_id=None,
+                    tamanho_lote=TAMANHO_LOTE_PADRAO):
+    # Escreve em "saida" (arquivo de texto já aberto) e retorna quantas vendas
+    # foram exportadas e o id da última
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato inválido: {formato}")
+    resultado = ResultadoExportacao(apos_id)
+    linhas = ler_vendas(db, inicio, fim, apos_id, tamanho_lote)
+    if formato == 'csv':
+        _escrever_csv(saida, linhas, resultado)
+    else:
+        _escrever_jsonl(saida, linhas, resultado)
+    return resultado
+
+
+def abrir_saida(caminho, compactar=False):
+    if caminho == '-':
+        return open(sys.stdout.fileno(), 'w', newline='', encoding='utf-8', closefd=False)
+    if compactar:
+        return gzip.open(caminho, 'wt', newline='', encoding='utf-8')
+    return open(caminho, 'w', newline='', encoding='utf-8')
+
+
+def ler_estado(caminho):
+    # Último id exportado pela execução anterior, se houver
+    try:
+        with open(caminho, encoding='utf-8') as arquivo:
+            texto = arquivo.read().strip()
+    except FileNotFoundError:
+        return None
+    return int(texto) if texto else None
+
+
+def gravar_estado(caminho, ultimo_id):
+    # Grava num arquivo temporário e renomeia: uma queda no meio não deixa
+    # o estado pela metade
+    temporario = caminho + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        arquivo.write(f"{ultimo_id}\n")
+    os.replace(temporario, caminho)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta as vendas para CSV ou JSON Lines")
+    parser.add_argument('saida', help="Arquivo de saída (\"-\" para a saída padrão)")
+    parser.add_argument('--banco', default='sistema_vendas.db')
+    parser.add_argument('--formato', choices=FORMATOS,
+                        help="Padrão: jsonl para arquivos .jsonl/.jsonl.gz, csv nos demais")
+    parser.add_argument('--gzip', action='store_true',
+                        help="Compacta a saída (automático para arquivos .gz)")
+    parser.add_argument('--inicio', help="Primeiro dia (AAAA-MM-DD)")
+    parser.add_argument('--fim', help="Último dia (AAAA-MM-DD)")
+    parser.add_argument('--apos-id', type=int, help="Exporta só vendas com id maior que este")
+    parser.add_argument('--estado',
+                        help="Arquivo com o último id exportado; lido no início e atualizado ao final")
+    parser.add_argument('--lote', type=int, default=TAMANHO_LOTE_PADRAO,
+                        help="Linhas lidas do banco por vez")
+    args = parser.parse_args(argv)
+
+    nome = args.saida[:-3] if args.saida.endswith('.gz') else args.saida
+    formato = args.formato or ('jsonl' if nome.endswith('.jsonl') else 'csv')
+    compactar = args.gzip or args.saida.endswith('.gz')
+    apos_id = args.apos_id
+    try:
+        inicio = date.fromisoformat(args.inicio) if args.inicio else None
+        fim = date.fromisoformat(args.fim) if args.fim else None
+        if args.estado and apos_id is None:
+            apos_id = ler_estado(args.estado)
+        db = Database(args.banco)
+    except ValueError as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 1
+
+    try:
+        with abrir_saida(args.saida, compactar) as saida:
+            resultado = exportar_vendas(db, saida, formato, inicio, fim, apos_id, args.lote)
+    except ValueError as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 1
+    finally:
+        db.close()
+
+    if args.estado and resultado.ultimo_id is not None:
+        gravar_estado(args.estado, resultado.ultimo_id)
+    print(f"Vendas exportadas: {resultado.exportadas} (último id: {resultado.ultimo_id})", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
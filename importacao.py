@@ -0,0 +1,142 @@
+import argparse
+import csv
+import sqlite3
+import sys
+
+from dinheiro import Dinheiro
+from modelos import Database, Produto, erro_de_bloqueio
+
+# Importação em massa de catálogos de fornecedores.
+# O CSV é lido em streaming (uma linha por vez) e gravado em lotes com
+# executemany, com um commit por lote, então o custo de fsync não cresce
+# com o número de produtos.
+
+TAMANHO_LOTE_PADRAO = 1000
+
+# Sem a coluna codigo no CSV, o código já cadastrado é mantido. A versão
+# sobe como numa edição pela tela (veja Produto.salvar).
+UPSERT_PRODUTO = '''
+    INSERT INTO produtos (nome, descricao, quantidade, preco, codigo)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(nome) DO UPDATE SET
+        descricao=excluded.descricao,
+        quantidade=excluded.quantidade,
+        preco=excluded.preco,
+        codigo=COALESCE(excluded.codigo, codigo),
+        versao=versao + 1
+'''
+
+
+class ResultadoImportacao:
+    def __init__(self):
+        self.importados = 0
+        self.rejeitados = []  # lista de (número da linha, motivo)
+
+    def rejeitar(self, linha, motivo):
+        self.rejeitados.append((linha, motivo))
+
+
+def ler_csv(caminho, delimitador=';', encoding='utf-8-sig'):
+    # Gera (número da linha, dicionário) sem carregar o arquivo inteiro
+    with open(caminho, newline='', encoding=encoding) as arquivo:
+        leitor = csv.DictReader(arquivo, delimiter=delimitador)
+        for registro in leitor:
+            yield leitor.line_num, registro
+
+
+def converter_linha(registro):
+    # Aplica as mesmas regras de App.salvar_produto
+    quantidade = (registro.get('quantidade') or '').strip()
+    try:
+        produto = Produto(
+            nome=(registro.get('nome') or '').strip(),
+            descricao=(registro.get('descricao') or '').strip(),
+            quantidade=int(quantidade) if quantidade else 0,
+            preco=Dinheiro.de_texto(registro.get('preco') or ''),
+            codigo=(registro.get('codigo') or '').strip(),
+        )
+    except ValueError:
+        raise ValueError("Quantidade ou preço em formato inválido")
+    produto.validar()
+    return (produto.nome, produto.descricao, produto.quantidade, produto.preco, produto.codigo)
+
+
+def importar_produtos(db, registros, tamanho_lote=TAMANHO_LOTE_PADRAO):
+    # registros: iterável de (número da linha, dicionário), como ler_csv
+    if tamanho_lote <= 0:
+        raise ValueError("O tamanho do lote deve ser maior que zero")
+
+    resultado = ResultadoImportacao()
+    lote = []
+    for linha, registro in registros:
+        try:
+            lote.append((linha, converter_linha(registro)))
+        except ValueError as e:
+            resultado.rejeitar(linha, str(e))
+            continue
+        if len(lote) >= tamanho_lote:
+            _gravar_lote(db, lote, resultado)
+            lote = []
+    if lote:
+        _gravar_lote(db, lote, resultado)
+    return resultado
+
+
+def _gravar_lote(db, lote, resultado):
+    # Cada lote é uma transação de db.transacao, como as vendas: se colidir
+    # com uma venda, espera e tenta de novo em vez de falhar
+    try:
+        db.transacao(lambda cursor: cursor.executemany(UPSERT_PRODUTO, [valores for _, valores in lote]))
+        importados, rejeitados = len(lote), []
+    except sqlite3.Error as e:
+        if erro_de_bloqueio(e):
+            raise
+        # Um registro recusado pelo banco não derruba o lote inteiro:
+        # regrava linha a linha para isolar o problema.
+        importados, rejeitados = db.transacao(lambda cursor: _gravar_linhas(cursor, lote))
+    resultado.importados += importados
+    for linha, motivo in rejeitados:
+        resultado.rejeitar(linha, motivo)
+    db.catalogo.invalidar()
+
+
+def _gravar_linhas(cursor, lote):
+    # Pode ser repetida por db.transacao: só devolve as contagens, que entram
+    # no resultado depois do commit
+    importados, rejeitados = 0, []
+    for linha, valores in lote:
+        try:
+            cursor.execute(UPSERT_PRODUTO, valores)
+            importados += 1
+        except sqlite3.Error as e:
+            if erro_de_bloqueio(e):
+                raise
+            rejeitados.append((linha, str(e)))
+    return importados, rejeitados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importa produtos de um arquivo CSV")
+    parser.add_argument('arquivo', help="CSV com as colunas nome, descricao, quantidade, preco")
+    parser.add_argument('--banco', default='sistema_vendas.db')
+    parser.add_argument('--lote', type=int, default=TAMANHO_LOTE_PADRAO,
+                        help="Quantidade de linhas por commit")
+    parser.add_argument('--delimitador', default=';')
+    args = parser.parse_args(argv)
+
+    db = Database(args.banco)
+    try:
+        resultado = importar_produtos(db, ler_csv(args.arquivo, args.delimitador), args.lote)
+    finally:
+        db.close()
+
+    print(f"Produtos importados: {resultado.importados}")
+    if resultado.rejeitados:
+        print(f"Linhas rejeitadas: {len(resultado.rejeitados)}", file=sys.stderr)
+        for linha, motivo in resultado.rejeitados:
+            print(f"  linha {linha}: {motivo}", file=sys.stderr)
+    return 1 if resultado.rejeitados else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
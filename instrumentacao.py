@@ -0,0 +1,263 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from functools import wraps
+
+# Instrumentação opcional: tempo de cada instrução SQL (agrupada pelo texto
+# normalizado), linhas retornadas, e tempo de cada rota e tratador de evento
+# da interface. Desligada por padrão; ligue com a variável de ambiente
+# SISTEMA_VENDAS_INSTRUMENTACAO=1 ou chamando ativar().
+#
+# O trace callback do sqlite3 informa cada instrução no momento em que o
+# SQLite começa a executá-la (inclusive BEGIN/COMMIT implícitos); ele só
+# marca o início, então a duração é medida em volta de execute() e dos
+# fetch*() do cursor, que é onde a instrução de fato roda.
+
+AMOSTRAS_POR_SERIE = 2000
+INTERVALO_LOG_PADRAO = 60
+
+
+class _Serie:
+    def __init__(self):
+        self.chamadas = 0
+        self.linhas = 0
+        self.total_ms = 0.0
+        self.amostras = deque(maxlen=AMOSTRAS_POR_SERIE)
+
+
+class Metricas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def registrar(self, tipo, nome, duracao_ms, linhas=0):
+        with self._lock:
+            serie = self._series.get((tipo, nome))
+            if serie is None:
+                serie = self._series[(tipo, nome)] = _Serie()
+            serie.chamadas += 1
+            serie.linhas += linhas
+            serie.total_ms += duracao_ms
+            serie.amostras.append(duracao_ms)
+
+    def resumo(self, tipo=None):
+        # Percentis calculados sobre as últimas AMOSTRAS_POR_SERIE medições
+        with self._lock:
+            itens = [(chave, serie.chamadas, serie.linhas, serie.total_ms, sorted(serie.amostras))
+                     for chave, serie in self._series.items() if tipo is None or chave[0] == tipo]
+        resultado = []
+        for (tipo_serie, nome), chamadas, linhas, total_ms, amostras in itens:
+            resultado.append({
+                'tipo': tipo_serie,
+                'nome': nome,
+                'chamadas': chamadas,
+                'linhas': linhas,
+                'total_ms': round(total_ms, 3),
+                'p50_ms': round(_percentil(amostras, 50), 3),
+                'p95_ms': round(_percentil(amostras, 95), 3),
+                'p99_ms': round(_percentil(amostras, 99), 3),
+            })
+        resultado.sort(key=lambda item: item['total_ms'], reverse=True)
+        return resultado
+
+    def limpar(self):
+        with self._lock:
+            self._series = {}
+
+
+def _percentil(ordenados, p):
+    if not ordenados:
+        return 0.0
+    return ordenados[min(len(ordenados) - 1, int(p / 100 * len(ordenados)))]
+
+
+METRICAS = Metricas()
+_ativa = os.environ.get('SISTEMA_VENDAS_INSTRUMENTACAO', '') not in ('', '0')
+_relatorio = None
+
+
+def ativa():
+    return _ativa
+
+
+def ativar(intervalo_log=None):
+    # Vale para as conexões abertas daqui em diante
+    global _ativa, _relatorio
+    _ativa = True
+    if intervalo_log and _relatorio is None:
+        _relatorio = RelatorioPeriodico(intervalo_log)
+        _relatorio.start()
+
+
+def desativar():
+    global _ativa, _relatorio
+    _ativa = False
+    if _relatorio is not None:
+        _relatorio.parar()
+        _relatorio = None
+
+
+_LITERAIS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_LISTAS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_ESPACOS = re.compile(r"\s+")
+
+
+def normalizar_sql(sql):
+    # Agrupa instruções que só diferem nos valores: literais viram "?" e
+    # listas "(?, ?, ?)" viram "(...)"
+    sql = _ESPACOS.sub(' ', sql).strip()
+    sql = _LITERAIS.sub('?', sql)
+    return _LISTAS.sub('(...)', sql)
+
+
+class CursorInstrumentado(sqlite3.Cursor):
+    # Mede execute() mais os fetch*() seguintes como uma só instrução; a
+    # medição é registrada quando o resultado se esgota ou quando o cursor
+    # executa a próxima instrução.
+    _pendente = None
+
+    def execute(self, sql, parametros=()):
+        self._encerrar()
+        inicio = time.perf_counter()
+        try:
+            return super().execute(sql, parametros)
+        finally:
+            self._pendente = [sql, (time.perf_counter() - inicio) * 1000, 0]
+            if self.description is None:
+                # Sem resultado a ler (INSERT, UPDATE, DDL): já terminou
+                self._encerrar()
+
+    def executemany(self, sql, parametros):
+        self._encerrar()
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(sql, parametros)
+        finally:
+            self._pendente = [sql, (time.perf_counter() - inicio) * 1000, 0]
+            self._encerrar()
+
+    def fetchone(self):
+        inicio = time.perf_counter()
+        row = super().fetchone()
+        self._contar(inicio, 0 if row is None else 1, esgotou=row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        inicio = time.perf_counter()
+        tamanho = self.arraysize if size is None else size
+        rows = super().fetchmany(tamanho)
+        self._contar(inicio, len(rows), esgotou=len(rows) < tamanho)
+        return rows
+
+    def fetchall(self):
+        inicio = time.perf_counter()
+        rows = super().fetchall()
+        self._contar(inicio, len(rows), esgotou=True)
+        return rows
+
+    def __next__(self):
+        inicio = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._contar(inicio, 0, esgotou=True)
+            raise
+        self._contar(inicio, 1, esgotou=False)
+        return row
+
+    def close(self):
+        self._encerrar()
+        super().close()
+
+    def _contar(self, inicio, linhas, esgotou):
+        if self._pendente is None:
+            return
+        self._pendente[1] += (time.perf_counter() - inicio) * 1000
+        self._pendente[2] += linhas
+        if esgotou:
+            self._encerrar()
+
+    def _encerrar(self):
+        if self._pendente is not None:
+            sql, duracao_ms, linhas = self._pendente
+            self._pendente = None
+            METRICAS.registrar('sql', normalizar_sql(sql), duracao_ms, linhas)
+
+
+class ConexaoInstrumentada(sqlite3.Connection):
+    # Usada como factory de sqlite3.connect quando a instrumentação está ativa
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.set_trace_callback(self._rastrear)
+
+    def cursor(self, factory=CursorInstrumentado):
+        return super().cursor(factory)
+
+    def commit(self):
+        inicio = time.perf_counter()
+        try:
+            super().commit()
+        finally:
+            METRICAS.registrar('sql', 'COMMIT', (time.perf_counter() - inicio) * 1000)
+
+    def _rastrear(self, sql):
+        # Controle de transação que o módulo sqlite3 emite sozinho (o BEGIN
+        # implícito antes de uma escrita) não passa por cursor nenhum; entra
+        # só na contagem
+        if sql.startswith(('BEGIN', 'SAVEPOINT', 'RELEASE', 'ROLLBACK')):
+            METRICAS.registrar('sql', sql.split()[0], 0.0)
+
+
+def medido(tipo, nome=None):
+    # Decorador para tratadores da interface; sem custo além de um teste
+    # quando a instrumentação está desligada
+    def decorador(funcao):
+        rotulo = nome or funcao.__name__
+
+        @wraps(funcao)
+        def envolvida(*args, **kwargs):
+            if not _ativa:
+                return funcao(*args, **kwargs)
+            inicio = time.perf_counter()
+            try:
+                return funcao(*args, **kwargs)
+            finally:
+                METRICAS.registrar(tipo, rotulo, (time.perf_counter() - inicio) * 1000)
+        return envolvida
+    return decorador
+
+
+def medir(tipo, nome, funcao, *args):
+    if not _ativa:
+        return funcao(*args)
+    inicio = time.perf_counter()
+    try:
+        return funcao(*args)
+    finally:
+        METRICAS.registrar(tipo, nome, (time.perf_counter() - inicio) * 1000)
+
+
+class RelatorioPeriodico(threading.Thread):
+    # Escreve no log, a cada "intervalo" segundos, as séries mais custosas
+    def __init__(self, intervalo, quantidade=10):
+        super().__init__(name="instrumentacao", daemon=True)
+        self.intervalo = intervalo
+        self.quantidade = quantidade
+        self._parar = threading.Event()
+
+    def run(self):
+        # logging só é importado quando o relatório liga: ele sozinho pesa
+        # boa parte da partida de um script que só usa o modelo
+        import logging
+        log = logging.getLogger('instrumentacao')
+        while not self._parar.wait(self.intervalo):
+            for item in METRICAS.resumo()[:self.quantidade]:
+                log.info("%s %s: %d chamadas, %d linhas, p50 %.2f ms, p95 %.2f ms, p99 %.2f ms, total %.1f ms",
+                         item['tipo'], item['nome'], item['chamadas'], item['linhas'],
+                         item['p50_ms'], item['p95_ms'], item['p99_ms'], item['total_ms'])
+
+    def parar(self):
+        self._parar.set()
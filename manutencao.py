@@ -0,0 +1,49 @@
+import argparse
+import sys
+
+import migracoes
+import reposicao
+from modelos import Database, Venda
+
+# Tarefas de manutenção do banco, para rodar por linha de comando ou cron.
+
+
+def reconstruir_agregados(db, args):
+    Venda.reconstruir_agregados(db)
+    resumo = Venda.resumo_vendas(db)
+    print(f"Totais reconstruídos: {resumo['num_vendas']} vendas, "
+          f"{resumo['unidades']} itens, receita {resumo['receita'].formatar()}")
+
+
+def reconstruir_reposicao(db, args):
+    db.transacao(migracoes.recalcular_reposicao)
+    print(f"Velocidades de venda reconstruídas; {len(reposicao.lista_reposicao(db))} produtos abaixo da cobertura mínima")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manutenção do banco do Sistema de Vendas")
+    parser.add_argument('--banco', default='sistema_vendas.db')
+    comandos = parser.add_subparsers(dest='comando', required=True)
+
+    comando = comandos.add_parser('reconstruir-agregados',
+                                  help="Recalcula as tabelas de totais a partir de vendas")
+    comando.set_defaults(executar=reconstruir_agregados)
+
+    comando = comandos.add_parser('reconstruir-reposicao',
+                                  help="Recalcula a velocidade de venda de cada produto a partir de vendas")
+    comando.set_defaults(executar=reconstruir_reposicao)
+
+    args = parser.parse_args(argv)
+    db = Database(args.banco)
+    try:
+        args.executar(db, args)
+    except ValueError as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 1
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,443 @@
+import math
+import sqlite3
+
+# Migrações do esquema, versionadas pelo PRAGMA user_version.
+# MIGRACOES é uma lista ordenada de passos; o passo na posição i leva o banco
+# da versão i para a i + 1. Passos já aplicados nunca são alterados: mudanças
+# no esquema entram como um novo passo no fim da lista.
+#
+# migrar() roda uma vez, na primeira conexão de cada processo. Se o banco já
+# está na versão atual, custa apenas a leitura do user_version. Caso
+# contrário, aplica os passos pendentes numa transação exclusiva e relê a
+# versão depois de obter o lock, então dois processos iniciando juntos não
+# aplicam o mesmo passo duas vezes.
+
+TAMANHO_LOTE = 5000
+MEIAS_VIDAS_RECALCULO = 10
+
+# Preços e valores em centavos (INTEGER); veja dinheiro.Dinheiro
+TABELA_PRODUTOS = '''
+    CREATE TABLE IF NOT EXISTS {nome} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nome TEXT NOT NULL UNIQUE,
+        descricao TEXT,
+        quantidade INTEGER NOT NULL CHECK(quantidade >= 0),
+        preco INTEGER NOT NULL CHECK(preco > 0)
+    )
+'''
+
+TABELA_VENDAS = '''
+    CREATE TABLE IF NOT EXISTS {nome} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        produto_id INTEGER NOT NULL,
+        quantidade INTEGER NOT NULL CHECK(quantidade > 0),
+        data_venda TEXT NOT NULL,
+        valor_total INTEGER NOT NULL,
+        FOREIGN KEY (produto_id) REFERENCES produtos (id) ON DELETE RESTRICT
+    )
+'''
+
+
+def versao_atual():
+    return len(MIGRACOES)
+
+
+def registrar_funcoes(conn):
+    # Os triggers de reposição usam exp(), que só existe nas builds do SQLite
+    # compiladas com as funções matemáticas; nas demais vem do Python
+    try:
+        conn.execute('SELECT exp(0)')
+    except sqlite3.OperationalError:
+        conn.create_function('exp', 1, math.exp, deterministic=True)
+
+
+def migrar(conn):
+    cursor = conn.cursor()
+    cursor.execute('PRAGMA user_version')
+    if cursor.fetchone()[0] >= versao_atual():
+        return
+
+    conn.commit()
+    # Reconstruir tabelas exige as chaves estrangeiras desligadas, e isso só
+    # pode ser feito fora de uma transação; a integridade é conferida no fim.
+    cursor.execute('PRAGMA foreign_keys = OFF')
+    try:
+        cursor.execute('BEGIN EXCLUSIVE')
+        try:
+            cursor.execute('PRAGMA user_version')
+            versao = cursor.fetchone()[0]
+            for numero in range(versao, versao_atual()):
+                MIGRACOES[numero](cursor)
+                cursor.execute(f'PRAGMA user_version = {numero + 1}')
+            cursor.execute('PRAGMA foreign_key_check')
+            if cursor.fetchone() is not None:
+                raise sqlite3.IntegrityError("Vendas referenciando produtos inexistentes")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    finally:
+        cursor.execute('PRAGMA foreign_keys = ON')
+
+
+def copiar_em_lotes(cursor, origem, destino, colunas, expressoes, tamanho_lote=TAMANHO_LOTE):
+    # Copia origem -> destino em faixas de id, para que tabelas grandes não
+    # sejam materializadas num único INSERT ... SELECT
+    ultimo_id = 0
+    while True:
+        cursor.execute(f'''
+            INSERT INTO {destino} ({colunas})
+            SELECT {expressoes} FROM {origem}
+            WHERE id > ? ORDER BY id LIMIT ?
+        ''', (ultimo_id, tamanho_lote))
+        if cursor.rowcount < tamanho_lote:
+            return
+        cursor.execute(f'SELECT MAX(id) FROM {destino}')
+        ultimo_id = cursor.fetchone()[0]
+
+
+def recalcular_agregados(cursor, vendas='vendas'):
+    # "vendas" pode ser outra expressão de tabela com as mesmas colunas, como
+    # a união com as vendas arquivadas (veja arquivamento.py)
+    cursor.execute('DELETE FROM vendas_totais')
+    cursor.execute('DELETE FROM vendas_diarias')
+    cursor.execute('DELETE FROM vendas_por_produto')
+    cursor.execute(f'''
+        INSERT INTO vendas_totais (id, receita, unidades, num_vendas)
+        SELECT 1, COALESCE(SUM(valor_total), 0), COALESCE(SUM(quantidade), 0), COUNT(*)
+        FROM {vendas}
+    ''')
+    cursor.execute(f'''
+        INSERT INTO vendas_diarias (dia, receita, unidades, num_vendas)
+        SELECT substr(data_venda, 1, 10), SUM(valor_total), SUM(quantidade), COUNT(*)
+        FROM {vendas}
+        GROUP BY substr(data_venda, 1, 10)
+    ''')
+    cursor.execute(f'''
+        INSERT INTO vendas_por_produto (produto_id, receita, unidades, num_vendas)
+        SELECT produto_id, SUM(valor_total), SUM(quantidade), COUNT(*)
+        FROM {vendas}
+        GROUP BY produto_id
+    ''')
+
+
+def recalcular_reposicao(cursor):
+    # Reconstrói a velocidade de venda de cada produto a partir do histórico.
+    # Vendas mais antigas que MEIAS_VIDAS_RECALCULO meias-vidas antes da
+    # última venda pesam menos de 0,1% e são ignoradas.
+    cursor.execute('SELECT meia_vida_dias FROM reposicao_parametros WHERE id = 1')
+    meia_vida = cursor.fetchone()[0]
+    cursor.execute('DELETE FROM reposicao')
+    cursor.execute('SELECT MAX(data_venda) FROM vendas')
+    ultima = cursor.fetchone()[0]
+    if ultima is None:
+        return
+    tau = meia_vida / math.log(2)
+    cursor.execute('''
+        INSERT INTO reposicao (produto_id, taxa, atualizado_em)
+        SELECT produto_id, SUM(quantidade * exp((julianday(data_venda) - ultima) / :tau)) / :tau, ultima
+        FROM (
+            SELECT produto_id, quantidade, data_venda,
+                   MAX(julianday(data_venda)) OVER (PARTITION BY produto_id) AS ultima
+            FROM vendas
+            WHERE data_venda >= datetime(:ultima, :horizonte)
+        )
+        GROUP BY produto_id
+    ''', {'tau': tau, 'ultima': ultima, 'horizonte': f'-{meia_vida * MEIAS_VIDAS_RECALCULO} days'})
+    cursor.execute('''
+        UPDATE reposicao
+        SET dias_cobertura = (SELECT quantidade FROM produtos WHERE id = reposicao.produto_id) / taxa
+        WHERE taxa > 0
+    ''')
+
+
+def _existe(cursor, nome):
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (nome,))
+    return cursor.fetchone() is not None
+
+
+# Bancos criados antes do controle de versão estão no user_version 0, mas
+# podem já ter parte do esquema; por isso os primeiros passos usam
+# IF NOT EXISTS e conferem o estado antes de alterar.
+
+def _v1_tabelas(cursor):
+    cursor.execute(TABELA_PRODUTOS.format(nome='produtos'))
+    cursor.execute(TABELA_VENDAS.format(nome='vendas'))
+
+
+def _v2_centavos(cursor):
+    # Bancos antigos guardam preco e valor_total como REAL (reais).
+    # Reconstrói as tabelas com as colunas em centavos INTEGER.
+    cursor.execute("SELECT type FROM pragma_table_info('produtos') WHERE name = 'preco'")
+    if cursor.fetchone()[0].upper() != 'REAL':
+        return
+
+    cursor.execute("SELECT name, seq FROM sqlite_sequence WHERE name IN ('produtos', 'vendas')")
+    sequencias = cursor.fetchall()
+
+    cursor.execute(TABELA_PRODUTOS.format(nome='produtos_centavos'))
+    copiar_em_lotes(cursor, 'produtos', 'produtos_centavos',
+                    'id, nome, descricao, quantidade, preco',
+                    'id, nome, descricao, quantidade, CAST(ROUND(preco * 100) AS INTEGER)')
+    cursor.execute(TABELA_VENDAS.format(nome='vendas_centavos'))
+    copiar_em_lotes(cursor, 'vendas', 'vendas_centavos',
+                    'id, produto_id, quantidade, data_venda, valor_total',
+                    'id, produto_id, quantidade, data_venda, CAST(ROUND(valor_total * 100) AS INTEGER)')
+    # Remover as tabelas também remove seus índices e triggers, que os
+    # passos seguintes recriam
+    cursor.execute('DROP TABLE vendas')
+    cursor.execute('DROP TABLE produtos')
+    cursor.execute('ALTER TABLE produtos_centavos RENAME TO produtos')
+    cursor.execute('ALTER TABLE vendas_centavos RENAME TO vendas')
+    cursor.executemany('UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?',
+                       [(seq, nome) for nome, seq in sequencias])
+
+    # Os totais também eram REAL: recriados e recalculados no passo 5
+    cursor.execute('DROP TABLE IF EXISTS vendas_totais')
+    cursor.execute('DROP TABLE IF EXISTS vendas_diarias')
+    cursor.execute('DROP TABLE IF EXISTS vendas_por_produto')
+
+
+def _v3_indices_vendas(cursor):
+    # Índice para a paginação do histórico por (data_venda, id)
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_vendas_data_id
+        ON vendas (data_venda, id)
+    ''')
+    # Índices de cobertura para os relatórios por período e por produto:
+    # as consultas percorrem só o índice, sem ler a tabela
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_vendas_data_cobertura
+        ON vendas (data_venda, produto_id, quantidade, valor_total)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_vendas_produto_data
+        ON vendas (produto_id, data_venda, quantidade, valor_total)
+    ''')
+
+
+def _v4_busca(cursor):
+    # Índice de texto completo sobre nome e descrição (FTS5 com conteúdo
+    # externo), mantido por triggers. remove_diacritics faz "acucar"
+    # encontrar "Açúcar"; prefix acelera buscas por prefixo curto.
+    existia = _existe(cursor, 'produtos_fts')
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS produtos_fts USING fts5(
+            nome, descricao,
+            content='produtos', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        )
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS produtos_fts_ai AFTER INSERT ON produtos BEGIN
+            INSERT INTO produtos_fts (rowid, nome, descricao)
+            VALUES (new.id, new.nome, new.descricao);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS produtos_fts_ad AFTER DELETE ON produtos BEGIN
+            INSERT INTO produtos_fts (produtos_fts, rowid, nome, descricao)
+            VALUES ('delete', old.id, old.nome, old.descricao);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS produtos_fts_au AFTER UPDATE OF nome, descricao ON produtos BEGIN
+            INSERT INTO produtos_fts (produtos_fts, rowid, nome, descricao)
+            VALUES ('delete', old.id, old.nome, old.descricao);
+            INSERT INTO produtos_fts (rowid, nome, descricao)
+            VALUES (new.id, new.nome, new.descricao);
+        END
+    ''')
+    if not existia:
+        # Indexa os produtos já cadastrados
+        cursor.execute("INSERT INTO produtos_fts (produtos_fts) VALUES ('rebuild')")
+
+
+def _v5_agregados(cursor):
+    # Totais de vendas (geral, por dia e por produto) mantidos de forma
+    # incremental por trigger, para que os relatórios leiam uma linha em
+    # vez de somar a tabela vendas inteira.
+    existia = _existe(cursor, 'vendas_totais')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS vendas_totais (
+            id INTEGER PRIMARY KEY CHECK(id = 1),
+            receita INTEGER NOT NULL DEFAULT 0,
+            unidades INTEGER NOT NULL DEFAULT 0,
+            num_vendas INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS vendas_diarias (
+            dia TEXT PRIMARY KEY,
+            receita INTEGER NOT NULL DEFAULT 0,
+            unidades INTEGER NOT NULL DEFAULT 0,
+            num_vendas INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS vendas_por_produto (
+            produto_id INTEGER PRIMARY KEY,
+            receita INTEGER NOT NULL DEFAULT 0,
+            unidades INTEGER NOT NULL DEFAULT 0,
+            num_vendas INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS vendas_agregados_ai AFTER INSERT ON vendas BEGIN
+            INSERT INTO vendas_totais (id, receita, unidades, num_vendas)
+            VALUES (1, new.valor_total, new.quantidade, 1)
+            ON CONFLICT(id) DO UPDATE SET
+                receita = receita + excluded.receita,
+                unidades = unidades + excluded.unidades,
+                num_vendas = num_vendas + 1;
+            INSERT INTO vendas_diarias (dia, receita, unidades, num_vendas)
+            VALUES (substr(new.data_venda, 1, 10), new.valor_total, new.quantidade, 1)
+            ON CONFLICT(dia) DO UPDATE SET
+                receita = receita + excluded.receita,
+                unidades = unidades + excluded.unidades,
+                num_vendas = num_vendas + 1;
+            INSERT INTO vendas_por_produto (produto_id, receita, unidades, num_vendas)
+            VALUES (new.produto_id, new.valor_total, new.quantidade, 1)
+            ON CONFLICT(produto_id) DO UPDATE SET
+                receita = receita + excluded.receita,
+                unidades = unidades + excluded.unidades,
+                num_vendas = num_vendas + 1;
+        END
+    ''')
+    if not existia:
+        recalcular_agregados(cursor)
+
+
+def _v6_indices_produtos(cursor):
+    # Ordenação da grade de produtos por quantidade ou preço, paginada por
+    # (coluna, id); a ordenação por nome já usa o índice de UNIQUE(nome)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_produtos_quantidade ON produtos (quantidade, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_produtos_preco ON produtos (preco, id)')
+
+
+def _v7_reposicao(cursor):
+    # Velocidade de venda por produto (unidades/dia), mantida por trigger a
+    # cada venda como média móvel exponencial no tempo:
+    #   taxa = taxa * exp(-dt / tau) + quantidade / tau,  tau = meia_vida / ln 2
+    # dias_cobertura = estoque / taxa fica pré-calculado e indexado; como a
+    # taxa só diminui entre uma venda e outra, o valor gravado nunca é maior
+    # que o atual, e o índice serve para achar os candidatos à reposição.
+    existia = _existe(cursor, 'reposicao')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS reposicao_parametros (
+            id INTEGER PRIMARY KEY CHECK(id = 1),
+            meia_vida_dias REAL NOT NULL CHECK(meia_vida_dias > 0),
+            cobertura_minima_dias REAL NOT NULL CHECK(cobertura_minima_dias >= 0),
+            cobertura_alvo_dias REAL NOT NULL CHECK(cobertura_alvo_dias >= 0)
+        )
+    ''')
+    cursor.execute('''
+        INSERT OR IGNORE INTO reposicao_parametros (id, meia_vida_dias, cobertura_minima_dias, cobertura_alvo_dias)
+        VALUES (1, 7, 7, 30)
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS reposicao (
+            produto_id INTEGER PRIMARY KEY REFERENCES produtos (id) ON DELETE CASCADE,
+            taxa REAL NOT NULL,
+            atualizado_em REAL NOT NULL,
+            dias_cobertura REAL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_reposicao_cobertura ON reposicao (dias_cobertura)')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS vendas_reposicao_ai AFTER INSERT ON vendas
+        BEGIN
+            INSERT INTO reposicao (produto_id, taxa, atualizado_em)
+            SELECT new.produto_id, new.quantidade / (meia_vida_dias / 0.6931471805599453), julianday(new.data_venda)
+            FROM reposicao_parametros WHERE id = 1
+            ON CONFLICT(produto_id) DO UPDATE SET
+                taxa = taxa * exp(-max(excluded.atualizado_em - atualizado_em, 0)
+                                  * 0.6931471805599453 / (SELECT meia_vida_dias FROM reposicao_parametros WHERE id = 1))
+                       + excluded.taxa,
+                atualizado_em = max(atualizado_em, excluded.atualizado_em);
+            UPDATE reposicao
+            SET dias_cobertura = (SELECT quantidade FROM produtos WHERE id = new.produto_id) / taxa
+            WHERE produto_id = new.produto_id AND taxa > 0;
+        END
+    ''')
+    # Entrada de mercadoria (ou ajuste de estoque) muda a cobertura sem venda
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS produtos_reposicao_au AFTER UPDATE OF quantidade ON produtos
+        BEGIN
+            UPDATE reposicao
+            SET dias_cobertura = new.quantidade / taxa
+            WHERE produto_id = new.id AND taxa > 0;
+        END
+    ''')
+    if not existia:
+        recalcular_reposicao(cursor)
+
+
+def _v8_codigo_produtos(cursor):
+    # Código de barras ou SKU, opcional e único quando preenchido (o índice
+    # UNIQUE aceita vários NULL): o leitor do caixa faz uma leitura exata
+    colunas = [row[1] for row in cursor.execute('PRAGMA table_info(produtos)').fetchall()]
+    if 'codigo' not in colunas:
+        cursor.execute('ALTER TABLE produtos ADD COLUMN codigo TEXT')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_produtos_codigo ON produtos (codigo)')
+    # Sugestões por prefixo do nome sem diferenciar maiúsculas: com este
+    # índice o "nome LIKE 'texto%'" vira uma busca por faixa
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_produtos_nome_nocase ON produtos (nome COLLATE NOCASE)')
+
+
+def _v9_versao_produtos(cursor):
+    # Versão do cadastro para a gravação otimista de Produto.salvar: cada
+    # edição soma 1; vendas mudam só a quantidade e não a versão
+    colunas = [row[1] for row in cursor.execute('PRAGMA table_info(produtos)').fetchall()]
+    if 'versao' not in colunas:
+        cursor.execute('ALTER TABLE produtos ADD COLUMN versao INTEGER NOT NULL DEFAULT 0')
+
+
+def _v10_arquivos_vendas(cursor):
+    # Meses de vendas movidos para os arquivos anuais (veja arquivamento.py).
+    # ultimo_id é a marca do mês: as vendas dele com id até ultimo_id estão
+    # no arquivo e já saíram da tabela vendas.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS arquivos_vendas (
+            mes TEXT PRIMARY KEY,
+            arquivo TEXT NOT NULL,
+            ultimo_id INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+
+
+def _v11_versao_catalogo(cursor):
+    # Contador de alterações do catálogo, somado por trigger a cada linha de
+    # produtos inserida, alterada (inclusive o estoque, numa venda) ou
+    # removida, por qualquer conexão ou processo. O CatalogoCache compara o
+    # valor com o que já aplicou para saber se precisa recarregar.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS catalogo_versao (
+            id INTEGER PRIMARY KEY CHECK(id = 1),
+            versao INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('INSERT OR IGNORE INTO catalogo_versao (id, versao) VALUES (1, 0)')
+    for evento in ('INSERT', 'UPDATE', 'DELETE'):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS produtos_versao_{evento.lower()} AFTER {evento} ON produtos
+            BEGIN
+                UPDATE catalogo_versao SET versao = versao + 1 WHERE id = 1;
+            END
+        ''')
+
+
+MIGRACOES = [
+    _v1_tabelas,
+    _v2_centavos,
+    _v3_indices_vendas,
+    _v4_busca,
+    _v5_agregados,
+    _v6_indices_produtos,
+    _v7_reposicao,
+    _v8_codigo_produtos,
+    _v9_versao_produtos,
+    _v10_arquivos_vendas,
+    _v11_versao_catalogo,
+]
@@ -0,0 +1,855 @@
+from contextlib import contextmanager
+from datetime import datetime
+import sqlite3
+import threading
+import time
+import queue
+import re
+from collections import namedtuple
+import instrumentacao
+import migracoes
+from dinheiro import Dinheiro
+
+# Camada de modelo do Sistema de Vendas: conexões, produtos e vendas. Não
+# depende do Flet, então scripts, cron e o servidor importam só este módulo.
+
+# Cobre as threads de eventos do Flet (até 32) e as threads de trabalho do app
+TAMANHO_POOL_PADRAO = 40
+
+class PoolConexoes:
+    # Pool limitado de conexões SQLite. Quando todas estão emprestadas,
+    # obter() espera até "espera" segundos por uma devolução.
+    def __init__(self, abrir, tamanho, espera=30.0):
+        self._abrir = abrir
+        self._vagas = threading.BoundedSemaphore(tamanho)
+        self._livres = []
+        self._lock = threading.Lock()
+        self._espera = espera
+        self._fechado = False
+    
+    def obter(self):
+        if not self._vagas.acquire(timeout=self._espera):
+            raise sqlite3.OperationalError("Nenhuma conexão disponível no pool")
+        with self._lock:
+            if self._livres:
+                return self._livres.pop()
+        try:
+            return self._abrir()
+        except BaseException:
+            self._vagas.release()
+            raise
+    
+    def devolver(self, conn):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            with self._lock:
+                if self._fechado:
+                    conn.close()
+                else:
+                    self._livres.append(conn)
+        finally:
+            self._vagas.release()
+    
+    def fechar(self):
+        with self._lock:
+            self._fechado = True
+            livres, self._livres = self._livres, []
+        for conn in livres:
+            conn.close()
+
+class _Emprestimo:
+    # Conexão do pool presa a uma thread; volta ao pool quando a thread
+    # termina (o threading.local descarta o objeto) ou em Database.close().
+    def __init__(self, pool):
+        self.pool = pool
+        self.conn = pool.obter()
+        self.cursor = self.conn.cursor()
+    
+    def devolver(self):
+        if self.conn is not None:
+            conn, self.conn, self.cursor = self.conn, None, None
+            self.pool.devolver(conn)
+    
+    def __del__(self):
+        try:
+            self.devolver()
+        except Exception:
+            pass
+
+def erro_de_bloqueio(e):
+    codigo = getattr(e, 'sqlite_errorcode', None)
+    if codigo is not None:
+        return codigo & 0xff in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    return 'locked' in str(e) or 'busy' in str(e)
+
+class Database:
+    def __init__(self, db_name='sistema_vendas.db', tamanho_pool=TAMANHO_POOL_PADRAO, wal=True,
+                 synchronous='NORMAL', cache_size=-16000, mmap_size=0, busy_timeout=5.0,
+                 tentativas=5):
+        if synchronous.upper() not in ('OFF', 'NORMAL', 'FULL', 'EXTRA'):
+            raise ValueError(f"Valor inválido para synchronous: {synchronous}")
+        self.db_name = db_name
+        self.wal = wal
+        self.synchronous = synchronous.upper()
+        self.cache_size = int(cache_size)  # negativo = KiB, positivo = páginas
+        self.mmap_size = int(mmap_size)
+        self.busy_timeout = busy_timeout
+        self.tentativas = tentativas
+        self.catalogo = CatalogoCache(self)
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_pronto = False
+        self._escrita = PoolConexoes(self._abrir_conexao, tamanho_pool)
+        self._leitura = PoolConexoes(lambda: self._abrir_conexao(somente_leitura=True), tamanho_pool)
+    
+    def get_conn(self):
+        # Conexão de escrita da thread atual
+        return self._emprestimo('escrita', self._escrita)
+    
+    def get_conn_leitura(self):
+        # Conexão somente leitura da thread atual; com WAL, leituras nunca
+        # bloqueiam nem são bloqueadas pelo caixa que está gravando
+        return self._emprestimo('leitura', self._leitura)
+    
+    @contextmanager
+    def conexao(self, somente_leitura=False):
+        # Empréstimo curto, para threads de trabalho que não devem prender
+        # uma conexão por toda a vida
+        pool = self._leitura if somente_leitura else self._escrita
+        conn = pool.obter()
+        try:
+            yield conn
+        finally:
+            pool.devolver(conn)
+    
+    def transacao(self, operacao):
+        # Executa operacao(cursor) e faz commit. Em SQLITE_BUSY desfaz e tenta
+        # de novo com espera crescente; qualquer outro erro desfaz e propaga.
+        conn, cursor = self.get_conn()
+        for tentativa in range(self.tentativas):
+            try:
+                resultado = operacao(cursor)
+                conn.commit()
+                return resultado
+            except sqlite3.OperationalError as e:
+                conn.rollback()
+                if not erro_de_bloqueio(e) or tentativa == self.tentativas - 1:
+                    raise
+                time.sleep(0.05 * 2 ** tentativa)
+            except BaseException:
+                conn.rollback()
+                raise
+    
+    def _emprestimo(self, tipo, pool):
+        emprestimo = getattr(self._local, tipo, None)
+        if emprestimo is None:
+            emprestimo = _Emprestimo(pool)
+            setattr(self._local, tipo, emprestimo)
+        return emprestimo.conn, emprestimo.cursor
+    
+    def _abrir_conexao(self, somente_leitura=False):
+        if not self._schema_pronto and somente_leitura:
+            # O esquema é criado por uma conexão de escrita
+            with self.conexao():
+                pass
+        fabrica = instrumentacao.ConexaoInstrumentada if instrumentacao.ativa() else sqlite3.Connection
+        conn = sqlite3.connect(self.db_name, timeout=self.busy_timeout, check_same_thread=False, factory=fabrica)
+        migracoes.registrar_funcoes(conn)
+        conn.execute('PRAGMA foreign_keys = ON')
+        conn.execute(f'PRAGMA synchronous = {self.synchronous}')
+        conn.execute(f'PRAGMA cache_size = {self.cache_size}')
+        conn.execute(f'PRAGMA mmap_size = {self.mmap_size}')
+        if somente_leitura:
+            conn.execute('PRAGMA query_only = ON')
+        else:
+            with self._schema_lock:
+                if not self._schema_pronto:
+                    if self.wal:
+                        conn.execute('PRAGMA journal_mode = WAL')
+                    migracoes.migrar(conn)
+                    self._schema_pronto = True
+        return conn
+    
+    def close(self):
+        # Devolve ao pool as conexões emprestadas à thread atual
+        for tipo in ('escrita', 'leitura'):
+            emprestimo = getattr(self._local, tipo, None)
+            if emprestimo is not None:
+                emprestimo.devolver()
+                delattr(self._local, tipo)
+    
+    def fechar_tudo(self):
+        self.close()
+        self.catalogo.fechar()
+        self._escrita.fechar()
+        self._leitura.fechar()
+
+LIMITE_BUSCA = 100
+ORDENACOES_PRODUTOS = ('nome', 'quantidade', 'preco')
+LIMITE_SUGESTOES = 8
+
+# Projeção usada pela tabela de vendas da tela: registro em tupla, só com as
+# colunas que a tabela mostra
+LinhaVenda = namedtuple('LinhaVenda', 'id data_venda nome_produto quantidade valor_total')
+
+
+def _versao_catalogo(cursor):
+    # Versão do catálogo depois da alteração feita na transação em curso,
+    # para o write-through no CatalogoCache
+    cursor.execute('SELECT versao FROM catalogo_versao WHERE id = 1')
+    return cursor.fetchone()[0]
+
+
+def _consultar(conn, fabrica, sql, parametros=()):
+    # Cursor próprio com row_factory: cada linha já sai do sqlite3 como o
+    # registro final, sem uma lista de tuplas intermediária. Nas leituras do
+    # histórico o mesmo produto aparece em milhares de linhas e o sqlite3 cria
+    # um str novo para cada uma; as fábricas dessas consultas guardam o
+    # primeiro e reaproveitam, mantendo uma cópia só de cada nome.
+    cursor = conn.cursor()
+    cursor.row_factory = fabrica
+    try:
+        return cursor.execute(sql, parametros).fetchall()
+    finally:
+        cursor.close()
+
+
+class ConflitoDeVersao(ValueError):
+    # O cadastro foi alterado por outra pessoa depois de lido. "atual" traz o
+    # produto como está agora, para a tela mostrar e o usuário reaplicar.
+    def __init__(self, atual):
+        super().__init__("O produto foi alterado por outra pessoa enquanto você editava")
+        self.atual = atual
+
+
+class Produto:
+    # Sem __dict__ por instância; o catálogo inteiro fica em memória no cache
+    __slots__ = ('id', 'nome', 'descricao', 'quantidade', 'preco', 'codigo', 'versao', 'quantidade_lida')
+    
+    def __init__(self, id=None, nome='', descricao='', quantidade=0, preco=Dinheiro(0), codigo=None, versao=0):
+        self.id = id
+        self.nome = nome
+        self.descricao = descricao
+        self.quantidade = quantidade
+        self.preco = preco if isinstance(preco, Dinheiro) else Dinheiro.de_reais(preco)
+        self.codigo = codigo or None  # código de barras ou SKU, opcional
+        # Versão do cadastro lida do banco e o estoque de então; salvar()
+        # grava o estoque como a diferença entre quantidade e quantidade_lida
+        self.versao = versao
+        self.quantidade_lida = quantidade
+    
+    def validar(self):
+        if not self.nome:
+            raise ValueError("O nome do produto é obrigatório")
+        if self.quantidade < 0:
+            raise ValueError("A quantidade não pode ser negativa")
+        if self.preco.centavos <= 0:
+            raise ValueError("O preço deve ser maior que zero")
+    
+    def salvar(self, db):
+        # Levanta ConflitoDeVersao se o cadastro mudou desde a leitura
+        try:
+            id, quantidade, versao, versao_catalogo = db.transacao(self._gravar)
+        except sqlite3.IntegrityError as e:
+            if 'produtos.codigo' in str(e):
+                raise ValueError(f"Já existe um produto com o código {self.codigo}")
+            if 'quantidade' in str(e):
+                raise ValueError("O ajuste deixaria o estoque negativo: houve vendas desde a leitura")
+            raise ValueError(f"Erro ao salvar produto: {str(e)}")
+        except sqlite3.Error as e:
+            raise ValueError(f"Erro ao salvar produto: {str(e)}")
+        # Só depois do commit: db.transacao pode repetir _gravar, que tem de
+        # partir sempre dos valores lidos
+        self.id, self.quantidade, self.versao = id, quantidade, versao
+        self.quantidade_lida = quantidade
+        db.catalogo.atualizar(self, versao_catalogo)
+    
+    def _gravar(self, cursor):
+        # Devolve (id, quantidade, versao) gravados e a versão do catálogo
+        if self.id is None:
+            cursor.execute('''
+                INSERT INTO produtos (nome, descricao, quantidade, preco, codigo)
+                VALUES (?, ?, ?, ?, ?)
+                RETURNING id, quantidade, versao
+            ''', (self.nome, self.descricao, self.quantidade, self.preco, self.codigo))
+            row = cursor.fetchone()
+        else:
+            # Compare-and-swap pela versão: só grava se ninguém alterou o
+            # cadastro desde a leitura, sem travar nada enquanto o usuário
+            # edita. Vendas baixam o estoque sem mudar a versão; por isso o
+            # estoque entra como diferença sobre o valor lido, e as vendas
+            # feitas nesse meio tempo não são apagadas.
+            cursor.execute('''
+                UPDATE produtos
+                SET nome=?, descricao=?, quantidade=quantidade + ?, preco=?, codigo=?, versao=versao + 1
+                WHERE id=? AND versao=?
+                RETURNING id, quantidade, versao
+            ''', (self.nome, self.descricao, self.quantidade - self.quantidade_lida, self.preco, self.codigo,
+                  self.id, self.versao))
+            row = cursor.fetchone()
+            if row is None:
+                cursor.execute('''
+                    SELECT id, nome, descricao, quantidade, preco, codigo, versao FROM produtos WHERE id=?
+                ''', (self.id,))
+                atual = cursor.fetchone()
+                if atual is None:
+                    raise ValueError("Produto não encontrado")
+                raise ConflitoDeVersao(Produto._de_linha(cursor, atual))
+        return (*row, _versao_catalogo(cursor))
+    
+    def remover(self, db):
+        if self.id is not None:
+            def operacao(cursor):
+                # A chave estrangeira só enxerga as vendas que não foram
+                # arquivadas; vendas_por_produto conta todas
+                cursor.execute('SELECT 1 FROM vendas_por_produto WHERE produto_id=?', (self.id,))
+                if cursor.fetchone() is not None:
+                    raise ValueError("O produto tem vendas registradas e não pode ser removido")
+                cursor.execute('DELETE FROM produtos WHERE id=?', (self.id,))
+                return _versao_catalogo(cursor)
+            try:
+                versao = db.transacao(operacao)
+                db.catalogo.remover(self.id, versao)
+            except sqlite3.Error as e:
+                raise ValueError(f"Erro ao remover produto: {str(e)}")
+    
+    def copiar(self):
+        return Produto(id=self.id, nome=self.nome, descricao=self.descricao,
+                       quantidade=self.quantidade, preco=self.preco, codigo=self.codigo, versao=self.versao)
+    
+    @staticmethod
+    def buscar_todos(db):
+        # Servido pelo cache do catálogo; os objetos retornados são
+        # compartilhados, então use copiar() antes de alterá-los.
+        return db.catalogo.todos(db)
+    
+    @staticmethod
+    def buscar_por_id(db, id):
+        return db.catalogo.por_id(db, id)
+    
+    @staticmethod
+    def buscar_por_nome(db, nome):
+        produto = db.catalogo.por_nome(db, nome)
+        if produto:
+            return produto
+        encontrados = Produto.pesquisar(db, nome, limite=1)
+        return encontrados[0] if encontrados else None
+    
+    @staticmethod
+    def buscar_por_codigo(db, codigo):
+        # Leitura exata pelo índice único de codigo: o caminho do leitor de
+        # código de barras, sem passar pelo cache nem pela busca por texto
+        codigo = (codigo or '').strip()
+        if not codigo:
+            return None
+        conn, _ = db.get_conn_leitura()
+        encontrados = _consultar(conn, Produto._de_linha, '''
+            SELECT id, nome, descricao, quantidade, preco, codigo, versao FROM produtos WHERE codigo = ?
+        ''', (codigo,))
+        return encontrados[0] if encontrados else None
+    
+    @staticmethod
+    def sugerir(db, texto, limite=LIMITE_SUGESTOES):
+        # Sugestões do seletor de produtos enquanto o caixa digita: primeiro o
+        # produto com esse código, depois os nomes que começam com o texto
+        # (sem diferenciar maiúsculas, pelo índice idx_produtos_nome_nocase)
+        # e, se ainda faltar, a busca por palavras em qualquer posição.
+        texto = texto.strip()
+        if not texto:
+            return []
+        produto = Produto.buscar_por_codigo(db, texto)
+        sugestoes = [produto] if produto else []
+        prefixo = re.sub(r'([\\%_])', r'\\\1', texto) + '%'
+        conn, _ = db.get_conn_leitura()
+        sugestoes += _consultar(conn, Produto._de_linha, '''
+            SELECT id, nome, descricao, quantidade, preco, codigo, versao
+            FROM produtos
+            WHERE nome LIKE ? ESCAPE '\\'
+            ORDER BY nome COLLATE NOCASE
+            LIMIT ?
+        ''', (prefixo, limite))
+        if len(sugestoes) < limite:
+            sugestoes += Produto.pesquisar(db, texto, limite)
+        vistos = set()
+        unicos = []
+        for produto in sugestoes:
+            if produto.id not in vistos:
+                vistos.add(produto.id)
+                unicos.append(produto)
+        return unicos[:limite]
+    
+    @staticmethod
+    def pesquisar(db, termo, limite=LIMITE_BUSCA):
+        # Cada palavra do termo vira um prefixo ("caf" encontra "Café");
+        # todas precisam aparecer. Resultados mais relevantes primeiro,
+        # com o nome pesando mais que a descrição.
+        palavras = re.findall(r'\w+', termo)
+        if not palavras:
+            return []
+        consulta = ' '.join(f'"{palavra}"*' for palavra in palavras)
+        conn, _ = db.get_conn_leitura()
+        return _consultar(conn, Produto._de_linha, '''
+            SELECT p.id, p.nome, p.descricao, p.quantidade, p.preco, p.codigo, p.versao
+            FROM produtos_fts
+            JOIN produtos p ON p.id = produtos_fts.rowid
+            WHERE produtos_fts MATCH ?
+            ORDER BY bm25(produtos_fts, 10.0, 1.0)
+            LIMIT ?
+        ''', (consulta, limite))
+    
+    @staticmethod
+    def buscar_pagina(db, limite=50, apos=None, ordem='nome', decrescente=False):
+        # Paginação por chave sobre a coluna de ordenação: "apos" é o par
+        # (valor da coluna, id) do último produto da página anterior. Os
+        # índices (coluna, id) deixam cada página com o mesmo custo.
+        if ordem not in ORDENACOES_PRODUTOS:
+            raise ValueError(f"Ordenação inválida: {ordem}")
+        direcao, comparacao = ('DESC', '<') if decrescente else ('ASC', '>')
+        conn, _ = db.get_conn_leitura()
+        filtro = ''
+        parametros = (limite,)
+        if apos is not None:
+            filtro = f'WHERE ({ordem}, id) {comparacao} (?, ?)'
+            parametros = (apos[0], apos[1], limite)
+        return _consultar(conn, Produto._de_linha, f'''
+            SELECT id, nome, descricao, quantidade, preco, codigo, versao
+            FROM produtos
+            {filtro}
+            ORDER BY {ordem} {direcao}, id {direcao}
+            LIMIT ?
+        ''', parametros)
+    
+    @staticmethod
+    def _carregar_todos(cursor):
+        return _consultar(cursor.connection, Produto._de_linha, '''
+            SELECT id, nome, descricao, quantidade, preco, codigo, versao FROM produtos ORDER BY nome
+        ''')
+    
+    @staticmethod
+    def _de_linha(cursor, row):
+        return Produto(row[0], row[1], row[2], row[3], Dinheiro(row[4]), row[5], row[6])
+
+class CatalogoCache:
+    # Cache em memória do catálogo de produtos, compartilhado pelas threads
+    # de um mesmo Database. A tabela catalogo_versao conta as alterações em
+    # produtos (veja migracoes._v11_versao_catalogo); o cache guarda a versão
+    # que reflete e a confere numa conexão própria antes de cada leitura.
+    # As gravações feitas por Produto e Venda são aplicadas aqui logo após o
+    # commit (write-through) junto com a versão que geraram, então só
+    # alterações que o cache não viu (outro processo, importação) recarregam.
+    def __init__(self, db):
+        self._db = db
+        self._lock = threading.RLock()
+        self._conn = None
+        self._por_id = None  # None indica que o catálogo ainda não foi carregado
+        self._por_nome = {}
+        self._ordenados = None
+        self._versao = None
+        self.hits = 0
+        self.misses = 0
+    
+    def todos(self, db):
+        with self._lock:
+            self._garantir_carregado()
+            if self._ordenados is None:
+                self._ordenados = sorted(self._por_id.values(), key=lambda p: p.nome)
+            return list(self._ordenados)
+    
+    def por_id(self, db, id):
+        with self._lock:
+            self._garantir_carregado()
+            produto = self._por_id.get(int(id))
+            return produto.copiar() if produto else None
+    
+    def por_nome(self, db, nome):
+        with self._lock:
+            self._garantir_carregado()
+            produto = self._por_nome.get(nome)
+            return produto.copiar() if produto else None
+    
+    def atualizar(self, produto, versao):
+        with self._lock:
+            if not self._avancar(versao):
+                return
+            anterior = self._por_id.get(produto.id)
+            if anterior is not None:
+                self._por_nome.pop(anterior.nome, None)
+            copia = produto.copiar()
+            self._por_id[copia.id] = copia
+            self._por_nome[copia.nome] = copia
+            self._ordenados = None
+    
+    def remover(self, produto_id, versao):
+        with self._lock:
+            if not self._avancar(versao):
+                return
+            produto = self._por_id.pop(produto_id, None)
+            if produto is not None:
+                self._por_nome.pop(produto.nome, None)
+                self._ordenados = None
+    
+    def definir_estoque(self, produto_id, quantidade, versao):
+        with self._lock:
+            if not self._avancar(versao):
+                return
+            produto = self._por_id.get(produto_id)
+            if produto is not None:
+                produto.quantidade = quantidade
+    
+    def invalidar(self):
+        with self._lock:
+            self._por_id = None
+            self._por_nome = {}
+            self._ordenados = None
+            self._versao = None
+    
+    def fechar(self):
+        with self._lock:
+            self.invalidar()
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+    
+    def estatisticas(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'produtos': len(self._por_id) if self._por_id is not None else 0,
+            }
+    
+    def _avancar(self, versao):
+        # A alteração de "versao" é a seguinte à que o cache reflete: aplica.
+        # Se já está refletida (uma recarga veio depois do commit), ignora. Se
+        # há uma lacuna, houve alterações que o cache não viu: descarta tudo.
+        if self._por_id is None:
+            return False
+        if versao == self._versao + 1:
+            self._versao = versao
+            return True
+        if versao > self._versao:
+            self.invalidar()
+        return False
+    
+    def _garantir_carregado(self):
+        if self._conn is None:
+            self._conn = self._db._abrir_conexao(somente_leitura=True)
+        cursor = self._conn.cursor()
+        try:
+            cursor.execute('SELECT versao FROM catalogo_versao WHERE id = 1')
+            if self._por_id is not None and cursor.fetchone()[0] == self._versao:
+                self.hits += 1
+                return
+            self.misses += 1
+            # Versão e produtos lidos do mesmo instantâneo
+            cursor.execute('BEGIN')
+            try:
+                cursor.execute('SELECT versao FROM catalogo_versao WHERE id = 1')
+                versao = cursor.fetchone()[0]
+                produtos = Produto._carregar_todos(cursor)
+            finally:
+                self._conn.rollback()
+        finally:
+            cursor.close()
+        self._por_id = {p.id: p for p in produtos}
+        self._por_nome = {p.nome: p for p in produtos}
+        self._ordenados = produtos
+        self._versao = versao
+
+class Venda:
+    __slots__ = ('id', 'produto_id', 'quantidade', 'data_venda', 'valor_total',
+                 'nome_produto', 'descricao_produto', 'estoque_restante')
+    
+    def __init__(self, id=None, produto_id=None, quantidade=0, data_venda=None, valor_total=Dinheiro(0),
+                 nome_produto=None, descricao_produto=None):
+        self.id = id
+        self.produto_id = produto_id
+        self.quantidade = quantidade
+        self.data_venda = data_venda or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self.valor_total = valor_total
+        # Preenchidos só pelas consultas com JOIN em produtos
+        self.nome_produto = nome_produto
+        self.descricao_produto = descricao_produto
+        # Preenchido ao registrar: o estoque do produto logo após a venda
+        self.estoque_restante = None
+    
+    def registrar(self, db):
+        try:
+            estoque, versao = db.transacao(self._registrar_sem_commit)
+        except sqlite3.Error as e:
+            raise ValueError(f"Erro ao registrar venda: {str(e)}")
+        db.catalogo.definir_estoque(self.produto_id, estoque, versao)
+        return estoque
+
+    @staticmethod
+    def registrar_carrinho(db, itens):
+        # Registra todas as linhas (produto_id, quantidade) numa única transação:
+        # ou todas são gravadas com um só commit, ou nenhuma é.
+        data_venda = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        vendas = [Venda(produto_id=produto_id, quantidade=quantidade, data_venda=data_venda)
+                  for produto_id, quantidade in itens]
+        if not vendas:
+            raise ValueError("O carrinho está vazio")
+
+        def operacao(cursor):
+            return [venda._registrar_sem_commit(cursor) for venda in vendas]
+        try:
+            estoques = db.transacao(operacao)
+        except sqlite3.Error as e:
+            raise ValueError(f"Erro ao registrar venda: {str(e)}")
+        for venda, (estoque, versao) in zip(vendas, estoques):
+            db.catalogo.definir_estoque(venda.produto_id, estoque, versao)
+        return vendas
+
+    def _registrar_sem_commit(self, cursor):
+        if self.quantidade <= 0:
+            raise ValueError("Informe uma quantidade válida")
+
+        # A baixa de estoque é condicional: se outro caixa vendeu as últimas
+        # unidades antes, o UPDATE não afeta nenhuma linha e nada é gravado.
+        cursor.execute('''
+            UPDATE produtos
+            SET quantidade = quantidade - ?
+            WHERE id = ? AND quantidade >= ?
+            RETURNING preco, quantidade, nome
+        ''', (self.quantidade, self.produto_id, self.quantidade))
+        row = cursor.fetchone()
+        if row is None:
+            cursor.execute('SELECT quantidade FROM produtos WHERE id=?', (self.produto_id,))
+            estoque = cursor.fetchone()
+            if estoque is None:
+                raise ValueError("Produto não encontrado")
+            raise ValueError(f"Estoque insuficiente. Disponível: {estoque[0]}")
+
+        self.valor_total = Dinheiro(row[0] * self.quantidade)
+        self.estoque_restante, self.nome_produto = row[1], row[2]
+        cursor.execute('''
+            INSERT INTO vendas (produto_id, quantidade, data_venda, valor_total)
+            VALUES (?, ?, ?, ?)
+        ''', (self.produto_id, self.quantidade, self.data_venda, self.valor_total))
+        self.id = cursor.lastrowid
+        return row[1], _versao_catalogo(cursor)  # estoque restante
+
+    @staticmethod
+    def buscar_todas(db):
+        textos = {}
+        def fabrica(cursor, row):
+            nome, descricao = row[5], row[6]
+            return Venda(row[0], row[1], row[2], row[3], Dinheiro(row[4]),
+                         textos.setdefault(nome, nome), textos.setdefault(descricao, descricao))
+        conn, _ = db.get_conn_leitura()
+        return _consultar(conn, fabrica, '''
+            SELECT v.id, v.produto_id, v.quantidade, v.data_venda, v.valor_total, 
+                   p.nome, p.descricao
+            FROM vendas v
+            JOIN produtos p ON v.produto_id = p.id
+            ORDER BY v.data_venda DESC
+        ''')
+
+    @staticmethod
+    def buscar_pagina(db, limite=10, apos=None):
+        # Paginação por chave: "apos" é o par (data_venda, id) da última venda
+        # da página anterior. Cada página custa o mesmo, independente do
+        # tamanho do histórico, pois percorre o índice idx_vendas_data_id.
+        return Venda._pagina(db, Venda._de_linha, '''
+            v.id, v.produto_id, v.quantidade, v.data_venda, v.valor_total, p.nome, p.descricao
+        ''', limite, apos)
+
+    @staticmethod
+    def buscar_linhas(db, limite=10, apos=None):
+        # Mesma ordem e paginação de buscar_pagina, mas só com as colunas da
+        # tabela de vendas da tela (LinhaVenda)
+        nomes = {}
+        def fabrica(cursor, row):
+            nome = row[2]
+            return LinhaVenda(row[0], row[1], nomes.setdefault(nome, nome), row[3], Dinheiro(row[4]))
+        return Venda._pagina(db, fabrica, 'v.id, v.data_venda, p.nome, v.quantidade, v.valor_total', limite, apos)
+
+    @staticmethod
+    def _pagina(db, fabrica, colunas, limite, apos):
+        # A página que chega aos meses arquivados continua nos arquivos, do mais
+        # novo para o mais antigo, cada um pelo seu índice de data e com o
+        # mesmo filtro e LIMIT; para no primeiro que não tem como entrar nela
+        import arquivamento
+        conn, cursor = db.get_conn_leitura()
+        filtros = []
+        parametros = (limite,)
+        if apos is not None:
+            filtros.append('(v.data_venda, v.id) < (?, ?)')
+            parametros = (apos[0], apos[1], limite)
+        def consulta(vendas, *condicoes, indice=None):
+            onde = ' AND '.join(filtros + list(condicoes))
+            return f'''
+                SELECT {colunas}
+                FROM {vendas} v {f"INDEXED BY {indice}" if indice else ''}
+                JOIN produtos p ON v.produto_id = p.id
+                {f"WHERE {onde}" if onde else ''}
+                ORDER BY v.data_venda DESC, v.id DESC
+                LIMIT ?
+            '''
+        linhas = _consultar(conn, fabrica, consulta('vendas'), parametros)
+        # Uma página cheia que termina depois do último mês arquivado está
+        # completa: todas as vendas arquivadas viriam depois dela
+        limite_arquivado = arquivamento.limite_arquivado(cursor)
+        if limite_arquivado is None or (len(linhas) == limite and linhas[-1].data_venda >= limite_arquivado):
+            return linhas
+        with arquivamento.arquivos_ate(db, apos[0] if apos else '9999-12-31 23:59:59') as (cursor, arquivos):
+            # Refeita no instantâneo dos arquivos, para nenhuma venda em
+            # arquivamento aparecer duas vezes ou nenhuma
+            conn = cursor.connection
+            linhas = _consultar(conn, fabrica, consulta('main.vendas'), parametros)
+            for vendas, condicao, fim in arquivos:
+                if len(linhas) >= limite and linhas[limite - 1].data_venda >= fim:
+                    break
+                # Os arquivos não têm estatísticas e, sem a indicação, o
+                # planejador prefere o índice por produto e ordena tudo
+                linhas += _consultar(conn, fabrica, consulta(vendas, condicao, indice='idx_vendas_data_cobertura'),
+                                     parametros)
+                linhas.sort(key=lambda linha: (linha.data_venda, linha.id), reverse=True)
+        return linhas[:limite]
+
+    @staticmethod
+    def _de_linha(cursor, row):
+        return Venda(row[0], row[1], row[2], row[3], Dinheiro(row[4]), row[5], row[6])
+
+    @staticmethod
+    def calcular_total_vendas(db):
+        return Venda.resumo_vendas(db)['receita']
+    
+    @staticmethod
+    def resumo_vendas(db):
+        # Lê apenas as linhas pré-agregadas, independente do tamanho do histórico
+        _, cursor = db.get_conn_leitura()
+        cursor.execute('SELECT receita, unidades, num_vendas FROM vendas_totais WHERE id = 1')
+        total = cursor.fetchone() or (0, 0, 0)
+        cursor.execute('SELECT receita, num_vendas FROM vendas_diarias WHERE dia = ?',
+                       (datetime.now().strftime('%Y-%m-%d'),))
+        hoje = cursor.fetchone() or (0, 0)
+        return {
+            'receita': Dinheiro(total[0]),
+            'unidades': total[1],
+            'num_vendas': total[2],
+            'receita_hoje': Dinheiro(hoje[0]),
+            'num_vendas_hoje': hoje[1],
+        }
+    
+    @staticmethod
+    def reconstruir_agregados(db):
+        # Recalcula as tabelas de totais a partir de vendas e das vendas
+        # arquivadas (ex.: após alterações feitas por fora do aplicativo)
+        import arquivamento
+        try:
+            arquivamento.reconstruir_agregados(db)
+        except sqlite3.Error as e:
+            raise ValueError(f"Erro ao reconstruir totais: {str(e)}")
+
+class FilaVendas:
+    # Gravação em grupo (opcional): as vendas entram numa fila e uma única
+    # thread as grava em lotes, um commit por lote. O primeiro item de um lote
+    # espera no máximo "espera" segundos por companhia, então a latência de
+    # cada venda fica limitada. Cada venda (ou carrinho) roda num SAVEPOINT
+    # próprio: falta de estoque desfaz só aquela venda, não o lote.
+    def __init__(self, db, espera=0.005, tamanho_lote=200):
+        self.db = db
+        self.espera = espera
+        self.tamanho_lote = tamanho_lote
+        self._fila = queue.Queue()
+        self._lock = threading.Lock()
+        self._encerrada = False
+        self._thread = threading.Thread(target=self._loop, name="fila-vendas", daemon=True)
+        self._thread.start()
+    
+    def enviar(self, venda):
+        # Retorna um Future que resolve com o id da venda ou com o ValueError
+        # (estoque insuficiente, produto não encontrado)
+        return self._enfileirar([venda], False)
+    
+    def enviar_carrinho(self, itens):
+        # Como Venda.registrar_carrinho: todas as linhas (produto_id, quantidade)
+        # ou nenhuma. O Future resolve com a lista de Venda gravadas.
+        data_venda = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        vendas = [Venda(produto_id=produto_id, quantidade=quantidade, data_venda=data_venda)
+                  for produto_id, quantidade in itens]
+        if not vendas:
+            raise ValueError("O carrinho está vazio")
+        return self._enfileirar(vendas, True)
+    
+    def _enfileirar(self, vendas, carrinho):
+        # Importado aqui, como o logging em instrumentacao: concurrent.futures
+        # puxa o logging e só a gravação em grupo precisa dele
+        from concurrent.futures import Future
+        futuro = Future()
+        with self._lock:
+            if self._encerrada:
+                raise ValueError("A fila de vendas foi encerrada")
+            self._fila.put((vendas, futuro, carrinho))
+        return futuro
+    
+    def registrar(self, venda, timeout=None):
+        return self.enviar(venda).result(timeout)
+    
+    def encerrar(self):
+        # Grava o que ainda estiver na fila antes de parar
+        with self._lock:
+            if self._encerrada:
+                return
+            self._encerrada = True
+            self._fila.put(None)
+        self._thread.join()
+    
+    def _loop(self):
+        while True:
+            item = self._fila.get()
+            if item is None:
+                break
+            lote = [item]
+            prazo = time.monotonic() + self.espera
+            fim = False
+            while len(lote) < self.tamanho_lote:
+                try:
+                    item = self._fila.get(timeout=max(0, prazo - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    fim = True
+                    break
+                lote.append(item)
+            self._gravar_lote([item for item in lote if item[1].set_running_or_notify_cancel()])
+            if fim:
+                break
+        self.db.close()
+    
+    def _gravar_lote(self, lote):
+        if not lote:
+            return
+        resultados = []
+        
+        def operacao(cursor):
+            resultados.clear()
+            cursor.execute('BEGIN IMMEDIATE')
+            for vendas, _, _ in lote:
+                cursor.execute('SAVEPOINT venda')
+                try:
+                    resultados.append([venda._registrar_sem_commit(cursor) for venda in vendas])
+                except (ValueError, sqlite3.IntegrityError) as e:
+                    cursor.execute('ROLLBACK TO venda')
+                    resultados.append(e if isinstance(e, ValueError) else ValueError(f"Erro ao registrar venda: {str(e)}"))
+                cursor.execute('RELEASE venda')
+        try:
+            self.db.transacao(operacao)
+        except sqlite3.Error as e:
+            for _, futuro, _ in lote:
+                futuro.set_exception(ValueError(f"Erro ao registrar venda: {str(e)}"))
+            return
+        except BaseException as e:
+            for _, futuro, _ in lote:
+                futuro.set_exception(e)
+            return
+        for (vendas, futuro, carrinho), resultado in zip(lote, resultados):
+            if isinstance(resultado, ValueError):
+                futuro.set_exception(resultado)
+                continue
+            for venda, (estoque, versao) in zip(vendas, resultado):
+                self.db.catalogo.definir_estoque(venda.produto_id, estoque, versao)
+            futuro.set_result(vendas if carrinho else vendas[0].id)
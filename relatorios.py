@@ -0,0 +1,134 @@
+from datetime import date, datetime, timedelta
+
+from arquivamento import vendas_do_periodo
+from dinheiro import Dinheiro
+
+# Consultas de relatório sobre a tabela vendas.
+# data_venda é gravada como 'AAAA-MM-DD HH:MM:SS', formato que ordena como
+# texto; assim um período vira um intervalo [inicio, fim) sobre o índice
+# idx_vendas_data_cobertura, que também contém as colunas somadas e evita
+# ler a tabela. Consultas por período que chegam a meses arquivados leem
+# também os arquivos (veja arquivamento.vendas_do_periodo); as que usam só
+# as tabelas de totais já contam as vendas arquivadas.
+
+
+def _dia(valor):
+    if valor is None or isinstance(valor, str):
+        return valor
+    if isinstance(valor, datetime):
+        valor = valor.date()
+    return valor.isoformat()
+
+
+def intervalo_datas(inicio, fim):
+    # Converte dias (inclusivos) em limites de texto para data_venda
+    inicio, fim = _dia(inicio), _dia(fim)
+    limite_inferior = f"{inicio} 00:00:00" if inicio else ''
+    if fim:
+        proximo = date.fromisoformat(fim) + timedelta(days=1)
+        limite_superior = f"{proximo.isoformat()} 00:00:00"
+    else:
+        limite_superior = '9999-12-31 23:59:59'
+    return limite_inferior, limite_superior
+
+
+def totais_periodo(db, inicio=None, fim=None):
+    # Soma as linhas de vendas_diarias: custa um registro por dia do período
+    _, cursor = db.get_conn_leitura()
+    cursor.execute('''
+        SELECT COALESCE(SUM(receita), 0), COALESCE(SUM(unidades), 0), COALESCE(SUM(num_vendas), 0)
+        FROM vendas_diarias
+        WHERE dia >= ? AND dia <= ?
+    ''', (_dia(inicio) or '', _dia(fim) or '9999-12-31'))
+    receita, unidades, num_vendas = cursor.fetchone()
+    return {'receita': Dinheiro(receita), 'unidades': unidades, 'num_vendas': num_vendas}
+
+
+def vendas_por_dia(db, inicio=None, fim=None):
+    _, cursor = db.get_conn_leitura()
+    cursor.execute('''
+        SELECT dia, receita, unidades, num_vendas
+        FROM vendas_diarias
+        WHERE dia >= ? AND dia <= ?
+        ORDER BY dia
+    ''', (_dia(inicio) or '', _dia(fim) or '9999-12-31'))
+    return [{'dia': row[0], 'receita': Dinheiro(row[1]), 'unidades': row[2], 'num_vendas': row[3]}
+            for row in cursor.fetchall()]
+
+
+def vendas_por_produto(db, inicio=None, fim=None, limite=None, ordem='receita'):
+    if ordem not in ('receita', 'unidades', 'num_vendas'):
+        raise ValueError(f"Ordenação inválida: {ordem}")
+    if inicio is None and fim is None:
+        # Histórico completo: já está agregado por produto
+        _, cursor = db.get_conn_leitura()
+        cursor.execute(f'''
+            SELECT a.produto_id, p.nome, a.receita, a.unidades, a.num_vendas
+            FROM vendas_por_produto a
+            JOIN produtos p ON p.id = a.produto_id
+            ORDER BY a.{ordem} DESC
+            LIMIT ?
+        ''', (limite if limite is not None else -1,))
+        linhas = cursor.fetchall()
+    else:
+        limites = intervalo_datas(inicio, fim)
+        with vendas_do_periodo(db, *limites) as (cursor, vendas):
+            cursor.execute(f'''
+                SELECT a.produto_id, p.nome, a.receita, a.unidades, a.num_vendas
+                FROM (
+                    SELECT produto_id,
+                           SUM(valor_total) AS receita,
+                           SUM(quantidade) AS unidades,
+                           COUNT(*) AS num_vendas
+                    FROM {vendas}
+                    WHERE data_venda >= ? AND data_venda < ?
+                    GROUP BY produto_id
+                ) a
+                JOIN produtos p ON p.id = a.produto_id
+                ORDER BY a.{ordem} DESC
+                LIMIT ?
+            ''', (*limites, limite if limite is not None else -1))
+            linhas = cursor.fetchall()
+    return [{'produto_id': row[0], 'nome': row[1], 'receita': Dinheiro(row[2]),
+             'unidades': row[3], 'num_vendas': row[4]}
+            for row in linhas]
+
+
+def top_produtos(db, n=10, inicio=None, fim=None, ordem='receita'):
+    return vendas_por_produto(db, inicio, fim, limite=n, ordem=ordem)
+
+
+def vendas_por_hora(db, inicio=None, fim=None):
+    # Distribuição por hora do dia (0 a 23), inclusive horas sem vendas
+    limites = intervalo_datas(inicio, fim)
+    with vendas_do_periodo(db, *limites) as (cursor, vendas):
+        cursor.execute(f'''
+            SELECT CAST(substr(data_venda, 12, 2) AS INTEGER) AS hora,
+                   SUM(valor_total), SUM(quantidade), COUNT(*)
+            FROM {vendas}
+            WHERE data_venda >= ? AND data_venda < ?
+            GROUP BY hora
+        ''', limites)
+        por_hora = {row[0]: row for row in cursor.fetchall()}
+    resultado = []
+    for hora in range(24):
+        row = por_hora.get(hora, (hora, 0, 0, 0))
+        resultado.append({'hora': hora, 'receita': Dinheiro(row[1]), 'unidades': row[2], 'num_vendas': row[3]})
+    return resultado
+
+
+def historico_produto(db, produto_id, inicio=None, fim=None):
+    # Vendas diárias de um produto, pelo índice (produto_id, data_venda, ...)
+    limites = intervalo_datas(inicio, fim)
+    with vendas_do_periodo(db, *limites) as (cursor, vendas):
+        cursor.execute(f'''
+            SELECT substr(data_venda, 1, 10) AS dia,
+                   SUM(valor_total), SUM(quantidade), COUNT(*)
+            FROM {vendas}
+            WHERE produto_id = ? AND data_venda >= ? AND data_venda < ?
+            GROUP BY dia
+            ORDER BY dia
+        ''', (produto_id, *limites))
+        linhas = cursor.fetchall()
+    return [{'dia': row[0], 'receita': Dinheiro(row[1]), 'unidades': row[2], 'num_vendas': row[3]}
+            for row in linhas]
@@ -0,0 +1,135 @@
+import argparse
+import math
+import sqlite3
+import sys
+from datetime import datetime
+
+import migracoes
+from modelos import Database
+
+# Alertas de estoque baixo e sugestão de compra.
+# A tabela reposicao guarda, por produto, a velocidade de venda (unidades
+# por dia, média móvel exponencial atualizada por trigger a cada venda) e os
+# dias de cobertura (estoque / velocidade). Consultar a lista lê só os
+# produtos abaixo do mínimo, pelo índice de dias_cobertura; nada é somado a
+# partir de vendas. Veja migracoes._v7_reposicao.
+
+
+def parametros(db):
+    _, cursor = db.get_conn_leitura()
+    cursor.execute('''
+        SELECT meia_vida_dias, cobertura_minima_dias, cobertura_alvo_dias
+        FROM reposicao_parametros WHERE id = 1
+    ''')
+    meia_vida, minima, alvo = cursor.fetchone()
+    return {'meia_vida_dias': meia_vida, 'cobertura_minima_dias': minima, 'cobertura_alvo_dias': alvo}
+
+
+def definir_parametros(db, meia_vida_dias=None, cobertura_minima_dias=None, cobertura_alvo_dias=None):
+    if meia_vida_dias is not None and meia_vida_dias <= 0:
+        raise ValueError("A meia-vida deve ser maior que zero")
+    if cobertura_minima_dias is not None and cobertura_minima_dias < 0:
+        raise ValueError("A cobertura mínima não pode ser negativa")
+    if cobertura_alvo_dias is not None and cobertura_alvo_dias < 0:
+        raise ValueError("A cobertura alvo não pode ser negativa")
+
+    def operacao(cursor):
+        cursor.execute('SELECT meia_vida_dias FROM reposicao_parametros WHERE id = 1')
+        meia_vida_anterior = cursor.fetchone()[0]
+        cursor.execute('''
+            UPDATE reposicao_parametros
+            SET meia_vida_dias = COALESCE(?, meia_vida_dias),
+                cobertura_minima_dias = COALESCE(?, cobertura_minima_dias),
+                cobertura_alvo_dias = COALESCE(?, cobertura_alvo_dias)
+            WHERE id = 1
+        ''', (meia_vida_dias, cobertura_minima_dias, cobertura_alvo_dias))
+        # Com outra meia-vida as taxas acumuladas deixam de valer
+        if meia_vida_dias is not None and meia_vida_dias != meia_vida_anterior:
+            migracoes.recalcular_reposicao(cursor)
+    try:
+        db.transacao(operacao)
+    except sqlite3.Error as e:
+        raise ValueError(f"Erro ao salvar parâmetros: {str(e)}")
+
+
+def _item(row, tau, minima, alvo):
+    # row: produto_id, nome, quantidade, taxa, dias desde a atualização.
+    # A taxa gravada vale para o momento da última venda; até agora ela decaiu.
+    produto_id, nome, quantidade, taxa, decorrido = row
+    velocidade = taxa * math.exp(-max(decorrido, 0) / tau)
+    cobertura = quantidade / velocidade if velocidade > 0 else math.inf
+    if cobertura >= minima:
+        return None
+    return {
+        'produto_id': produto_id,
+        'nome': nome,
+        'quantidade': quantidade,
+        'velocidade': velocidade,
+        'dias_cobertura': cobertura,
+        'sugerido': max(0, math.ceil(velocidade * alvo - quantidade)),
+    }
+
+
+_CONSULTA = '''
+    SELECT r.produto_id, p.nome, p.quantidade, r.taxa, julianday(?) - r.atualizado_em
+    FROM reposicao r
+    JOIN produtos p ON p.id = r.produto_id
+'''
+
+
+def lista_reposicao(db, cobertura_minima=None, cobertura_alvo=None, agora=None):
+    # Produtos com menos de "cobertura_minima" dias de estoque, dos mais
+    # urgentes para os menos, com a quantidade sugerida para chegar a
+    # "cobertura_alvo" dias. Sem argumentos, usa os parâmetros gravados.
+    config = parametros(db)
+    minima = config['cobertura_minima_dias'] if cobertura_minima is None else cobertura_minima
+    alvo = config['cobertura_alvo_dias'] if cobertura_alvo is None else cobertura_alvo
+    tau = config['meia_vida_dias'] / math.log(2)
+    agora = (agora or datetime.now()).strftime('%Y-%m-%d %H:%M:%S')
+    _, cursor = db.get_conn_leitura()
+    cursor.execute(_CONSULTA + 'WHERE r.dias_cobertura < ?', (agora, minima))
+    itens = [item for item in (_item(row, tau, minima, alvo) for row in cursor.fetchall()) if item]
+    itens.sort(key=lambda item: item['dias_cobertura'])
+    return itens
+
+
+def verificar_produto(db, produto_id, agora=None):
+    # Consulta de uma linha, barata o bastante para rodar após cada venda.
+    # Retorna o item da lista de reposição ou None se o estoque está folgado.
+    config = parametros(db)
+    tau = config['meia_vida_dias'] / math.log(2)
+    agora = (agora or datetime.now()).strftime('%Y-%m-%d %H:%M:%S')
+    _, cursor = db.get_conn_leitura()
+    cursor.execute(_CONSULTA + 'WHERE r.produto_id = ? AND r.dias_cobertura < ?',
+                   (agora, produto_id, config['cobertura_minima_dias']))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return _item(row, tau, config['cobertura_minima_dias'], config['cobertura_alvo_dias'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lista os produtos que precisam de reposição")
+    parser.add_argument('--banco', default='sistema_vendas.db')
+    parser.add_argument('--minimo', type=float, help="Dias de cobertura abaixo dos quais alertar")
+    parser.add_argument('--alvo', type=float, help="Dias de cobertura que a compra sugerida deve atingir")
+    args = parser.parse_args(argv)
+
+    db = Database(args.banco)
+    try:
+        itens = lista_reposicao(db, args.minimo, args.alvo)
+    finally:
+        db.close()
+
+    if not itens:
+        print("Nenhum produto abaixo da cobertura mínima.")
+        return 0
+    print(f"{'Produto':40} {'Estoque':>9} {'Vendas/dia':>11} {'Dias':>7} {'Comprar':>9}")
+    for item in itens:
+        print(f"{item['nome'][:40]:40} {item['quantidade']:>9} {item['velocidade']:>11.2f} "
+              f"{item['dias_cobertura']:>7.1f} {item['sugerido']:>9}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,355 @@
+import argparse
+import asyncio
+import json
+import logging
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from http import HTTPStatus
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import relatorios
+from backup import COPIAS_MANTIDAS_PADRAO, PASTA_PADRAO, BackupPeriodico
+from dinheiro import Dinheiro
+from modelos import (TAMANHO_POOL_PADRAO, Database, FilaVendas, LIMITE_BUSCA, LIMITE_SUGESTOES,
+                     ORDENACOES_PRODUTOS, Produto, Venda)
+
+# Servidor HTTP/JSON sem interface gráfica, para vários caixas da rede
+# usarem o mesmo banco. As consultas rodam num pool de threads de tamanho
+# fixo (--leitores); todas as escritas passam pela FilaVendas, uma única
+# thread que grava em grupo, então o loop do asyncio nunca bloqueia no
+# SQLite e não há disputa entre escritores. Valores monetários vão em
+# centavos.
+
+log = logging.getLogger('servidor')
+
+TAMANHO_MAXIMO_CORPO = 1024 * 1024
+LEITORES_PADRAO = 8
+
+
+class ErroHttp(Exception):
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+
+
+def _para_json(valor):
+    if isinstance(valor, Dinheiro):
+        return valor.centavos
+    raise TypeError(f"Tipo não serializável: {type(valor).__name__}")
+
+
+def _produto(produto):
+    return {'id': produto.id, 'nome': produto.nome, 'descricao': produto.descricao,
+            'quantidade': produto.quantidade, 'preco': produto.preco, 'codigo': produto.codigo}
+
+
+def _venda(venda):
+    dados = {'id': venda.id, 'produto_id': venda.produto_id, 'quantidade': venda.quantidade,
+             'data_venda': venda.data_venda, 'valor_total': venda.valor_total}
+    if venda.nome_produto is not None:
+        dados['nome_produto'] = venda.nome_produto
+    return dados
+
+
+def _inteiro(valor, nome, padrao=None, minimo=None, maximo=None):
+    if valor is None or valor == '':
+        if padrao is None:
+            raise ErroHttp(HTTPStatus.BAD_REQUEST, f"Parâmetro obrigatório: {nome}")
+        return padrao
+    try:
+        numero = int(valor)
+    except (TypeError, ValueError):
+        raise ErroHttp(HTTPStatus.BAD_REQUEST, f"Parâmetro inválido: {nome}")
+    if (minimo is not None and numero < minimo) or (maximo is not None and numero > maximo):
+        raise ErroHttp(HTTPStatus.BAD_REQUEST, f"Parâmetro fora do intervalo: {nome}")
+    return numero
+
+
+def _data(parametros, nome):
+    valor = parametros.get(nome)
+    if not valor:
+        return None
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        raise ErroHttp(HTTPStatus.BAD_REQUEST, f"Data inválida em {nome} (use AAAA-MM-DD)")
+
+
+class Servidor:
+    def __init__(self, db, leitores=LEITORES_PADRAO, espera_grupo=0.005, backup=None):
+        self.db = db
+        self.backup = backup
+        self.leitura = ThreadPoolExecutor(max_workers=leitores, thread_name_prefix='leitura')
+        self.fila = FilaVendas(db, espera=espera_grupo)
+        self.rotas = [
+            ('GET', r'/produtos', self.listar_produtos),
+            ('GET', r'/produtos/busca', self.buscar_produtos),
+            ('GET', r'/produtos/sugestoes', self.sugerir_produtos),
+            ('GET', r'/produtos/codigo/([^/]+)', self.produto_por_codigo),
+            ('GET', r'/produtos/(\d+)', self.obter_produto),
+            ('GET', r'/vendas', self.listar_vendas),
+            ('POST', r'/vendas', self.registrar_venda),
+            ('POST', r'/carrinhos', self.registrar_carrinho),
+            ('GET', r'/relatorios/resumo', self.resumo),
+            ('GET', r'/relatorios/totais', self.totais),
+            ('GET', r'/relatorios/top', self.top_produtos),
+            ('GET', r'/relatorios/por-dia', self.por_dia),
+            ('GET', r'/relatorios/por-hora', self.por_hora),
+        ]
+        self.rotas = [(metodo, re.compile(padrao), tratador) for metodo, padrao, tratador in self.rotas]
+
+    def encerrar(self):
+        # Grava as vendas ainda na fila antes de fechar o banco
+        if self.backup is not None:
+            self.backup.parar()
+            self.backup.join()
+        self.fila.encerrar()
+        self.leitura.shutdown(wait=True)
+        self.db.fechar_tudo()
+
+    async def _ler(self, funcao, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.leitura, funcao, *args)
+
+    async def atender(self, reader, writer):
+        # Uma conexão pode levar várias requisições (keep-alive)
+        try:
+            while True:
+                linha = await reader.readline()
+                if not linha:
+                    break
+                try:
+                    metodo, alvo, versao = linha.decode('latin-1').split()
+                except ValueError:
+                    await self._responder(writer, HTTPStatus.BAD_REQUEST, {'erro': "Requisição inválida"}, False)
+                    break
+                cabecalhos = {}
+                while True:
+                    linha = await reader.readline()
+                    if linha in (b'\r\n', b'\n', b''):
+                        break
+                    nome, _, valor = linha.decode('latin-1').partition(':')
+                    cabecalhos[nome.strip().lower()] = valor.strip()
+
+                conexao = cabecalhos.get('connection', '').lower()
+                manter = conexao == 'keep-alive' if versao == 'HTTP/1.0' else conexao != 'close'
+                try:
+                    tamanho = int(cabecalhos.get('content-length') or 0)
+                except ValueError:
+                    tamanho = -1
+                if tamanho < 0 or tamanho > TAMANHO_MAXIMO_CORPO:
+                    await self._responder(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                                          {'erro': "Corpo da requisição inválido ou grande demais"}, False)
+                    break
+                corpo = await reader.readexactly(tamanho) if tamanho else b''
+
+                status, resposta = await self.despachar(metodo, alvo, corpo)
+                await self._responder(writer, status, resposta, manter)
+                if not manter:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _responder(self, writer, status, resposta, manter):
+        dados = json.dumps(resposta, default=_para_json, ensure_ascii=False).encode('utf-8')
+        cabecalho = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                     f"Content-Type: application/json; charset=utf-8\r\n"
+                     f"Content-Length: {len(dados)}\r\n")
+        if not manter:
+            cabecalho += "Connection: close\r\n"
+        writer.write(cabecalho.encode('latin-1') + b"\r\n" + dados)
+        await writer.drain()
+
+    async def despachar(self, metodo, alvo, corpo):
+        partes = urlsplit(alvo)
+        parametros = {nome: valores[0] for nome, valores in parse_qs(partes.query).items()}
+        caminho = partes.path.rstrip('/') or '/'
+        metodo_errado = False
+        for metodo_rota, padrao, tratador in self.rotas:
+            encontrado = padrao.fullmatch(caminho)
+            if encontrado is None:
+                continue
+            if metodo_rota != metodo:
+                metodo_errado = True
+                continue
+            try:
+                return await tratador(parametros, corpo, *encontrado.groups())
+            except ErroHttp as e:
+                return e.status, {'erro': str(e)}
+            except ValueError as e:
+                return HTTPStatus.BAD_REQUEST, {'erro': str(e)}
+            except Exception:
+                log.exception("Erro em %s %s", metodo, alvo)
+                return HTTPStatus.INTERNAL_SERVER_ERROR, {'erro': "Erro interno"}
+        if metodo_errado:
+            return HTTPStatus.METHOD_NOT_ALLOWED, {'erro': "Método não permitido"}
+        return HTTPStatus.NOT_FOUND, {'erro': "Recurso não encontrado"}
+
+    @staticmethod
+    def _corpo_json(corpo):
+        try:
+            dados = json.loads(corpo or b'{}')
+        except ValueError:
+            raise ErroHttp(HTTPStatus.BAD_REQUEST, "JSON inválido")
+        if not isinstance(dados, dict):
+            raise ErroHttp(HTTPStatus.BAD_REQUEST, "O corpo deve ser um objeto JSON")
+        return dados
+
+    # Catálogo
+
+    async def listar_produtos(self, parametros, corpo):
+        # Paginação por chave: a resposta traz em "proximo" os parâmetros
+        # apos/apos_id da página seguinte
+        ordem = parametros.get('ordem', 'nome')
+        if ordem not in ORDENACOES_PRODUTOS:
+            raise ErroHttp(HTTPStatus.BAD_REQUEST, f"Ordenação inválida: {ordem}")
+        decrescente = parametros.get('decrescente', '0') not in ('', '0', 'false')
+        limite = _inteiro(parametros.get('limite'), 'limite', 50, 1, 1000)
+        apos = None
+        if 'apos_id' in parametros:
+            valor = parametros.get('apos', '')
+            if ordem != 'nome':
+                valor = _inteiro(valor, 'apos')
+            apos = (valor, _inteiro(parametros['apos_id'], 'apos_id'))
+        produtos = await self._ler(Produto.buscar_pagina, self.db, limite, apos, ordem, decrescente)
+        proximo = None
+        if len(produtos) == limite:
+            ultimo = produtos[-1]
+            proximo = {'apos': getattr(ultimo, ordem), 'apos_id': ultimo.id}
+        return HTTPStatus.OK, {'produtos': [_produto(p) for p in produtos], 'proximo': proximo}
+
+    async def buscar_produtos(self, parametros, corpo):
+        limite = _inteiro(parametros.get('limite'), 'limite', LIMITE_BUSCA, 1, LIMITE_BUSCA)
+        produtos = await self._ler(Produto.pesquisar, self.db, parametros.get('q', ''), limite)
+        return HTTPStatus.OK, {'produtos': [_produto(p) for p in produtos]}
+
+    async def sugerir_produtos(self, parametros, corpo):
+        limite = _inteiro(parametros.get('limite'), 'limite', LIMITE_SUGESTOES, 1, LIMITE_BUSCA)
+        produtos = await self._ler(Produto.sugerir, self.db, parametros.get('q', ''), limite)
+        return HTTPStatus.OK, {'produtos': [_produto(p) for p in produtos]}
+
+    async def produto_por_codigo(self, parametros, corpo, codigo):
+        produto = await self._ler(Produto.buscar_por_codigo, self.db, unquote(codigo))
+        if produto is None:
+            raise ErroHttp(HTTPStatus.NOT_FOUND, "Produto não encontrado")
+        return HTTPStatus.OK, _produto(produto)
+
+    async def obter_produto(self, parametros, corpo, id):
+        produto = await self._ler(Produto.buscar_por_id, self.db, int(id))
+        if produto is None:
+            raise ErroHttp(HTTPStatus.NOT_FOUND, "Produto não encontrado")
+        return HTTPStatus.OK, _produto(produto)
+
+    # Vendas
+
+    async def listar_vendas(self, parametros, corpo):
+        limite = _inteiro(parametros.get('limite'), 'limite', 10, 1, 1000)
+        apos = None
+        if 'apos_id' in parametros:
+            apos = (parametros.get('apos_data', ''), _inteiro(parametros['apos_id'], 'apos_id'))
+        vendas = await self._ler(Venda.buscar_pagina, self.db, limite, apos)
+        proximo = None
+        if len(vendas) == limite:
+            proximo = {'apos_data': vendas[-1].data_venda, 'apos_id': vendas[-1].id}
+        return HTTPStatus.OK, {'vendas': [_venda(v) for v in vendas], 'proximo': proximo}
+
+    async def registrar_venda(self, parametros, corpo):
+        dados = self._corpo_json(corpo)
+        venda = Venda(produto_id=_inteiro(dados.get('produto_id'), 'produto_id'),
+                      quantidade=_inteiro(dados.get('quantidade'), 'quantidade', minimo=1))
+        try:
+            await asyncio.wrap_future(self.fila.enviar(venda))
+        except ValueError as e:
+            # Estoque insuficiente ou produto inexistente
+            raise ErroHttp(HTTPStatus.CONFLICT, str(e))
+        return HTTPStatus.CREATED, _venda(venda)
+
+    async def registrar_carrinho(self, parametros, corpo):
+        dados = self._corpo_json(corpo)
+        itens = dados.get('itens')
+        if not isinstance(itens, list):
+            raise ErroHttp(HTTPStatus.BAD_REQUEST, "Informe a lista de itens")
+        # Um item inválido recusa o carrinho inteiro, com a posição do item
+        for i, item in enumerate(itens):
+            if not isinstance(item, dict):
+                raise ErroHttp(HTTPStatus.BAD_REQUEST,
+                               f"Item inválido: itens[{i}] deve ser um objeto com produto_id e quantidade")
+        itens = [(_inteiro(item.get('produto_id'), f'itens[{i}].produto_id'),
+                  _inteiro(item.get('quantidade'), f'itens[{i}].quantidade', minimo=1))
+                 for i, item in enumerate(itens)]
+        try:
+            vendas = await asyncio.wrap_future(self.fila.enviar_carrinho(itens))
+        except ValueError as e:
+            raise ErroHttp(HTTPStatus.CONFLICT, str(e))
+        total = sum((v.valor_total for v in vendas), Dinheiro(0))
+        return HTTPStatus.CREATED, {'vendas': [_venda(v) for v in vendas], 'valor_total': total}
+
+    # Relatórios
+
+    async def resumo(self, parametros, corpo):
+        return HTTPStatus.OK, await self._ler(Venda.resumo_vendas, self.db)
+
+    async def totais(self, parametros, corpo):
+        return HTTPStatus.OK, await self._ler(
+            relatorios.totais_periodo, self.db, _data(parametros, 'inicio'), _data(parametros, 'fim'))
+
+    async def top_produtos(self, parametros, corpo):
+        n = _inteiro(parametros.get('n'), 'n', 10, 1, 1000)
+        return HTTPStatus.OK, await self._ler(
+            relatorios.top_produtos, self.db, n, _data(parametros, 'inicio'), _data(parametros, 'fim'),
+            parametros.get('ordem', 'receita'))
+
+    async def por_dia(self, parametros, corpo):
+        return HTTPStatus.OK, await self._ler(
+            relatorios.vendas_por_dia, self.db, _data(parametros, 'inicio'), _data(parametros, 'fim'))
+
+    async def por_hora(self, parametros, corpo):
+        return HTTPStatus.OK, await self._ler(
+            relatorios.vendas_por_hora, self.db, _data(parametros, 'inicio'), _data(parametros, 'fim'))
+
+
+async def servir(db, host, porta, leitores=LEITORES_PADRAO, backup=None):
+    servidor = Servidor(db, leitores, backup=backup)
+    if backup is not None:
+        backup.start()
+    try:
+        rede = await asyncio.start_server(servidor.atender, host, porta)
+        async with rede:
+            print(f"Servidor ouvindo em http://{host}:{porta}", file=sys.stderr)
+            await rede.serve_forever()
+    finally:
+        servidor.encerrar()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor HTTP/JSON do Sistema de Vendas")
+    parser.add_argument('--banco', default='sistema_vendas.db')
+    parser.add_argument('--host', default='127.0.0.1',
+                        help="Use 0.0.0.0 para aceitar caixas de outras máquinas da rede")
+    parser.add_argument('--porta', type=int, default=8765)
+    parser.add_argument('--leitores', type=int, default=LEITORES_PADRAO,
+                        help="Threads para consultas ao banco")
+    parser.add_argument('--backup-horas', type=float,
+                        help="Faz uma cópia de segurança a cada tantas horas (veja backup.py)")
+    parser.add_argument('--backup-pasta', default=PASTA_PADRAO)
+    parser.add_argument('--backup-manter', type=int, default=COPIAS_MANTIDAS_PADRAO)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    # Cada thread de leitura e a de gravação prendem uma conexão do pool
+    db = Database(args.banco, tamanho_pool=max(TAMANHO_POOL_PADRAO, args.leitores + 2))
+    backup = None
+    if args.backup_horas:
+        backup = BackupPeriodico(db, args.backup_horas * 3600, args.backup_pasta, args.backup_manter)
+    try:
+        asyncio.run(servir(db, args.host, args.porta, args.leitores, backup))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+import os
+import tempfile
+import threading
+import unittest
+from datetime import date
+from unittest import mock
+
+import arquivamento
+from dinheiro import Dinheiro
+from exportacao import ler_vendas
+from modelos import Database, Produto, Venda
+
+
+class ArquivamentoTest(unittest.TestCase):
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.db = Database(os.path.join(self.pasta.name, 'vendas.db'))
+        Produto(nome="Café", descricao='', quantidade=1000, preco=Dinheiro(990)).salvar(self.db)
+
+        self._inserir(f"{mes}-{dia:02d} 10:00:00" for mes in ('2025-01', '2025-02', '2025-04') for dia in range(1, 11))
+
+    def _inserir(self, datas):
+        def inserir(cursor):
+            cursor.executemany('''
+                INSERT INTO vendas (produto_id, quantidade, data_venda, valor_total)
+                VALUES (1, 1, ?, 990)
+            ''', [(data,) for data in datas])
+        self.db.transacao(inserir)
+
+    def tearDown(self):
+        self.db.fechar_tudo()
+        self.pasta.cleanup()
+
+    def test_exportacao_inclui_meses_arquivados(self):
+        janeiro = list(ler_vendas(self.db, '2025-01-01', '2025-01-31'))
+        todas = list(ler_vendas(self.db))
+        resultado = arquivamento.arquivar(self.db, manter_meses=0, hoje=date(2025, 3, 15), pausa=0)
+        self.assertEqual(resultado.arquivadas, 20)
+
+        self.assertEqual(list(ler_vendas(self.db, '2025-01-01', '2025-01-31')), janeiro)
+        self.assertEqual(list(ler_vendas(self.db, '2025-02-05', '2025-04-05')),
+                         [linha for linha in todas if '2025-02-05' <= linha[1] < '2025-04-06'])
+        self.assertEqual(list(ler_vendas(self.db, tamanho_lote=7)), todas)
+        self.assertEqual(list(ler_vendas(self.db, apos_id=15)), todas[15:])
+
+    def test_exportacao_nao_perde_o_mes_arquivado_durante_a_leitura(self):
+        # O arquivamento roda logo depois da escolha dos arquivos: a
+        # exportação continua no instantâneo em que a escolha foi feita
+        todas = list(ler_vendas(self.db, '2025-01-01', '2025-04-30'))
+        escolher = arquivamento._arquivos_do_periodo
+        def escolher_e_arquivar(*args):
+            arquivos = escolher(*args)
+            if arquivar.ident is None:
+                arquivar.start()
+                arquivar.join()
+            return arquivos
+        arquivar = threading.Thread(target=lambda: (
+            arquivamento.arquivar(self.db, manter_meses=0, hoje=date(2025, 3, 15), pausa=0), self.db.close()))
+        with mock.patch('arquivamento._arquivos_do_periodo', escolher_e_arquivar):
+            exportadas = list(ler_vendas(self.db, '2025-01-01', '2025-04-30'))
+        self.assertEqual(exportadas, todas)
+        self.assertEqual(list(ler_vendas(self.db, '2025-01-01', '2025-04-30')), todas)
+
+    def _paginar(self, limite):
+        chaves, apos = [], None
+        while True:
+            pagina = Venda.buscar_linhas(self.db, limite, apos)
+            chaves.extend((linha.data_venda, linha.id) for linha in pagina)
+            if len(pagina) < limite:
+                return chaves
+            apos = chaves[-1]
+
+    def test_historico_pagina_ate_os_meses_arquivados(self):
+        arquivamento.arquivar(self.db, manter_meses=0, hoje=date(2025, 3, 15), pausa=0)
+        ids = [id for _, id in self._paginar(7)]
+        self.assertEqual(ids, list(range(30, 0, -1)))
+        self.assertEqual([venda.id for venda in Venda.buscar_pagina(self.db, 30)], ids)
+
+    def test_historico_pagina_por_varios_arquivos(self):
+        # Três anos arquivados, vendas no mesmo segundo dividindo páginas e
+        # uma venda tardia de um mês arquivado, que fica no banco principal
+        self._inserir(['2023-12-20 09:00:00'] * 4 + ['2024-06-01 12:00:00'] * 5)
+        esperadas = self._paginar(1000)
+        arquivamento.arquivar(self.db, manter_meses=0, hoje=date(2025, 3, 15), pausa=0)
+        self._inserir(['2024-06-01 12:00:00'])
+        esperadas = sorted(esperadas + [('2024-06-01 12:00:00', 40)], reverse=True)
+        for limite in (1, 3, 4, 7, 100):
+            self.assertEqual(self._paginar(limite), esperadas)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+from dinheiro import Dinheiro
+from modelos import Database, FilaVendas, Produto, Venda
+
+
+class CatalogoCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.caminho = os.path.join(self.pasta.name, 'vendas.db')
+        self.db = Database(self.caminho)
+        for i in range(1, 6):
+            Produto(nome=f"Produto {i}", descricao='', quantidade=100, preco=Dinheiro(150)).salvar(self.db)
+
+    def tearDown(self):
+        self.db.fechar_tudo()
+        self.pasta.cleanup()
+
+    def _em_thread(self, funcao):
+        resultado = []
+        thread = threading.Thread(target=lambda: (resultado.append(funcao()), self.db.close()))
+        thread.start()
+        thread.join()
+        return resultado[0]
+
+    def test_leituras_de_duas_threads_acertam_o_cache(self):
+        Produto.buscar_todos(self.db)
+        misses = self.db.catalogo.misses
+        for _ in range(10):
+            Produto.buscar_por_id(self.db, 1)
+            self._em_thread(lambda: Produto.buscar_por_id(self.db, 2))
+        self.assertEqual(self.db.catalogo.misses, misses)
+        self.assertGreaterEqual(self.db.catalogo.hits, 20)
+
+    def test_gravacoes_do_proprio_processo_nao_recarregam(self):
+        Produto.buscar_todos(self.db)
+        misses = self.db.catalogo.misses
+        venda = Venda(produto_id=1, quantidade=3)
+        self._em_thread(lambda: venda.registrar(self.db))
+        Venda.registrar_carrinho(self.db, [(2, 1), (2, 1), (3, 4)])
+        fila = FilaVendas(self.db)
+        try:
+            fila.registrar(Venda(produto_id=4, quantidade=2), timeout=5)
+        finally:
+            fila.encerrar()
+        produto = Produto.buscar_por_id(self.db, 5)
+        produto.preco = Dinheiro(200)
+        produto.salvar(self.db)
+
+        self.assertEqual(Produto.buscar_por_id(self.db, 1).quantidade, 97)
+        self.assertEqual(Produto.buscar_por_id(self.db, 2).quantidade, 98)
+        self.assertEqual(Produto.buscar_por_id(self.db, 3).quantidade, 96)
+        self.assertEqual(Produto.buscar_por_id(self.db, 4).quantidade, 98)
+        self.assertEqual(Produto.buscar_por_id(self.db, 5).preco, Dinheiro(200))
+        self.assertEqual(self.db.catalogo.misses, misses)
+
+    def test_gravacao_de_outro_processo_recarrega(self):
+        Produto.buscar_todos(self.db)
+        misses = self.db.catalogo.misses
+        conn = sqlite3.connect(self.caminho)
+        conn.execute('UPDATE produtos SET quantidade = 7 WHERE id = 1')
+        conn.commit()
+        conn.close()
+        self.assertEqual(Produto.buscar_por_id(self.db, 1).quantidade, 7)
+        self.assertEqual(self.db.catalogo.misses, misses + 1)
+        Produto.buscar_por_id(self.db, 1)
+        self.assertEqual(self.db.catalogo.misses, misses + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
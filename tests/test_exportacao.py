@@ -0,0 +1,32 @@
+import os
+import tempfile
+import unittest
+
+from dinheiro import Dinheiro
+from exportacao import ler_vendas
+from modelos import Database, Produto, Venda
+
+
+class LerVendasTest(unittest.TestCase):
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.db = Database(os.path.join(self.pasta.name, 'vendas.db'))
+        Produto(nome="Café", descricao='', quantidade=100, preco=Dinheiro(990)).salvar(self.db)
+        for _ in range(5):
+            Venda(produto_id=1, quantidade=1).registrar(self.db)
+
+    def tearDown(self):
+        self.db.fechar_tudo()
+        self.pasta.cleanup()
+
+    def test_periodo_lido_numa_transacao_de_leitura(self):
+        linhas = ler_vendas(self.db, '2000-01-01', '2999-12-31', tamanho_lote=2)
+        primeira = next(linhas)
+        conn, _ = self.db.get_conn_leitura()
+        self.assertTrue(conn.in_transaction)
+        self.assertEqual([primeira[0], *(linha[0] for linha in linhas)], [1, 2, 3, 4, 5])
+        self.assertFalse(conn.in_transaction)
+
+
+if __name__ == '__main__':
+    unittest.main()
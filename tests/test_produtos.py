@@ -0,0 +1,86 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+from dinheiro import Dinheiro
+from modelos import ConflitoDeVersao, Database, Produto, Venda
+
+
+class EdicaoProdutoTest(unittest.TestCase):
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.caminho = os.path.join(self.pasta.name, 'vendas.db')
+        self.db = Database(self.caminho)
+        Produto(nome="Café", descricao='', quantidade=100, preco=Dinheiro(990)).salvar(self.db)
+
+    def tearDown(self):
+        self.db.fechar_tudo()
+        self.pasta.cleanup()
+
+    def _no_banco(self):
+        with sqlite3.connect(self.caminho) as conn:
+            return conn.execute('SELECT quantidade, preco, versao FROM produtos WHERE id = 1').fetchone()
+
+    def test_venda_durante_a_edicao_nao_e_apagada(self):
+        produto = Produto.buscar_por_id(self.db, 1).copiar()
+        Venda(produto_id=1, quantidade=3).registrar(self.db)
+        produto.preco = Dinheiro(1090)
+        produto.salvar(self.db)
+
+        self.assertEqual(self._no_banco(), (97, 1090, produto.versao))
+        self.assertEqual((produto.quantidade, produto.quantidade_lida), (97, 97))
+
+    def test_entrada_de_estoque_soma_a_diferenca(self):
+        produto = Produto.buscar_por_id(self.db, 1).copiar()
+        produto.quantidade += 10
+        Venda(produto_id=1, quantidade=4).registrar(self.db)
+        produto.salvar(self.db)
+
+        self.assertEqual(self._no_banco()[0], 106)
+        self.assertEqual(produto.quantidade, 106)
+        self.assertEqual(Produto.buscar_por_id(self.db, 1).quantidade, 106)
+
+    def test_versao_desatualizada_levanta_conflito(self):
+        primeiro = Produto.buscar_por_id(self.db, 1).copiar()
+        segundo = Produto.buscar_por_id(self.db, 1).copiar()
+        primeiro.preco = Dinheiro(1190)
+        primeiro.salvar(self.db)
+        segundo.preco = Dinheiro(1290)
+        segundo.quantidade += 5
+
+        with self.assertRaises(ConflitoDeVersao) as contexto:
+            segundo.salvar(self.db)
+        self.assertEqual(contexto.exception.atual.preco, Dinheiro(1190))
+        self.assertEqual(self._no_banco(), (100, 1190, primeiro.versao))
+        # O objeto continua como foi lido, para o usuário reaplicar
+        self.assertEqual((segundo.quantidade, segundo.quantidade_lida, segundo.versao), (105, 100, primeiro.versao - 1))
+
+    def test_commit_ocupado_repete_a_partir_do_valor_lido(self):
+        # Sem WAL, um leitor aberto impede o commit; db.transacao repete a
+        # gravação quando ele termina
+        self.db.fechar_tudo()
+        self.caminho = os.path.join(self.pasta.name, 'sem_wal.db')
+        self.db = Database(self.caminho, wal=False, busy_timeout=0.05)
+        Produto(nome="Café", descricao='', quantidade=100, preco=Dinheiro(990)).salvar(self.db)
+        produto = Produto.buscar_por_id(self.db, 1).copiar()
+        produto.quantidade += 10
+        versao = produto.versao
+        leitor = sqlite3.connect(self.caminho, check_same_thread=False)
+        leitor.execute('BEGIN')
+        leitor.execute('SELECT * FROM produtos').fetchall()
+        liberar = threading.Timer(0.15, leitor.rollback)
+        liberar.start()
+        try:
+            produto.salvar(self.db)
+        finally:
+            liberar.join()
+            leitor.close()
+
+        self.assertEqual(self._no_banco()[0], 110)
+        self.assertEqual((produto.quantidade, produto.versao), (110, versao + 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
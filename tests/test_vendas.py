@@ -0,0 +1,41 @@
+import os
+import tempfile
+import unittest
+
+from dinheiro import Dinheiro
+from modelos import Database, FilaVendas, Produto, Venda
+
+
+class RegistroVendaTest(unittest.TestCase):
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.db = Database(os.path.join(self.pasta.name, 'vendas.db'))
+        for i in range(1, 4):
+            Produto(nome=f"Produto {i}", descricao='', quantidade=50, preco=Dinheiro(100)).salvar(self.db)
+        Produto.buscar_todos(self.db)
+
+    def tearDown(self):
+        self.db.fechar_tudo()
+        self.pasta.cleanup()
+
+    def test_venda_traz_nome_e_estoque_sem_ler_o_catalogo(self):
+        # A tela de vendas se atualiza só com o que a venda devolve
+        antes = self.db.catalogo.estatisticas()
+        venda = Venda(produto_id=1, quantidade=3)
+        venda.registrar(self.db)
+        fila = FilaVendas(self.db)
+        try:
+            pela_fila = Venda(produto_id=2, quantidade=5)
+            fila.registrar(pela_fila, timeout=5)
+        finally:
+            fila.encerrar()
+
+        self.assertEqual(self.db.catalogo.estatisticas(), antes)
+        self.assertEqual((venda.nome_produto, venda.estoque_restante), ("Produto 1", 47))
+        self.assertEqual((pela_fila.nome_produto, pela_fila.estoque_restante), ("Produto 2", 45))
+        self.assertEqual(Produto.buscar_por_id(self.db, 2).quantidade, 45)
+        self.assertEqual(self.db.catalogo.misses, antes['misses'])
+
+
+if __name__ == '__main__':
+    unittest.main()